@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class BudgetsConfig(AppConfig):
     name = 'budgets'
+
+    def ready(self):
+        from . import signals  # noqa: F401
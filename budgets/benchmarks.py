@@ -0,0 +1,423 @@
+"""Query-count and timing benchmarks for the budget and purchase views.
+
+``seed_dataset`` builds a benchmark user with the test factories and
+``run_benchmarks`` measures each view against it. The ``benchmark_views``
+management command wraps both and compares results to a JSON baseline.
+"""
+import datetime
+import random
+import statistics
+import time
+import tracemalloc
+import uuid
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django_htmx.middleware import HtmxDetails
+
+from budgets.matrix import YearMatrix
+from budgets.models import (
+    BudgetItem,
+    MonthlyBudget,
+    Rollover,
+    YearlyBudget,
+)
+from budgets.services import BudgetService
+from budgets.tests.factories import BudgetItemFactory, RolloverFactory
+from budgets.views import MonthlyBudgetDetailView, YearlyBudgetDetailView
+from purchases.models import Category, Income, Purchase, RecurringPurchase
+from purchases.money import has_amount_cents, sync_amount_cents
+from purchases.tests.factories import (
+    CategoryFactory,
+    IncomeFactory,
+    PurchaseFactory,
+    RecurringPurchaseFactory,
+)
+from purchases.views import (
+    PurchaseListView,
+    purchase_create,
+    recurring_purchase_add_to_month,
+)
+
+
+DATASETS = {
+    "small": {"purchases": 1_000, "categories": 10, "years": 1},
+    "medium": {"purchases": 100_000, "categories": 100, "years": 5},
+    "large": {"purchases": 1_000_000, "categories": 100, "years": 10},
+}
+
+BATCH_SIZE = 5_000
+RECURRING_PURCHASES = 5
+HOST = "localhost"
+
+
+def _bulk_create(model, objects):
+    if has_amount_cents(model):
+        sync_amount_cents(objects)
+    model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+
+
+def seed_dataset(purchases, categories, years, seed=0):
+    """Create a benchmark user with the given amount of data.
+
+    Rows are built with the factories and saved with ``bulk_create``.
+    Returns the user and the most recent budget year.
+    """
+    rng = random.Random(seed)
+    last_year = datetime.date.today().year
+    first_year = last_year - years + 1
+
+    user = get_user_model().objects.create_user(
+        username=f"benchmark-{uuid.uuid4().hex[:12]}",
+        email=f"benchmark-{uuid.uuid4().hex[:12]}@example.com",
+    )
+    yearly_budgets = [
+        YearlyBudget.objects.create(user=user, date=datetime.date(year, 1, 1))
+        for year in range(first_year, last_year + 1)
+    ]
+
+    _bulk_create(
+        Category,
+        [
+            CategoryFactory.build(user=user, name=f"Category {index:03d}", notes="")
+            for index in range(categories)
+        ],
+    )
+    category_list = list(Category.objects.filter(user=user).order_by("name"))
+    savings = {category.pk: index % 5 == 4 for index, category in enumerate(category_list)}
+
+    monthly_budgets = MonthlyBudget.objects.filter(user=user).select_related(
+        "yearly_budget"
+    )
+    _bulk_create(
+        BudgetItem,
+        [
+            BudgetItemFactory.build(
+                user=user,
+                category=category,
+                monthly_budget=monthly_budget,
+                yearly_budget=monthly_budget.yearly_budget,
+                amount=Decimal(rng.randrange(0, 50_000)) / 100,
+                savings=savings[category.pk],
+                notes="",
+            )
+            for monthly_budget in monthly_budgets
+            for category in category_list
+        ],
+    )
+    _bulk_create(
+        Rollover,
+        [
+            RolloverFactory.build(
+                user=user,
+                yearly_budget=yearly_budget,
+                category=category,
+                amount=Decimal(rng.randrange(0, 20_000)) / 100,
+            )
+            for yearly_budget in yearly_budgets
+            for category in category_list
+        ],
+    )
+
+    day_span = (datetime.date(last_year, 12, 31) - datetime.date(first_year, 1, 1)).days
+    start = datetime.date(first_year, 1, 1)
+    batch = []
+    for index in range(purchases):
+        batch.append(
+            PurchaseFactory.build(
+                user=user,
+                category=rng.choice(category_list) if index % 50 else None,
+                subcategory=None,
+                date=start + datetime.timedelta(days=rng.randint(0, day_span)),
+                amount=Decimal(rng.randrange(100, 50_000)) / 100,
+                item=f"Item {index}",
+                source="Benchmark Store",
+                location="Benchmark City",
+                notes="",
+            )
+        )
+        if len(batch) == BATCH_SIZE:
+            _bulk_create(Purchase, batch)
+            batch = []
+    _bulk_create(Purchase, batch)
+
+    _bulk_create(
+        Income,
+        [
+            IncomeFactory.build(
+                user=user,
+                category=None,
+                date=datetime.date(year, month, 1),
+                amount=Decimal(rng.randrange(300_000, 900_000)) / 100,
+                source="Employer",
+                payer="Employer",
+                notes="",
+            )
+            for year in range(first_year, last_year + 1)
+            for month in range(1, 13)
+        ],
+    )
+    _bulk_create(
+        RecurringPurchase,
+        [
+            RecurringPurchaseFactory.build(
+                user=user,
+                category=category_list[index % len(category_list)],
+                item=f"Subscription {index}",
+                notes="",
+            )
+            for index in range(RECURRING_PURCHASES)
+        ],
+    )
+
+    return user, last_year
+
+
+def _request(user, method, path, data=None, current_path=None):
+    """Build a request; ``current_path`` makes it an HTMX request from that page."""
+    headers = {"HTTP_HOST": HOST}
+    if current_path is not None:
+        headers.update(HTTP_HX_REQUEST="true", HTTP_HX_CURRENT_URL=f"http://{HOST}{current_path}")
+    request = getattr(RequestFactory(**headers), method)(path, data or {})
+    request.user = user
+    request.htmx = HtmxDetails(request)
+    return request
+
+
+def _render(response):
+    if hasattr(response, "render"):
+        response.render()
+    return response
+
+
+def _workloads(user, year):
+    month = 12 if year < datetime.date.today().year else datetime.date.today().month
+    category = Category.objects.filter(user=user).order_by("name").first()
+    month_start = datetime.date(year, month, 1)
+    recurring = list(RecurringPurchase.objects.filter(user=user).order_by("pk"))
+
+    purchase_post = {
+        "form-TOTAL_FORMS": "2",
+        "form-INITIAL_FORMS": "0",
+        "form-MIN_NUM_FORMS": "0",
+        "form-MAX_NUM_FORMS": "1000",
+        "next": reverse("purchase_list"),
+    }
+    for index in range(2):
+        purchase_post.update(
+            {
+                f"form-{index}-date": month_start.isoformat(),
+                f"form-{index}-item": f"Benchmark item {index}",
+                f"form-{index}-amount": "12.34",
+                f"form-{index}-source": "Benchmark Store",
+                f"form-{index}-location": "Benchmark City",
+                f"form-{index}-category": str(category.pk),
+            }
+        )
+
+    recurring_post = {
+        "form-TOTAL_FORMS": str(len(recurring)),
+        "form-INITIAL_FORMS": str(len(recurring)),
+        "form-MIN_NUM_FORMS": "0",
+        "form-MAX_NUM_FORMS": "1000",
+    }
+    for index, recurring_purchase in enumerate(recurring):
+        recurring_post.update(
+            {
+                f"form-{index}-selected": "on",
+                f"form-{index}-recurring_purchase_id": str(recurring_purchase.pk),
+                f"form-{index}-date": month_start.isoformat(),
+                f"form-{index}-amount": str(recurring_purchase.amount),
+                f"form-{index}-category": str(recurring_purchase.category_id),
+            }
+        )
+
+    yearly_detail = YearlyBudgetDetailView.as_view()
+    monthly_detail = MonthlyBudgetDetailView.as_view()
+    monthly_path = reverse("monthly_detail", args=[year, month])
+    purchase_list = PurchaseListView.as_view()
+
+    return {
+        "yearly_detail": lambda: _render(
+            yearly_detail(
+                _request(user, "get", reverse("yearly_detail", args=[year])), year=year
+            )
+        ),
+        "monthly_detail": lambda: _render(
+            monthly_detail(
+                _request(user, "get", reverse("monthly_detail", args=[year, month])),
+                year=year,
+                month=month,
+            )
+        ),
+        "yearly_aggregation": lambda: YearMatrix.budget_rows(user, year),
+        "purchase_list": lambda: _render(
+            purchase_list(_request(user, "get", reverse("purchase_list")))
+        ),
+        "purchase_create": lambda: purchase_create(
+            _request(user, "post", reverse("purchase_create"), purchase_post)
+        ),
+        "purchase_create_monthly_patch": lambda: purchase_create(
+            _request(
+                user,
+                "post",
+                reverse("purchase_create"),
+                {**purchase_post, "next": monthly_path},
+                current_path=monthly_path,
+            )
+        ),
+        "recurring_purchase_add_to_month": lambda: recurring_purchase_add_to_month(
+            _request(
+                user,
+                "post",
+                reverse("recurring_purchase_add_to_month", args=[year, month]),
+                recurring_post,
+            ),
+            year=year,
+            month=month,
+        ),
+    }
+
+
+def _run_isolated(workload):
+    """Run a workload in a savepoint that is always rolled back."""
+    with transaction.atomic():
+        workload()
+        transaction.set_rollback(True)
+
+
+def measure(workload, repeat):
+    """Return query count, median wall time and peak traced memory."""
+    with CaptureQueriesContext(connection) as captured:
+        _run_isolated(workload)
+    # Savepoint statements belong to the harness, not the view.
+    queries = sum(
+        1 for query in captured.captured_queries if "SAVEPOINT" not in query["sql"]
+    )
+
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _run_isolated(workload)
+        durations.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        _run_isolated(workload)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "queries": queries,
+        "time_ms": round(statistics.median(durations), 2),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(purchases, categories, years, repeat=3, seed=0, views=None):
+    """Seed a dataset and measure every view, leaving no data behind."""
+    with transaction.atomic():
+        user, year = seed_dataset(purchases, categories, years, seed=seed)
+        workloads = _workloads(user, year)
+        results = {
+            name: measure(workload, repeat)
+            for name, workload in workloads.items()
+            if views is None or name in views
+        }
+        transaction.set_rollback(True)
+    return results
+
+
+def compare_results(baseline, results, time_tolerance, query_tolerance=0):
+    """Return a list of regressions of ``results`` against ``baseline``."""
+    regressions = []
+    for view, result in results.items():
+        expected = baseline.get(view)
+        if expected is None:
+            continue
+        if result["queries"] > expected["queries"] + query_tolerance:
+            regressions.append(
+                f"{view}: {result['queries']} queries (baseline {expected['queries']})"
+            )
+        if result["time_ms"] > expected["time_ms"] * (1 + time_tolerance):
+            regressions.append(
+                f"{view}: {result['time_ms']} ms (baseline {expected['time_ms']} ms)"
+            )
+    return regressions
+
+
+def _latency_wrapper(latency_ms):
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(latency_ms / 1000)
+        return execute(sql, params, many, context)
+
+    return wrapper
+
+
+def _median_ms(workload, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        workload()
+        durations.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(durations), 2)
+
+
+def run_concurrency_benchmark(purchases, categories, years, repeat=3, seed=0, latency_ms=0):
+    """Time the budget contexts with sequential and with concurrent queries.
+
+    Worker connections only see committed rows, so the dataset is committed
+    and deleted afterwards instead of being rolled back. ``latency_ms`` adds
+    a delay to every query on every connection to model a database server
+    reached over the network.
+    """
+    wrapper = _latency_wrapper(latency_ms)
+
+    def add_latency(sender, connection, **kwargs):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    with transaction.atomic():
+        user, year = seed_dataset(purchases, categories, years, seed=seed)
+    month = 12 if year < datetime.date.today().year else datetime.date.today().month
+    service = BudgetService()
+
+    workloads = {
+        "yearly": (
+            lambda: service.get_yearly_budget_context(user, year, month),
+            lambda: async_to_sync(service.aget_yearly_budget_context)(user, year, month),
+        ),
+        "monthly": (
+            lambda: service.get_monthly_budget_context(user, year, month),
+            lambda: async_to_sync(service.aget_monthly_budget_context)(user, year, month),
+        ),
+    }
+
+    results = {}
+    if latency_ms:
+        connection_created.connect(add_latency)
+        connection.ensure_connection()
+        add_latency(None, connection)
+    try:
+        for name, (sequential, concurrent) in workloads.items():
+            sequential_ms = _median_ms(sequential, repeat)
+            concurrent_ms = _median_ms(concurrent, repeat)
+            results[name] = {
+                "sequential_ms": sequential_ms,
+                "concurrent_ms": concurrent_ms,
+                "speedup": round(sequential_ms / concurrent_ms, 2) if concurrent_ms else None,
+            }
+    finally:
+        connection_created.disconnect(add_latency)
+        if wrapper in connection.execute_wrappers:
+            connection.execute_wrappers.remove(wrapper)
+        RecurringPurchase.objects.filter(user=user).delete()
+        user.delete()
+    return results
@@ -0,0 +1,84 @@
+"""Run independent ORM queries concurrently for the async budget views.
+
+A query is a zero-argument callable that evaluates one ORM query and
+returns plain data. ``arun_queries`` runs a dict of them on a bounded thread
+pool; Django connections are per thread, so every query gets its own
+connection and page latency approaches the slowest query instead of the
+sum. Worker connections are released with ``close_old_connections``, which
+honours ``CONN_MAX_AGE`` just like the request cycle does. The caller
+connection's execute wrappers are installed on the worker connections too,
+so per-request query recording sees the workers' queries.
+
+Rows written inside an open transaction are invisible to other connections,
+so the queries run one after another on the caller's connection whenever a
+transaction is active (tests, benchmarks, ``transaction.atomic`` callers) or
+``settings.BUDGET_QUERY_WORKERS`` is below 2.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+
+_executors = {}
+
+
+def query_workers():
+    return getattr(settings, "BUDGET_QUERY_WORKERS", 4)
+
+
+def can_run_concurrently():
+    return query_workers() > 1 and not connection.in_atomic_block
+
+
+def _executor(workers):
+    if workers not in _executors:
+        _executors[workers] = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="budget-query"
+        )
+    return _executors[workers]
+
+
+def _caller_wrappers():
+    """The caller's execute wrappers, or ``None`` to run sequentially."""
+    if not can_run_concurrently():
+        return None
+    return list(connection.execute_wrappers)
+
+
+def _run_on_own_connection(query, wrappers):
+    try:
+        with ExitStack() as stack:
+            for wrapper in wrappers:
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            return query()
+    finally:
+        close_old_connections()
+
+
+def run_sequentially(queries):
+    """Evaluate ``queries`` in order on the current connection."""
+    return {name: query() for name, query in queries.items()}
+
+
+async def arun_queries(queries):
+    """Evaluate ``queries`` concurrently and return their results by name."""
+    # The caller's connection belongs to the thread sync_to_async runs on,
+    # not to the event loop, so check its transaction state and read its
+    # wrappers there.
+    wrappers = await sync_to_async(_caller_wrappers)()
+    if wrappers is None:
+        return await sync_to_async(run_sequentially)(queries)
+
+    loop = asyncio.get_running_loop()
+    executor = _executor(query_workers())
+    results = await asyncio.gather(
+        *(
+            loop.run_in_executor(executor, _run_on_own_connection, query, wrappers)
+            for query in queries.values()
+        )
+    )
+    return dict(zip(queries, results))
@@ -0,0 +1,87 @@
+"""Conditional GET for pages built from a user's budget data.
+
+``ConditionalPageMixin`` answers a GET whose ``If-None-Match`` or
+``If-Modified-Since`` still matches with 304 Not Modified before the view
+loads anything. The validators come from ``DataVersion``, one indexed read,
+so an unchanged page costs that read instead of its budget computation.
+"""
+import datetime
+import hashlib
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.middleware.csrf import get_token
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+from budgets.models import DataVersion
+
+
+class ConditionalPageMixin:
+    """Send ``ETag`` and ``Last-Modified`` and honour conditional GETs.
+
+    The ETag covers the user's data version for ``get_data_year()`` (or all
+    years when it returns ``None``), the full path with its query string,
+    the CSRF cookie the page's forms embed, the day (pages default to the
+    current month) and ``settings.PAGE_ETAG_RELEASE``. Place it after
+    ``LoginRequiredMixin``.
+    """
+
+    def get_data_year(self):
+        return None
+
+    def get_validators(self):
+        version, updated_at = DataVersion.validators(self.request.user.pk, self.get_data_year())
+        # Kept for views that key their own caches on the same version.
+        self.data_version = version
+        # Makes sure the CSRF secret exists now, so the ETag covers the same
+        # secret the rendered forms and the response cookie will carry.
+        get_token(self.request)
+        parts = (
+            settings.PAGE_ETAG_RELEASE,
+            self.request.user.pk,
+            self.request.get_full_path(),
+            self.request.META.get("CSRF_COOKIE", ""),
+            datetime.date.today(),
+            version,
+        )
+        etag = quote_etag(hashlib.sha256(repr(parts).encode()).hexdigest()[:32])
+        last_modified = int(updated_at.timestamp()) if updated_at else None
+        return etag, last_modified
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD") or not request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self._async_conditional_dispatch(request, *args, **kwargs)
+
+        etag, last_modified = self.get_validators()
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        return self._set_validators(response, etag, last_modified)
+
+    async def _async_conditional_dispatch(self, request, *args, **kwargs):
+        etag, last_modified = await sync_to_async(self.get_validators)()
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        return self._set_validators(response, etag, last_modified)
+
+    @staticmethod
+    def _set_validators(response, etag, last_modified):
+        if response.status_code in (200, 304):
+            response.headers.setdefault("ETag", etag)
+            if last_modified is not None:
+                response.headers.setdefault("Last-Modified", http_date(last_modified))
+        # Pages are per user: browsers must revalidate, shared caches must not store.
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ("Cookie",))
+        return response
@@ -0,0 +1,278 @@
+"""Synthetic budget data for reproducing production-scale datasets locally.
+
+Everything is created with chunked ``bulk_create`` calls and a seeded
+``random.Random`` so the same arguments always produce the same rows.
+"""
+import calendar
+import datetime
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from budgets.models import (
+    BudgetItem,
+    MonthlyBudget,
+    Rollover,
+    YearlyBudget,
+)
+from purchases.models import Category, Income, Purchase, Receipt, RecurringPurchase
+from purchases.money import has_amount_cents, sync_amount_cents
+
+
+# Relative spending per month: quiet January, summer travel, holiday peak.
+SEASONAL_WEIGHTS = (0.8, 0.8, 0.9, 1.0, 1.0, 1.2, 1.3, 1.2, 1.0, 1.0, 1.3, 1.6)
+
+SOURCES = (
+    "Grocery Mart", "Corner Cafe", "Fuel Stop", "Online Store", "Hardware Depot",
+    "Pharmacy", "Bookshop", "Electric Co", "Water Utility", "Cinema",
+)
+LOCATIONS = ("Springfield", "Riverside", "Lakeside", "Hillview", "Online")
+RECURRING_ITEMS = ("Streaming", "Gym", "Phone", "Internet", "Insurance", "Rent")
+
+
+def _cents(value):
+    return Decimal(value) / 100
+
+
+class BudgetDataGenerator:
+    def __init__(
+        self,
+        users=1,
+        years=3,
+        purchases_per_year=1_000,
+        categories=20,
+        last_year=None,
+        seed=0,
+        chunk_size=10_000,
+        username_prefix="generated",
+        stdout=None,
+    ):
+        self.users = users
+        self.years = years
+        self.purchases_per_year = purchases_per_year
+        self.categories = categories
+        self.last_year = last_year or datetime.date.today().year
+        self.first_year = self.last_year - years + 1
+        self.chunk_size = chunk_size
+        self.username_prefix = username_prefix
+        self.rng = random.Random(seed)
+        self.stdout = stdout
+        self.counts = {}
+
+    def _log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def _save(self, model, objects):
+        if has_amount_cents(model):
+            sync_amount_cents(objects)
+        model.objects.bulk_create(objects, batch_size=self.chunk_size)
+        self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(objects)
+        return objects
+
+    def generate(self):
+        for index in range(self.users):
+            with transaction.atomic():
+                user = self._generate_user(index)
+            self._log(f"Generated data for {user.username}")
+        return self.counts
+
+    def _generate_user(self, index):
+        user = get_user_model().objects.create_user(
+            username=f"{self.username_prefix}-{index}",
+            email=f"{self.username_prefix}-{index}@example.com",
+        )
+        self.counts["User"] = self.counts.get("User", 0) + 1
+
+        categories = self._save(
+            Category,
+            [
+                Category(
+                    user=user,
+                    name=f"Category {number:03d}",
+                    rollover=number % 4 == 0,
+                )
+                for number in range(self.categories)
+            ],
+        )
+        savings = {category.name: number % 5 == 4 for number, category in enumerate(categories)}
+        recurring = self._save(
+            RecurringPurchase,
+            [
+                RecurringPurchase(
+                    user=user,
+                    item=item,
+                    amount=_cents(self.rng.randrange(1_000, 20_000)),
+                    category=categories[number % len(categories)],
+                    source=SOURCES[number % len(SOURCES)],
+                    location="Online",
+                )
+                for number, item in enumerate(RECURRING_ITEMS)
+            ],
+        )
+
+        for year in range(self.first_year, self.last_year + 1):
+            self._generate_year(user, year, categories, savings, recurring)
+
+        return user
+
+    def _generate_year(self, user, year, categories, savings, recurring):
+        (yearly_budget,) = self._save(
+            YearlyBudget, [YearlyBudget(user=user, date=datetime.date(year, 1, 1))]
+        )
+        monthly_budgets = self._save(
+            MonthlyBudget,
+            [
+                MonthlyBudget(
+                    user=user,
+                    yearly_budget=yearly_budget,
+                    date=datetime.date(year, month, 1),
+                )
+                for month in range(1, 13)
+            ],
+        )
+
+        budget_items = []
+        for category in categories:
+            monthly_amount = self.rng.randrange(0, 80_000)
+            months = monthly_budgets
+            if BudgetItem.sparse() and not monthly_amount:
+                months = monthly_budgets[:1]
+            for monthly_budget in months:
+                budget_items.append(
+                    BudgetItem(
+                        user=user,
+                        category=category,
+                        monthly_budget=monthly_budget,
+                        yearly_budget=yearly_budget,
+                        amount=_cents(monthly_amount),
+                        savings=savings[category.name],
+                    )
+                )
+                if len(budget_items) >= self.chunk_size:
+                    self._save(BudgetItem, budget_items)
+                    budget_items = []
+        self._save(BudgetItem, budget_items)
+
+        self._save(
+            Rollover,
+            [
+                Rollover(
+                    user=user,
+                    yearly_budget=yearly_budget,
+                    category=category,
+                    amount=_cents(self.rng.randrange(0, 50_000)) if category.rollover else 0,
+                )
+                for category in categories
+            ],
+        )
+
+        self._generate_incomes(user, year, categories)
+        self._generate_purchases(user, year, categories, recurring)
+
+    def _generate_incomes(self, user, year, categories):
+        incomes = []
+        for month in range(1, 13):
+            for day in (1, 15):
+                incomes.append(
+                    Income(
+                        user=user,
+                        date=datetime.date(year, month, day),
+                        amount=_cents(self.rng.randrange(200_000, 450_000)),
+                        source="Salary",
+                        payer="Employer",
+                    )
+                )
+            if self.rng.random() < 0.3:
+                incomes.append(
+                    Income(
+                        user=user,
+                        date=datetime.date(year, month, self.rng.randint(1, 28)),
+                        amount=_cents(self.rng.randrange(1_000, 30_000)),
+                        source="Refund",
+                        category=self.rng.choice(categories),
+                    )
+                )
+        self._save(Income, incomes)
+
+    def _generate_purchases(self, user, year, categories, recurring):
+        months = self.rng.choices(
+            range(1, 13), weights=SEASONAL_WEIGHTS, k=self.purchases_per_year
+        )
+        rows = []
+        for month in months:
+            day = self.rng.randint(1, calendar.monthrange(year, month)[1])
+            rows.append((datetime.date(year, month, day), None))
+        for month in range(1, 13):
+            for recurring_purchase in recurring:
+                rows.append((datetime.date(year, month, 1), recurring_purchase))
+        rows.sort(key=lambda row: row[0])
+
+        for start in range(0, len(rows), self.chunk_size):
+            self._save_purchase_chunk(user, categories, rows[start:start + self.chunk_size])
+
+    def _save_purchase_chunk(self, user, categories, rows):
+        receipts = []
+        groups = []
+        position = 0
+        while position < len(rows):
+            date, recurring_purchase = rows[position]
+            # Recurring charges get their own receipt; other purchases are
+            # grouped into receipts of one to four items from the same day.
+            size = 1 if recurring_purchase else self.rng.choice((1, 1, 1, 2, 3, 4))
+            end = position + 1
+            while (
+                end < min(position + size, len(rows))
+                and rows[end][0] == date
+                and rows[end][1] is None
+            ):
+                end += 1
+            group = rows[position:end]
+            position = end
+            source = recurring_purchase.source if recurring_purchase else self.rng.choice(SOURCES)
+            location = recurring_purchase.location if recurring_purchase else self.rng.choice(LOCATIONS)
+            receipts.append(
+                Receipt(user_id=user.pk, date=date, source=source, location=location)
+            )
+            groups.append(group)
+
+        self._save(Receipt, receipts)
+
+        purchases = []
+        for receipt, group in zip(receipts, groups):
+            for date, recurring_purchase in group:
+                if recurring_purchase:
+                    purchases.append(
+                        Purchase(
+                            user_id=user.pk,
+                            receipt_id=receipt.pk,
+                            recurring_purchase_id=recurring_purchase.pk,
+                            item=recurring_purchase.item,
+                            date=date,
+                            amount=recurring_purchase.amount,
+                            category_id=recurring_purchase.category_id,
+                            source=receipt.source,
+                            location=receipt.location,
+                        )
+                    )
+                    continue
+                purchases.append(
+                    Purchase(
+                        user_id=user.pk,
+                        receipt_id=receipt.pk,
+                        item=f"Item {self.rng.randrange(10_000)}",
+                        date=date,
+                        amount=_cents(self.rng.randrange(100, 25_000)),
+                        # A small share of purchases stays uncategorized.
+                        category_id=(
+                            self.rng.choice(categories).pk
+                            if self.rng.random() > 0.02
+                            else None
+                        ),
+                        source=receipt.source,
+                        location=receipt.location,
+                    )
+                )
+        self._save(Purchase, purchases)
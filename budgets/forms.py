@@ -1,4 +1,12 @@
-from django.forms import ModelForm, CharField, ChoiceField, modelformset_factory
+from django.forms import (
+    BaseModelFormSet,
+    Form,
+    ModelForm,
+    CharField,
+    ChoiceField,
+    ModelChoiceField,
+    modelformset_factory,
+)
 from django.core.exceptions import ValidationError
 import datetime
 
@@ -58,4 +66,42 @@ class BudgetItemForm(ModelForm):
         fields = ["category", "new_category", "amount", "savings", "notes"]
 
 
-BudgetItemFormset = modelformset_factory(BudgetItem, fields=("amount",), extra=0)
+class RecategorizeForm(Form):
+    """Pick the category a category's purchases are moved to."""
+
+    target = ModelChoiceField(queryset=Category.objects.none(), label="Move purchases to")
+
+    def __init__(self, *args, **kwargs):
+        self.user = kwargs.pop("user")
+        category_id = kwargs.pop("category_id")
+        super().__init__(*args, **kwargs)
+        self.fields["target"].queryset = Category.objects.filter(user=self.user).exclude(
+            pk=category_id
+        )
+
+
+class BaseBudgetItemFormset(BaseModelFormSet):
+    """A category's monthly items, listed by month.
+
+    ``placeholders`` are unsaved items for months with no stored row (see
+    ``BudgetItem.missing_months``). They become extra forms, so a month is
+    only stored when its amount is changed.
+    """
+
+    def __init__(self, *args, placeholders=(), **kwargs):
+        self.placeholders = list(placeholders)
+        super().__init__(*args, **kwargs)
+        self.extra = len(self.placeholders)
+
+    def _construct_form(self, i, **kwargs):
+        if i >= self.initial_form_count():
+            kwargs["instance"] = self.placeholders[i - self.initial_form_count()]
+        return super()._construct_form(i, **kwargs)
+
+    def __iter__(self):
+        return iter(sorted(self.forms, key=lambda form: form.instance.monthly_budget.date))
+
+
+BudgetItemFormset = modelformset_factory(
+    BudgetItem, formset=BaseBudgetItemFormset, fields=("amount",), extra=0
+)
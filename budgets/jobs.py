@@ -0,0 +1,31 @@
+from django.db import transaction
+
+from budgets.models import BudgetItem
+from budgets.snapshots import close_year
+from jobs.registry import register
+
+
+@register("budgets.prune_budget_items")
+def prune_budget_items(job):
+    budget_items = BudgetItem.objects.all()
+    if job.user is not None:
+        budget_items = budget_items.filter(user=job.user)
+    with transaction.atomic():
+        count = BudgetItem.prune(budget_items)
+    return {"count": count}
+
+
+@register("budgets.close_year")
+def close_year_job(job, year):
+    def progress(done, total):
+        job.report_progress(done, total, f"Computing {year}")
+
+    contexts = close_year(job.user, year, progress=progress)
+    return {"year": year, "contexts": contexts}
+
+
+@register("budgets.clone_year")
+def clone_year_job(job, year, target):
+    job.report_progress(0, message=f"Copying {year} to {target}")
+    count = BudgetItem.clone_year(job.user, year, target)
+    return {"year": target, "count": count}
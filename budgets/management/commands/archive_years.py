@@ -0,0 +1,49 @@
+import datetime
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from budgets.models import YearSnapshot
+from budgets.snapshots import archive_year
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the purchases and incomes of a closed year to the archive "
+        "tables. Defaults to last year; run after close_years."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, help="Year to archive. Defaults to last year.")
+        parser.add_argument("--user", help="Username of a single user to archive.")
+
+    def handle(self, *args, **options):
+        year = options["year"] or datetime.date.today().year - 1
+
+        snapshots = YearSnapshot.objects.filter(
+            year=year, month=None, archived=False
+        ).select_related("user")
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get(username=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist.")
+            snapshots = snapshots.filter(user=user)
+
+        start = time.perf_counter()
+        moved = skipped = 0
+        for snapshot in snapshots:
+            try:
+                moved += sum(archive_year(snapshot.user, year).values())
+            except ValueError:
+                # Reopened by a write since it was closed.
+                skipped += 1
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {moved} rows of {year} in {elapsed:.2f}s "
+                f"({skipped} reopened years skipped)"
+            )
+        )
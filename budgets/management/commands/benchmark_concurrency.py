@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from budgets.benchmarks import DATASETS, run_concurrency_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the yearly and monthly budget contexts with sequential and "
+        "concurrent aggregate queries. The dataset is committed while the "
+        "benchmark runs and deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dataset",
+            choices=sorted(DATASETS),
+            default="small",
+            help="Preset dataset size (default: small).",
+        )
+        parser.add_argument("--purchases", type=int, help="Override purchase count.")
+        parser.add_argument("--categories", type=int, help="Override category count.")
+        parser.add_argument("--years", type=int, help="Override number of years.")
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--latency-ms",
+            type=float,
+            default=0,
+            help="Delay added to every query to model a remote database (default: 0).",
+        )
+
+    def handle(self, *args, **options):
+        dataset = {
+            key: options[key] or value
+            for key, value in DATASETS[options["dataset"]].items()
+        }
+        results = run_concurrency_benchmark(
+            repeat=options["repeat"],
+            seed=options["seed"],
+            latency_ms=options["latency_ms"],
+            **dataset,
+        )
+        self.stdout.write(json.dumps(results, indent=2, sort_keys=True))
@@ -0,0 +1,90 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from budgets.benchmarks import DATASETS, compare_results, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a benchmark dataset and measure query counts, wall time and peak "
+        "memory for the budget and purchase views. Nothing is left in the "
+        "database afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dataset",
+            choices=sorted(DATASETS),
+            default="small",
+            help="Preset dataset size (default: small).",
+        )
+        parser.add_argument("--purchases", type=int, help="Override purchase count.")
+        parser.add_argument("--categories", type=int, help="Override category count.")
+        parser.add_argument("--years", type=int, help="Override number of years.")
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--baseline",
+            help="JSON baseline file. Results are stored under the dataset name.",
+        )
+        parser.add_argument(
+            "--compare",
+            action="store_true",
+            help="Fail if results regress past the baseline instead of updating it.",
+        )
+        parser.add_argument(
+            "--time-tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed relative slowdown before failing (default: 0.25).",
+        )
+        parser.add_argument(
+            "--query-tolerance",
+            type=int,
+            default=0,
+            help="Allowed extra queries per view before failing (default: 0).",
+        )
+
+    def handle(self, *args, **options):
+        dataset = {
+            key: options[key] or value
+            for key, value in DATASETS[options["dataset"]].items()
+        }
+        name = options["dataset"]
+        if dataset != DATASETS[name]:
+            name = "custom-{purchases}-{categories}-{years}".format(**dataset)
+
+        results = run_benchmarks(
+            repeat=options["repeat"], seed=options["seed"], **dataset
+        )
+        self.stdout.write(json.dumps({name: results}, indent=2, sort_keys=True))
+
+        if not options["baseline"]:
+            return
+
+        baseline_path = Path(options["baseline"])
+        baselines = (
+            json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        )
+
+        if options["compare"]:
+            if name not in baselines:
+                raise CommandError(f"{baseline_path} has no results for {name}.")
+            regressions = compare_results(
+                baselines[name],
+                results,
+                options["time_tolerance"],
+                options["query_tolerance"],
+            )
+            if regressions:
+                raise CommandError(
+                    "Benchmark regressions:\n" + "\n".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {name}."))
+            return
+
+        baselines[name] = results
+        baseline_path.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        self.stdout.write(f"Updated {name} in {baseline_path}")
@@ -0,0 +1,57 @@
+import datetime
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from budgets.models import Rollover, YearlyBudget
+from budgets.snapshots import can_close, close_year
+
+
+class Command(BaseCommand):
+    help = (
+        "Close a finished year for every user: carry its rollover-enabled "
+        "categories' remaining amounts into the next year, then store the "
+        "snapshots its pages are served from. Defaults to last year; run on "
+        "January 1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, help="Year to close. Defaults to last year.")
+        parser.add_argument("--user", help="Username of a single user to close.")
+        parser.add_argument(
+            "--keep-rollovers",
+            action="store_true",
+            help="Leave rollover amounts as they are instead of computing them.",
+        )
+
+    def handle(self, *args, **options):
+        year = options["year"] or datetime.date.today().year - 1
+        if not can_close(year):
+            raise CommandError(f"{year} is not over yet.")
+
+        user = None
+        yearly_budgets = YearlyBudget.objects.filter(date__year=year).select_related("user")
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get(username=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist.")
+            yearly_budgets = yearly_budgets.filter(user=user)
+
+        start = time.perf_counter()
+        rollovers = 0
+        if not options["keep_rollovers"]:
+            rollovers = Rollover.carry_over(year, user=user)
+        closed = 0
+        for yearly_budget in yearly_budgets:
+            close_year(yearly_budget.user, year)
+            closed += 1
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Closed {year} for {closed} users and updated {rollovers} "
+                f"rollovers in {elapsed:.2f}s"
+            )
+        )
@@ -0,0 +1,326 @@
+import datetime
+import json
+import re
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from budgets.models import BudgetItem, YearlyBudget
+from budgets.services import get_budget_service
+from budgets.views import (
+    BudgetItemDetailView,
+    YearlyBudgetDetailView,
+    YearlyBudgetItemDetailView,
+    budgetitem_bulk_edit,
+    budgetitem_edit,
+)
+from purchases.views import PurchaseListView
+
+
+REPORT_VERSION = 1
+
+APP_LABELS = ("budgets", "purchases")
+
+SQLITE_INDEX_RE = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+SQLITE_SCAN_RE = re.compile(r"^SCAN (\w+)")
+
+DUMMY_CACHES = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the hot budget and purchase queries for a sample user, capture "
+        "their query plans and report full scans, temp B-trees and unused "
+        "indexes as JSON. The workloads run in a transaction that is rolled "
+        "back, so views that write leave no trace."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", required=True, help="Username, email or id of the sample user."
+        )
+        parser.add_argument(
+            "--year",
+            type=int,
+            help="Budget year to analyze. Defaults to the user's latest year.",
+        )
+        parser.add_argument(
+            "--output", help="Write the report to this file instead of stdout."
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ("sqlite", "postgresql"):
+            raise CommandError(
+                f"Query plans are not supported on {connection.vendor}."
+            )
+
+        user = self._get_user(options["user"])
+        year = options["year"] or self._latest_year(user)
+
+        # Some views write (archive restores, for instance), and a
+        # page cached from those writes would outlive the rollback.
+        with transaction.atomic(), override_settings(CACHES=DUMMY_CACHES):
+            queries = []
+            for label, workload in self._workloads(user, year):
+                with CaptureQueriesContext(connection) as captured:
+                    workload()
+                for query in captured.captured_queries:
+                    queries.append((label, query["sql"]))
+
+            report = self._build_report(user, year, queries)
+            transaction.set_rollback(True)
+        output = json.dumps(report, indent=2, sort_keys=True, default=str)
+
+        if options["output"]:
+            with open(options["output"], "w") as report_file:
+                report_file.write(output + "\n")
+            self.stdout.write(
+                f"Wrote plans for {len(report['queries'])} queries "
+                f"to {options['output']}"
+            )
+        else:
+            self.stdout.write(output)
+
+    def _get_user(self, value):
+        lookup = Q(username=value) | Q(email=value)
+        if value.isdigit():
+            lookup |= Q(pk=int(value))
+        try:
+            return get_user_model().objects.get(lookup)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user matches {value!r}.")
+
+    def _latest_year(self, user):
+        yearly_budget = YearlyBudget.objects.filter(user=user).order_by("-date").first()
+        if yearly_budget is None:
+            raise CommandError(f"{user} has no yearly budgets.")
+        return yearly_budget.date.year
+
+    def _request(self, user, path, data=None):
+        request = RequestFactory().get(path, data or {})
+        request.user = user
+        return request
+
+    def _workloads(self, user, year):
+        service = get_budget_service()
+        month = 12 if year < datetime.date.today().year else datetime.date.today().month
+
+        def yearly_context():
+            context = service.get_yearly_budget_context(user, year, month)
+            list(context["incomes"])
+            list(context["purchases_uncategorized"])
+
+        def monthly_context():
+            context = service.get_monthly_budget_context(user, year, month)
+            list(context["incomes"])
+            list(context["purchases"])
+
+        def render_view(view, path, data=None, **kwargs):
+            def run():
+                response = view(self._request(user, path, data), **kwargs)
+                if hasattr(response, "render"):
+                    response.render()
+
+            return run
+
+        workloads = [
+            ("budget_service.yearly", yearly_context),
+            ("budget_service.monthly", monthly_context),
+            (
+                "yearly_detail",
+                render_view(
+                    YearlyBudgetDetailView.as_view(),
+                    reverse("yearly_detail", kwargs={"year": year}),
+                    year=year,
+                ),
+            ),
+            (
+                "purchase_list",
+                render_view(PurchaseListView.as_view(), reverse("purchase_list")),
+            ),
+            (
+                "purchase_list.filtered",
+                render_view(
+                    PurchaseListView.as_view(),
+                    reverse("purchase_list"),
+                    {
+                        "purchase_date_from": f"{year}-01-01",
+                        "purchase_date_to": f"{year}-12-31",
+                        "search": "a",
+                    },
+                ),
+            ),
+        ]
+
+        budget_item = (
+            BudgetItem.objects.filter(user=user, yearly_budget__date__year=year)
+            .select_related("category")
+            .order_by("category__name")
+            .first()
+        )
+        if budget_item is not None:
+            category = budget_item.category.name
+            item_kwargs = {"year": year, "month": month, "category": category}
+            next_data = {"next": reverse("yearly_detail", kwargs={"year": year})}
+            workloads += [
+                (
+                    "budget_item_detail",
+                    render_view(
+                        BudgetItemDetailView.as_view(),
+                        reverse("budget_item_detail", kwargs=item_kwargs),
+                        **item_kwargs,
+                    ),
+                ),
+                (
+                    "budgetitem_edit",
+                    render_view(
+                        budgetitem_edit,
+                        reverse("budgetitem_edit_htmx", kwargs=item_kwargs),
+                        next_data,
+                        **item_kwargs,
+                    ),
+                ),
+                (
+                    "budgetitem_bulk_edit",
+                    render_view(
+                        budgetitem_bulk_edit,
+                        reverse(
+                            "budgetitem_bulk_edit_htmx",
+                            kwargs={"year": year, "category": category},
+                        ),
+                        next_data,
+                        year=year,
+                        category=category,
+                    ),
+                ),
+                (
+                    "yearly_budget_item_detail",
+                    render_view(
+                        YearlyBudgetItemDetailView.as_view(),
+                        reverse(
+                            "yearly_budget_item_detail",
+                            kwargs={"year": year, "category": category},
+                        ),
+                        year=year,
+                        category=category,
+                    ),
+                ),
+            ]
+
+        return workloads
+
+    def _build_report(self, user, year, queries):
+        explained = []
+        seen = set()
+        for label, sql in queries:
+            if not sql.lstrip().upper().startswith("SELECT") or sql in seen:
+                continue
+            seen.add(sql)
+            explained.append({"workload": label, "sql": sql, **self._explain(sql)})
+
+        indexes = self._indexes()
+        used = set()
+        for query in explained:
+            used.update(query["indexes_used"])
+
+        return {
+            "version": REPORT_VERSION,
+            "vendor": connection.vendor,
+            "user": user.pk,
+            "year": year,
+            "queries": explained,
+            "indexes": {
+                "used": sorted(name for name in indexes if name in used),
+                "unused": sorted(name for name in indexes if name not in used),
+                "tables": indexes,
+            },
+            "summary": {
+                "queries": len(explained),
+                "full_scans": sum(1 for query in explained if query["full_scans"]),
+                "temp_btrees": sum(1 for query in explained if query["temp_btrees"]),
+            },
+        }
+
+    def _explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                return self._parse_sqlite_plan(cursor.fetchall())
+
+            cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return self._parse_postgresql_plan(plan)
+
+    def _parse_sqlite_plan(self, rows):
+        details = [row[-1] for row in rows]
+        full_scans = []
+        indexes_used = set()
+        for detail in details:
+            indexes_used.update(SQLITE_INDEX_RE.findall(detail))
+            scan = SQLITE_SCAN_RE.match(detail)
+            if scan and "INDEX" not in detail:
+                full_scans.append(scan.group(1))
+
+        return {
+            "plan": details,
+            "full_scans": sorted(full_scans),
+            "temp_btrees": sum(1 for detail in details if "TEMP B-TREE" in detail),
+            "indexes_used": sorted(indexes_used),
+        }
+
+    def _parse_postgresql_plan(self, plan):
+        full_scans = []
+        indexes_used = set()
+        temp_sorts = 0
+
+        def walk(node):
+            nonlocal temp_sorts
+            if node.get("Node Type") == "Seq Scan":
+                full_scans.append(node.get("Relation Name"))
+            if "Index Name" in node:
+                indexes_used.add(node["Index Name"])
+            if node.get("Sort Space Type") == "Disk":
+                temp_sorts += 1
+            for child in node.get("Plans", []):
+                walk(child)
+
+        root = plan[0]
+        walk(root["Plan"])
+
+        return {
+            "plan": root,
+            "full_scans": sorted(full_scans),
+            "temp_btrees": temp_sorts,
+            "indexes_used": sorted(indexes_used),
+        }
+
+    def _indexes(self):
+        """Map index name to its table and columns for the budget apps."""
+        tables = sorted(
+            {
+                model._meta.db_table
+                for app_label in APP_LABELS
+                for model in apps.get_app_config(app_label).get_models()
+            }
+        )
+        indexes = {}
+        with connection.cursor() as cursor:
+            for table in tables:
+                constraints = connection.introspection.get_constraints(cursor, table)
+                for name, constraint in constraints.items():
+                    if not constraint["index"] or constraint["primary_key"]:
+                        continue
+                    indexes[name] = {
+                        "table": table,
+                        "columns": constraint["columns"],
+                        "unique": constraint["unique"],
+                    }
+        return indexes
@@ -0,0 +1,61 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from budgets.datagen import BudgetDataGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate users with years of budgets, seasonal purchases and incomes, "
+        "receipts and recurring purchases using chunked bulk inserts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1)
+        parser.add_argument("--years", type=int, default=3)
+        parser.add_argument(
+            "--purchases-per-year",
+            type=int,
+            default=1_000,
+            help="Purchases per user per year, excluding recurring charges.",
+        )
+        parser.add_argument("--categories", type=int, default=20)
+        parser.add_argument(
+            "--last-year", type=int, help="Final budget year (default: this year)."
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--chunk-size", type=int, default=10_000)
+        parser.add_argument(
+            "--username-prefix",
+            default="generated",
+            help="Users are named <prefix>-0, <prefix>-1, ...",
+        )
+
+    def handle(self, *args, **options):
+        prefix = options["username_prefix"]
+        if get_user_model().objects.filter(username__startswith=f"{prefix}-").exists():
+            raise CommandError(
+                f"Users named {prefix}-* already exist. Choose another --username-prefix."
+            )
+
+        generator = BudgetDataGenerator(
+            users=options["users"],
+            years=options["years"],
+            purchases_per_year=options["purchases_per_year"],
+            categories=options["categories"],
+            last_year=options["last_year"],
+            seed=options["seed"],
+            chunk_size=options["chunk_size"],
+            username_prefix=prefix,
+            stdout=self.stdout,
+        )
+
+        start = time.perf_counter()
+        counts = generator.generate()
+        elapsed = time.perf_counter() - start
+
+        for model_name, count in sorted(counts.items()):
+            self.stdout.write(f"{model_name}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"Done in {elapsed:.1f}s"))
@@ -0,0 +1,35 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from budgets.models import BudgetItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete zero-amount budget items, keeping one row per category and "
+        "year. Run after enabling BUDGET_ITEMS_SPARSE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username of a single user to prune.")
+
+    def handle(self, *args, **options):
+        budget_items = BudgetItem.objects.all()
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get(username=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist.")
+            budget_items = budget_items.filter(user=user)
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            count = BudgetItem.prune(budget_items)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Deleted {count} budget items in {elapsed:.2f}s")
+        )
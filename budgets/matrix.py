@@ -0,0 +1,547 @@
+"""Columnar category × month budget engine.
+
+``MatrixBudgetService`` loads a user's year once into integer-cent grids
+(one row per category, one column per month) and computes the yearly and
+monthly contexts from that load. Sums run on the ``amount_cents`` columns,
+so arithmetic stays in integers until values are converted for display. NumPy is used when it is installed,
+otherwise rows are stored in ``array`` module buffers.
+"""
+import copy
+import datetime
+import calendar
+from array import array
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.db.models.functions import ExtractMonth
+
+from budgets.models import BudgetItem, DataVersion, MonthlyBudget, Rollover
+from budgets.services import BudgetLine, BudgetService, BudgetTotals, SavingsLine
+from monitoring.metrics import cache_requests
+from purchases.models import Income, Purchase
+from purchases.money import to_amount
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+MONTHS = 12
+MATRIX_CACHE_TIMEOUT = 60 * 60
+
+
+def _categories_filter(category_ids):
+    """A filter on ``category_ids``, where ``None`` means uncategorized."""
+    if category_ids is None:
+        return Q()
+    categories = Q(category__in=[category for category in category_ids if category is not None])
+    if None in category_ids:
+        categories |= Q(category__isnull=True)
+    return categories
+
+
+class CentsMatrix:
+    """A ``rows × 12`` grid of integer cents."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        if numpy is not None:
+            self._data = numpy.zeros((rows, MONTHS), dtype=numpy.int64)
+        else:
+            self._data = array("q", bytes(8 * rows * MONTHS))
+
+    def add(self, row, month, cents):
+        if numpy is not None:
+            self._data[row, month - 1] += cents
+        else:
+            self._data[row * MONTHS + month - 1] += cents
+
+    def set(self, row, month, cents):
+        if numpy is not None:
+            self._data[row, month - 1] = cents
+        else:
+            self._data[row * MONTHS + month - 1] = cents
+
+    def clear(self, row):
+        if numpy is not None:
+            self._data[row] = 0
+        else:
+            self._data[row * MONTHS:(row + 1) * MONTHS] = array("q", bytes(8 * MONTHS))
+
+    def copy(self):
+        clone = copy.copy(self)
+        clone._data = self._data.copy() if numpy is not None else array("q", self._data)
+        return clone
+
+    def row_totals(self, months=MONTHS):
+        """Per-row sums over the first ``months`` months."""
+        if numpy is not None:
+            return self._data[:, :months].sum(axis=1).tolist()
+        return [
+            sum(self._data[start:start + months])
+            for start in range(0, self.rows * MONTHS, MONTHS)
+        ]
+
+    def column(self, month):
+        if numpy is not None:
+            return self._data[:, month - 1].tolist()
+        return self._data[month - 1::MONTHS].tolist()
+
+
+class YearMatrix:
+    """Budgeted, spent and income cents for one user-year.
+
+    Rows are categories in name order followed by a row for uncategorized
+    activity. ``spending`` and ``savings`` hold budgeted amounts split by
+    the budget items' savings flag.
+    """
+
+    def __init__(self, user, year):
+        self.year = year
+        year_start, next_year_start = BudgetService.year_bounds(year)
+
+        budget_rows = self.budget_rows(user, year)
+        purchase_rows = self._monthly_totals(Purchase, user, year_start, next_year_start)
+        income_rows = self._monthly_totals(Income, user, year_start, next_year_start)
+
+        self.index = {}
+        self.names = []
+        for row in budget_rows:
+            self._row(row["category"], row["category__name"])
+        for row in purchase_rows + income_rows:
+            self._row(row["category"])
+        self.uncategorized = self._row(None)
+
+        self.has_spending = [False] * len(self.index)
+        self.has_savings = [False] * len(self.index)
+        self.spending = CentsMatrix(len(self.index))
+        self.savings = CentsMatrix(len(self.index))
+        self.spent = CentsMatrix(len(self.index))
+        self.income = CentsMatrix(len(self.index))
+
+        for row in budget_rows:
+            index = self.index[row["category"]]
+            if row["savings"]:
+                self.has_savings[index] = True
+                self.savings.add(index, row["month"], row["total"])
+            else:
+                self.has_spending[index] = True
+                self.spending.add(index, row["month"], row["total"])
+        for row in purchase_rows:
+            self.spent.add(self.index[row["category"]], row["month"], row["total"])
+        for row in income_rows:
+            self.income.add(self.index[row["category"]], row["month"], row["total"])
+
+        prior_rollovers = dict(
+            Rollover.objects.filter(
+                user=user,
+                yearly_budget__date__gte=datetime.date(year - 1, 1, 1),
+                yearly_budget__date__lt=year_start,
+            ).values_list("category", "amount_cents")
+        )
+        self.categories = list(self.index)
+        self.rollover = [prior_rollovers.get(category, 0) for category in self.categories]
+        self.carried_over = set(prior_rollovers)
+
+    @staticmethod
+    def budget_rows(user, year, category_ids=None):
+        """Budgeted cents per category and month, in category name order.
+
+        Only ``category_ids`` are read when given.
+        """
+        year_start, next_year_start = BudgetService.year_bounds(year)
+        categories = _categories_filter(category_ids)
+
+        return list(
+            BudgetItem.objects.filter(
+                categories,
+                user=user,
+                monthly_budget__date__gte=year_start,
+                monthly_budget__date__lt=next_year_start,
+            )
+            .values("category", "category__name", "savings")
+            .annotate(month=ExtractMonth("monthly_budget__date"), total=Sum("amount_cents"))
+            .order_by("category__name", "category")
+        )
+
+    def with_changes(self, amounts=None, rollovers=None):
+        """Return a copy with budgeted cents replaced per ``(category, month)``
+        and rollovers carried into the year replaced per category.
+
+        Raises ``ValueError`` for categories without budget items this year
+        or without a rollover from the year before.
+        """
+        clone = copy.copy(self)
+        clone.spending = self.spending.copy()
+        clone.savings = self.savings.copy()
+        clone.rollover = list(self.rollover)
+        for category, cents in (rollovers or {}).items():
+            if category not in self.carried_over:
+                raise ValueError(f"Category {category} has no rollover carried into {self.year}")
+            if category in self.index:
+                clone.rollover[self.index[category]] = cents
+        for (category, month), cents in (amounts or {}).items():
+            index = self.index.get(category)
+            if index is None or not (self.has_spending[index] or self.has_savings[index]):
+                raise ValueError(f"Category {category} has no budget items in {self.year}")
+            grid = clone.spending if self.has_spending[index] else clone.savings
+            grid.set(index, month, cents)
+        return clone
+
+    def with_categories(self, user, category_ids):
+        """Return a copy with the rows of ``category_ids`` read again.
+
+        ``None`` stands for uncategorized activity. Meant for use after a
+        write, which restores an archived year, so only the live tables are
+        read. Returns ``None`` when a category needs a row or a name this
+        load does not have.
+        """
+        if any(category not in self.index for category in category_ids):
+            return None
+        year_start, next_year_start = BudgetService.year_bounds(self.year)
+
+        clone = copy.copy(self)
+        clone.has_spending = list(self.has_spending)
+        clone.has_savings = list(self.has_savings)
+        grids = ("spending", "savings", "spent", "income")
+        for name in grids:
+            setattr(clone, name, getattr(self, name).copy())
+        for category in category_ids:
+            index = self.index[category]
+            clone.has_spending[index] = clone.has_savings[index] = False
+            for name in grids:
+                getattr(clone, name).clear(index)
+
+        for row in self.budget_rows(user, self.year, category_ids=category_ids):
+            index = self.index[row["category"]]
+            if self.names[index] is None:
+                # Newly budgeted categories take their place in name order.
+                return None
+            if row["savings"]:
+                clone.has_savings[index] = True
+                clone.savings.add(index, row["month"], row["total"])
+            else:
+                clone.has_spending[index] = True
+                clone.spending.add(index, row["month"], row["total"])
+        for model, grid in ((Purchase, clone.spent), (Income, clone.income)):
+            for row in self._monthly_totals(
+                model, user, year_start, next_year_start, category_ids, archived=False
+            ):
+                grid.add(self.index[row["category"]], row["month"], row["total"])
+        return clone
+
+    @staticmethod
+    def _monthly_totals(model, user, start, end, category_ids=None, archived=True):
+        # A past year's rows may be archived; its rows add up both tables.
+        categories = _categories_filter(category_ids)
+        querysets = [model.objects.filter(user=user, date__gte=start, date__lt=end)]
+        if archived:
+            querysets = BudgetService._entry_querysets(model, user, start, end)
+        return [
+            row
+            for queryset in querysets
+            for row in queryset.filter(categories).values("category")
+            .annotate(month=ExtractMonth("date"), total=Sum("amount_cents"))
+            .order_by()
+        ]
+
+    def _row(self, category, name=None):
+        if category not in self.index:
+            self.index[category] = len(self.index)
+            self.names.append(name)
+        return self.index[category]
+
+
+class MatrixBudgetService(BudgetService):
+    """``BudgetService`` computed from a single cached ``YearMatrix`` load.
+
+    Loads are cached per user, year and data version, so the yearly page,
+    its sections, the monthly pages and simulations of a year share one
+    load until the year's data changes. An instance also keeps the
+    matrices it used, saving the cache round trip on repeated calls.
+    """
+
+    def __init__(self):
+        self._matrices = {}
+
+    def load(self, user, year):
+        key = (user.pk, year)
+        if key not in self._matrices:
+            self._matrices[key] = self._cached_load(user, year)
+        return self._matrices[key]
+
+    @staticmethod
+    def _cached_load(user, year):
+        # Read the version before the data, so a concurrent write can only
+        # leave newer data under an older key, never the reverse.
+        version, updated_at = DataVersion.validators(user.pk, year)
+        if updated_at is None:
+            # Nothing was ever written through the versioned paths.
+            return YearMatrix(user, year)
+        key = MatrixBudgetService._cache_key(user, year, version, updated_at)
+        matrix = cache.get(key)
+        cache_requests.inc(cache="year_matrix", result="miss" if matrix is None else "hit")
+        if matrix is None:
+            matrix = YearMatrix(user, year)
+            cache.set(key, matrix, MATRIX_CACHE_TIMEOUT)
+        return matrix
+
+    @staticmethod
+    def _cache_key(user, year, version, updated_at):
+        # The timestamp keeps keys apart should a user id be reused with a
+        # fresh counter.
+        return f"year-matrix:{user.pk}:{year}:{version}:{updated_at.timestamp()}"
+
+    def categories_changed(self, user, year, validators, category_ids):
+        """Patch the load cached at ``validators`` instead of reloading the year.
+
+        Only the rows of ``category_ids`` are read again; the patched load
+        serves this instance's later calls. It is not cached under the new
+        version, as another request may have changed other categories since.
+        """
+        version, updated_at = validators
+        if updated_at is None:
+            return
+        matrix = cache.get(self._cache_key(user, year, version, updated_at))
+        cache_requests.inc(cache="year_matrix", result="miss" if matrix is None else "hit")
+        if matrix is not None:
+            matrix = matrix.with_categories(user, category_ids)
+        if matrix is not None:
+            self._matrices[(user.pk, year)] = matrix
+
+    # The matrix is a single load shared by every page, so the async
+    # variants run it as a whole instead of splitting the queries.
+    async def aget_yearly_budget_context(self, user, year: int, ytd_month: int) -> dict:
+        return await sync_to_async(self.get_yearly_budget_context)(user, year, ytd_month)
+
+    async def aget_monthly_budget_context(
+        self, user, year: int, month: int, monthly_budget=None
+    ) -> dict:
+        return await sync_to_async(self.get_monthly_budget_context)(
+            user, year, month, monthly_budget
+        )
+
+    async def aget_yearly_figures(
+        self, user, year: int, ytd_month: int, amounts=None, rollovers=None
+    ) -> dict:
+        return await sync_to_async(self.get_yearly_figures)(
+            user, year, ytd_month, amounts, rollovers
+        )
+
+    def get_yearly_budget_context(self, user, year: int, ytd_month: int) -> dict:
+        figures = self._year_figures(self.load(user, year), ytd_month)
+        incomes, purchases_uncategorized = self._yearly_listings(user, year)
+
+        return self._build_yearly_context(
+            user, year, incomes, purchases_uncategorized, *figures
+        )
+
+    def get_yearly_figures(
+        self, user, year: int, ytd_month: int, amounts=None, rollovers=None
+    ) -> dict:
+        matrix = self.load(user, year)
+        if amounts or rollovers:
+            matrix = matrix.with_changes(amounts, rollovers)
+        return self._summarize_year(*self._year_figures(matrix, ytd_month))
+
+    def _year_figures(self, matrix, ytd_month):
+        spent = matrix.spent.row_totals()
+        spent_ytd = matrix.spent.row_totals(ytd_month)
+        income = matrix.income.row_totals()
+        income_ytd = matrix.income.row_totals(ytd_month)
+
+        budget_lines, spending = self._spending_lines(
+            matrix, ytd_month, spent, spent_ytd, income, income_ytd
+        )
+        savings_lines, savings = self._savings_lines(
+            matrix, ytd_month, spent, spent_ytd, income, income_ytd
+        )
+
+        uncategorized = matrix.uncategorized
+        income_categorized = sum(income) - income[uncategorized]
+        income_categorized_ytd = sum(income_ytd) - income_ytd[uncategorized]
+        income_amounts = {
+            "total_income": to_amount(sum(income)),
+            "total_income_ytd": to_amount(sum(income_ytd)),
+            "total_income_budgeted": to_amount(income[uncategorized]),
+            "total_income_budgeted_ytd": to_amount(income_ytd[uncategorized]),
+            "total_income_category": to_amount(income_categorized),
+            "total_income_category_ytd": to_amount(income_categorized_ytd),
+        }
+
+        return budget_lines, spending, savings_lines, savings, income_amounts
+
+    def _spending_lines(self, matrix, ytd_month, spent, spent_ytd, income, income_ytd):
+        budgeted = matrix.spending.row_totals()
+        budgeted_ytd = matrix.spending.row_totals(ytd_month)
+
+        lines = []
+        totals = BudgetTotals()
+        for index, category in enumerate(matrix.categories):
+            if not matrix.has_spending[index]:
+                continue
+            rollover = matrix.rollover[index]
+            remaining_current_year = budgeted[index] - spent[index] + income[index]
+            diff_ytd = budgeted_ytd[index] - spent_ytd[index] + income_ytd[index]
+            lines.append(
+                BudgetLine(
+                    category=category,
+                    category__name=matrix.names[index],
+                    amount_total=to_amount(budgeted[index]),
+                    spent=to_amount(spent[index]),
+                    income=to_amount(income[index]),
+                    rollover=to_amount(rollover),
+                    diff=to_amount(remaining_current_year + rollover),
+                    remaining_current_year=to_amount(remaining_current_year),
+                    amount_total_ytd=to_amount(budgeted_ytd[index]),
+                    spent_ytd=to_amount(spent_ytd[index]),
+                    income_ytd=to_amount(income_ytd[index]),
+                    diff_ytd=to_amount(diff_ytd),
+                )
+            )
+            totals.spent += spent[index]
+            totals.remaining += remaining_current_year + rollover
+            totals.budgeted += budgeted[index]
+            totals.remaining_current_year += remaining_current_year
+            if rollover == 0:
+                totals.free_income += remaining_current_year
+            totals.spent_ytd += spent_ytd[index]
+            totals.remaining_ytd += diff_ytd
+            totals.budgeted_ytd += budgeted_ytd[index]
+
+        return lines, self._amounts(totals)
+
+    def _savings_lines(self, matrix, ytd_month, spent, spent_ytd, income, income_ytd):
+        budgeted = matrix.savings.row_totals()
+        budgeted_ytd = matrix.savings.row_totals(ytd_month)
+
+        lines = []
+        totals = BudgetTotals()
+        for index, category in enumerate(matrix.categories):
+            if not matrix.has_savings[index]:
+                continue
+            rollover = matrix.rollover[index]
+            saved = spent[index] + income[index]
+            saved_ytd = spent_ytd[index] + income_ytd[index]
+            diff = budgeted[index] - saved + income[index]
+            diff_ytd = budgeted_ytd[index] - saved_ytd + income_ytd[index]
+            lines.append(
+                SavingsLine(
+                    category=category,
+                    category__name=matrix.names[index],
+                    amount_total=to_amount(budgeted[index]),
+                    purchases_amount=to_amount(spent[index]),
+                    income=to_amount(income[index]),
+                    saved=to_amount(saved),
+                    rollover=to_amount(rollover),
+                    diff=to_amount(diff),
+                    amount_total_ytd=to_amount(budgeted_ytd[index]),
+                    purchases_amount_ytd=to_amount(spent_ytd[index]),
+                    income_ytd=to_amount(income_ytd[index]),
+                    saved_ytd=to_amount(saved_ytd),
+                    diff_ytd=to_amount(diff_ytd),
+                )
+            )
+            totals.spent += saved
+            totals.remaining += diff
+            totals.remaining_current_year += diff
+            totals.budgeted += budgeted[index]
+            if rollover == 0:
+                totals.free_income += diff
+            totals.spent_ytd += saved_ytd
+            totals.remaining_ytd += diff_ytd
+            totals.budgeted_ytd += budgeted_ytd[index]
+
+        return lines, self._amounts(totals)
+
+    def get_monthly_budget_context(
+        self, user, year: int, month: int, monthly_budget=None
+    ) -> dict:
+        month_start, next_month_start = self.month_bounds(year, month)
+
+        if monthly_budget is None:
+            monthly_budget = MonthlyBudget.objects.get(
+                date__gte=month_start,
+                date__lt=next_month_start,
+                user=user,
+            )
+
+        matrix = self.load(user, year)
+        spent = matrix.spent.column(month)
+        income = matrix.income.column(month)
+
+        items = BudgetItem.for_month(user, monthly_budget)
+
+        budget_items_list = []
+        savings_items_list = []
+        spending_budgeted = spending_spent = spending_remaining = 0
+        savings_budgeted = savings_saved = savings_remaining = 0
+
+        for item in items:
+            index = matrix.index.get(item.category_id)
+            item_spent = spent[index] if index is not None else 0
+            item_income = income[index] if index is not None else 0
+            amount = item.amount_cents
+            item.income = to_amount(item_income)
+
+            if item.savings:
+                saved = item_spent + item_income
+                diff = amount - saved + item_income
+                item.saved = to_amount(saved)
+                item.diff = to_amount(diff)
+                savings_items_list.append(item)
+                savings_budgeted += amount
+                savings_saved += saved
+                savings_remaining += diff
+            else:
+                diff = amount - item_spent + item_income
+                item.spent = to_amount(item_spent)
+                item.diff = to_amount(diff)
+                budget_items_list.append(item)
+                spending_budgeted += amount
+                spending_spent += item_spent
+                spending_remaining += diff
+
+        uncategorized = spent[matrix.uncategorized]
+        spending_spent += uncategorized
+        spending_remaining -= uncategorized
+
+        total_spent_saved = spending_spent + savings_saved
+        total_income = income[matrix.uncategorized]
+
+        incomes_query = self._listed_entries(
+            Income, user, month_start, next_month_start
+        ).order_by("date", "source")
+
+        purchases_list = self._listed_entries(
+            Purchase, user, month_start, next_month_start
+        ).order_by("date", "source")
+
+        return {
+            "budget_items": budget_items_list,
+            "savings_items": savings_items_list,
+            "purchases": purchases_list,
+            "incomes": incomes_query,
+            "total_budgeted": to_amount(spending_budgeted + savings_budgeted),
+            "total_spent": to_amount(spending_spent),
+            "total_spent_saved": to_amount(total_spent_saved),
+            "total_spending_budgeted": {"amount": to_amount(spending_budgeted)},
+            "total_spending_spent": {"amount": to_amount(spending_spent)},
+            "total_spending_remaining": {"amount": to_amount(spending_remaining)},
+            "total_remaining": to_amount(spending_remaining + savings_remaining),
+            "total_saved": {"amount": to_amount(savings_saved)},
+            "total_savings_budgeted": {"amount": to_amount(savings_budgeted)},
+            "total_savings_remaining": {"amount": to_amount(savings_remaining)},
+            "total_income": {"amount": to_amount(total_income)},
+            "free_income": to_amount(total_income - total_spent_saved),
+            "uncategorized_purchases": {
+                "amount": to_amount(uncategorized),
+                "remaining": to_amount(-uncategorized),
+                "budgeted": 0,
+            },
+            "months": [
+                (calendar.month_name[m], m) for m in range(1, 13)
+            ],
+        }
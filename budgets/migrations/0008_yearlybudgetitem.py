@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0007_amount_cents'),
+        ('purchases', '0011_amount_cents'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='YearlyBudgetItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('savings', models.BooleanField(default=False)),
+                ('month_1_cents', models.BigIntegerField(default=0)),
+                ('month_2_cents', models.BigIntegerField(default=0)),
+                ('month_3_cents', models.BigIntegerField(default=0)),
+                ('month_4_cents', models.BigIntegerField(default=0)),
+                ('month_5_cents', models.BigIntegerField(default=0)),
+                ('month_6_cents', models.BigIntegerField(default=0)),
+                ('month_7_cents', models.BigIntegerField(default=0)),
+                ('month_8_cents', models.BigIntegerField(default=0)),
+                ('month_9_cents', models.BigIntegerField(default=0)),
+                ('month_10_cents', models.BigIntegerField(default=0)),
+                ('month_11_cents', models.BigIntegerField(default=0)),
+                ('month_12_cents', models.BigIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='yearly_budget_items', to='purchases.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='yearly_budget_items', to=settings.AUTH_USER_MODEL)),
+                ('yearly_budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='yearly_budget_items', to='budgets.yearlybudget')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'yearly_budget'], name='idx_ybi_user_yearly')],
+                'constraints': [models.UniqueConstraint(fields=('yearly_budget', 'category', 'user', 'savings'), name='unique_yearlybudgetitem')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0008_yearlybudgetitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rollover',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
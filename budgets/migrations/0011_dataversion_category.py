@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0010_dataversion'),
+        ('purchases', '0011_amount_cents'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='dataversion',
+            name='unique_dataversion',
+        ),
+        migrations.AddField(
+            model_name='dataversion',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='data_versions', to='purchases.category'),
+        ),
+        migrations.AddConstraint(
+            model_name='dataversion',
+            constraint=models.UniqueConstraint(condition=models.Q(('category', None)), fields=('user', 'year'), name='unique_dataversion'),
+        ),
+        migrations.AddConstraint(
+            model_name='dataversion',
+            constraint=models.UniqueConstraint(fields=('user', 'year', 'category'), name='unique_dataversion_category'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0011_dataversion_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataversion',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
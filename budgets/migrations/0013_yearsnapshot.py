@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0012_dataversion_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='YearSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('version', models.PositiveIntegerField()),
+                ('release', models.CharField(blank=True, max_length=100)),
+                ('context', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='year_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('month', None)), fields=('user', 'year'), name='unique_yearsnapshot'), models.UniqueConstraint(fields=('user', 'year', 'month'), name='unique_yearsnapshot_month')],
+            },
+        ),
+    ]
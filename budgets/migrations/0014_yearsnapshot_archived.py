@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0013_yearsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='yearsnapshot',
+            name='archived',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:30
+
+import budgets.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0014_yearsnapshot_archived'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='yearsnapshot',
+            name='release',
+        ),
+        # Pickled contexts cannot be converted; their rows stay for the
+        # archived flag and are never served.
+        migrations.RemoveField(
+            model_name='yearsnapshot',
+            name='context',
+        ),
+        migrations.AddField(
+            model_name='yearsnapshot',
+            name='context',
+            field=models.JSONField(decoder=budgets.models.SnapshotDecoder, encoder=budgets.models.SnapshotEncoder, null=True),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:28
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0015_yearsnapshot_json_context'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='YearlyBudgetItem',
+        ),
+    ]
@@ -1,9 +1,16 @@
 import datetime
+import json
+from decimal import Decimal
 
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models.functions import ExtractMonth
 from django.conf import settings
+from django.utils import timezone
 
-from purchases.models import Category
+from purchases.archive import ARCHIVE_MODELS, restore_entries
+from purchases.models import Category, Income, Purchase
+from purchases.money import to_amount
 
 
 class YearlyBudget(models.Model):
@@ -89,6 +96,8 @@ class BudgetItem(models.Model):
     amount = models.DecimalField(
         max_digits=12, decimal_places=2, blank=True, null=True, default=0
     )
+    # Integer copy of ``amount`` kept in sync by a pre_save signal.
+    amount_cents = models.BigIntegerField(default=0, editable=False)
     monthly_budget = models.ForeignKey(
         MonthlyBudget,
         null=False,
@@ -115,12 +124,26 @@ class BudgetItem(models.Model):
         else:
             return f"{self.category}"
 
+    @staticmethod
+    def sparse():
+        """Whether only non-zero months are stored (``BUDGET_ITEMS_SPARSE``).
+
+        Every category-year keeps at least one row, its anchor, so the
+        category and its savings flag survive when all months are zero.
+        """
+        return getattr(settings, "BUDGET_ITEMS_SPARSE", False)
+
     @classmethod
     def create_items_and_rollovers(cls, user, year, form):
 
-        monthly_budgets = list(MonthlyBudget.objects.filter(date__year=year, user=user))
+        monthly_budgets = list(
+            MonthlyBudget.objects.filter(date__year=year, user=user).order_by("date")
+        )
         yearly_budget = YearlyBudget.objects.get(user=user, date__year=year)
 
+        if cls.sparse() and not form.instance.amount:
+            monthly_budgets = monthly_budgets[:1]
+
         for monthly_budget in monthly_budgets:
             cls.objects.create(
                 user=user,
@@ -137,6 +160,189 @@ class BudgetItem(models.Model):
             yearly_budget=yearly_budget,
         )
 
+    @classmethod
+    def clone_year(cls, user, year, target):
+        """Copy ``year``'s budget items into ``target``, creating that year.
+
+        Each copied category also gets an empty rollover row. Categories
+        ``target`` already budgets are left alone, so running the copy again
+        only adds the missing ones. Returns the number of items created.
+        """
+        yearly_budget = YearlyBudget.objects.filter(user=user, date__year=target).first()
+        if yearly_budget is None:
+            yearly_budget = YearlyBudget.objects.create(
+                user=user, date=datetime.date(target, 1, 1)
+            )
+        monthly_budgets = {
+            monthly_budget.date.month: monthly_budget
+            for monthly_budget in MonthlyBudget.objects.filter(user=user, yearly_budget=yearly_budget)
+        }
+        budgeted = cls.objects.filter(
+            user=user, monthly_budget__yearly_budget=yearly_budget
+        ).values("category_id")
+
+        items = [
+            cls(
+                user=user,
+                category_id=item.category_id,
+                amount=item.amount,
+                amount_cents=item.amount_cents,
+                monthly_budget=monthly_budgets[item.month],
+                yearly_budget=yearly_budget,
+                notes=item.notes,
+                savings=item.savings,
+            )
+            for item in cls.objects.filter(user=user, monthly_budget__date__year=year)
+            .exclude(category_id__in=budgeted)
+            .annotate(month=ExtractMonth("monthly_budget__date"))
+            .order_by("category_id", "month")
+            if item.month in monthly_budgets
+        ]
+        category_ids = {item.category_id for item in items}
+        with transaction.atomic():
+            # Bulk writes skip the signals, so bump the year here.
+            cls.objects.bulk_create(items)
+            Rollover.objects.bulk_create(
+                [
+                    Rollover(user=user, category_id=category_id, yearly_budget=yearly_budget)
+                    for category_id in sorted(category_ids)
+                ],
+                ignore_conflicts=True,
+            )
+            DataVersion.bump(user.pk, target, category_ids=category_ids)
+        return len(items)
+
+    @classmethod
+    def placeholder(cls, anchor, monthly_budget):
+        """Unsaved zero item like ``anchor`` for a month with no stored row."""
+        return cls(
+            user_id=anchor.user_id,
+            category=anchor.category,
+            monthly_budget=monthly_budget,
+            yearly_budget_id=monthly_budget.yearly_budget_id,
+            savings=anchor.savings,
+            amount=Decimal("0.00"),
+            amount_cents=0,
+        )
+
+    @classmethod
+    def for_month(cls, user, monthly_budget):
+        """Return the month's items ordered by category name.
+
+        In sparse mode categories budgeted elsewhere in the year are included
+        as unsaved zero items.
+        """
+        if not cls.sparse():
+            return list(
+                cls.objects.filter(user=user, monthly_budget=monthly_budget)
+                .select_related("category")
+                .order_by("category__name")
+            )
+
+        items = {}
+        for item in (
+            cls.objects.filter(
+                user=user, monthly_budget__yearly_budget_id=monthly_budget.yearly_budget_id
+            )
+            .select_related("category")
+            .order_by("category__name", "category")
+        ):
+            if item.monthly_budget_id == monthly_budget.pk:
+                items[item.category_id] = item
+            elif item.category_id not in items:
+                items[item.category_id] = cls.placeholder(item, monthly_budget)
+        return list(items.values())
+
+    @classmethod
+    def get_for_month(cls, user, year, month, category_id):
+        """Return the category's item for one month.
+
+        In sparse mode a missing month comes back as an unsaved zero item,
+        so saving it creates the row. Raises ``DoesNotExist`` when the
+        category has no items in the year.
+        """
+        items = cls.objects.filter(
+            user=user, monthly_budget__date__year=year, category_id=category_id
+        )
+        if not cls.sparse():
+            return items.get(monthly_budget__date__month=month)
+
+        anchor = None
+        for item in items.select_related("monthly_budget", "category"):
+            if item.monthly_budget.date.month == month:
+                return item
+            anchor = anchor or item
+        if anchor is None:
+            raise cls.DoesNotExist("BudgetItem matching query does not exist.")
+        monthly_budget = MonthlyBudget.objects.get(
+            user=user, date__year=year, date__month=month
+        )
+        return cls.placeholder(anchor, monthly_budget)
+
+    @classmethod
+    def missing_months(cls, user, yearly_budget, category_id):
+        """Unsaved zero items for the category's months with no stored row."""
+        anchor = (
+            cls.objects.filter(
+                user=user, monthly_budget__yearly_budget=yearly_budget, category_id=category_id
+            )
+            .select_related("category")
+            .first()
+        )
+        if anchor is None:
+            return []
+        stored = cls.objects.filter(
+            user=user, monthly_budget__yearly_budget=yearly_budget, category_id=category_id
+        ).values("monthly_budget_id")
+        return [
+            cls.placeholder(anchor, monthly_budget)
+            for monthly_budget in yearly_budget.monthly_budgets.exclude(pk__in=stored)
+        ]
+
+    @staticmethod
+    def prune(budget_items):
+        """Delete zero items, keeping each category-year's earliest row.
+
+        Returns the number of rows deleted.
+        """
+        groups = {}
+        for pk, user_id, yearly_budget_id, category_id, cents in budget_items.order_by(
+            "monthly_budget__date"
+        ).values_list(
+            "pk", "user_id", "monthly_budget__yearly_budget_id", "category_id", "amount_cents"
+        ):
+            groups.setdefault((user_id, yearly_budget_id, category_id), []).append((pk, cents))
+
+        zero = []
+        for items in groups.values():
+            zero_items = [pk for pk, cents in items if not cents]
+            if len(zero_items) == len(items):
+                zero_items = zero_items[1:]
+            zero += zero_items
+        if not zero:
+            return 0
+        deleted, _ = BudgetItem.objects.filter(pk__in=zero).delete()
+        return deleted
+
+    def category_year_items(self):
+        return BudgetItem.objects.filter(
+            user_id=self.user_id,
+            monthly_budget__yearly_budget_id=self.monthly_budget.yearly_budget_id,
+            category_id=self.category_id,
+        )
+
+    def clear(self):
+        """Budget nothing for this month.
+
+        Sparse mode deletes the row unless it anchors its category-year.
+        """
+        if self.pk is None:
+            return
+        self.amount = 0
+        self.save()
+        if self.sparse():
+            self.prune(self.category_year_items())
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -178,10 +384,113 @@ class Rollover(models.Model):
     amount = models.DecimalField(
         max_digits=12, decimal_places=2, blank=True, null=True, default=0
     )
+    # Integer copy of ``amount`` kept in sync by a pre_save signal.
+    amount_cents = models.BigIntegerField(default=0, editable=False)
+    # Incremented on every write so clients can detect concurrent edits.
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     def __str__(self):
         return f"Rollover {self.yearly_budget.date.year}-{self.category}"
 
+    @staticmethod
+    def update_versioned(rollovers, changes):
+        """Apply ``changes`` to ``rollovers`` in one conditional UPDATE.
+
+        ``changes`` maps category ids to ``(cents, version)``. Only rows
+        whose version still matches are written, and each written row's
+        version is incremented. Returns the number of rows updated.
+        """
+        if not changes:
+            return 0
+        matches = models.Q()
+        amounts = []
+        amounts_cents = []
+        for category_id, (cents, version) in changes.items():
+            matches |= models.Q(category_id=category_id, version=version)
+            amounts.append(
+                models.When(category_id=category_id, then=models.Value(to_amount(cents)))
+            )
+            amounts_cents.append(models.When(category_id=category_id, then=models.Value(cents)))
+        return rollovers.filter(matches).update(
+            amount=models.Case(
+                *amounts, output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            ),
+            amount_cents=models.Case(*amounts_cents, output_field=models.BigIntegerField()),
+            version=models.F("version") + 1,
+        )
+
+    @classmethod
+    def carry_over(cls, year, user=None, batch_size=1_000):
+        """Set the rollovers ``year`` carries into the next year, for one user or everyone.
+
+        Each rollover-enabled category's rollover becomes its remaining
+        amount for the year, without the rollover it received: budgeted
+        minus spent plus category income for spending, and budgeted minus
+        spent for savings, as on the yearly page, counting archived entries
+        too. The figures for every row come from one query over the year's
+        rollovers; changed rows are written with ``bulk_update``. Returns
+        the number of rows written.
+        """
+        year_start, next_year_start = datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1)
+        same_category = {"user": models.OuterRef("user"), "category": models.OuterRef("category")}
+
+        def total_cents(queryset):
+            return models.Subquery(
+                queryset.filter(**same_category)
+                .order_by()
+                .values("category")
+                .annotate(total=models.Sum("amount_cents"))
+                .values("total")
+            )
+
+        budget_items = BudgetItem.objects.filter(
+            monthly_budget__date__gte=year_start, monthly_budget__date__lt=next_year_start
+        )
+        entries = {"date__gte": year_start, "date__lt": next_year_start}
+        rollovers = cls.objects.filter(
+            yearly_budget__date__gte=year_start,
+            yearly_budget__date__lt=next_year_start,
+            category__rollover=True,
+        )
+        if user is not None:
+            rollovers = rollovers.filter(user=user)
+
+        with transaction.atomic():
+            rows = rollovers.select_for_update(of=("self",)).annotate(
+                # ``None`` when the category has no lines of that kind.
+                spending_budgeted=total_cents(budget_items.filter(savings=False)),
+                savings_budgeted=total_cents(budget_items.filter(savings=True)),
+                spent=total_cents(Purchase.objects.filter(**entries)),
+                income=total_cents(Income.objects.filter(**entries)),
+                # A closed year's entries may have been archived.
+                archived_spent=total_cents(ARCHIVE_MODELS[Purchase].objects.filter(**entries)),
+                archived_income=total_cents(ARCHIVE_MODELS[Income].objects.filter(**entries)),
+            )
+            changed = []
+            categories_by_user = {}
+            for rollover in rows:
+                spent = (rollover.spent or 0) + (rollover.archived_spent or 0)
+                income = (rollover.income or 0) + (rollover.archived_income or 0)
+                cents = 0
+                if rollover.spending_budgeted is not None:
+                    cents += rollover.spending_budgeted - spent + income
+                if rollover.savings_budgeted is not None:
+                    cents += rollover.savings_budgeted - spent
+                if cents == rollover.amount_cents and rollover.amount == to_amount(cents):
+                    continue
+                rollover.amount = to_amount(cents)
+                rollover.amount_cents = cents
+                rollover.version += 1
+                changed.append(rollover)
+                categories_by_user.setdefault(rollover.user_id, set()).add(rollover.category_id)
+
+            cls.objects.bulk_update(
+                changed, ["amount", "amount_cents", "version"], batch_size=batch_size
+            )
+            for user_id, category_ids in categories_by_user.items():
+                DataVersion.bump(user_id, year, year + 1, category_ids=category_ids)
+        return len(changed)
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -192,3 +501,241 @@ class Rollover(models.Model):
             models.Index(fields=['user', 'yearly_budget', 'category'], name='idx_rollover_user_yearly_cat'),
             models.Index(fields=['yearly_budget', 'category'], name='idx_rollover_yearly_category'),
         ]
+
+
+class DataVersion(models.Model):
+    """A per-user, per-year counter bumped whenever that year's data changes.
+
+    Cached fragments of the budget pages carry the counter in their cache
+    key, so a write makes every earlier copy unreachable instead of having
+    to find and delete it. Rows without a category version the whole year;
+    rows with one version that category's figures for the year, so a
+    cached grid row only re-renders when its own category changed. Signals
+    bump both for single-row writes; code that writes in bulk must call
+    ``bump`` itself. Purchases and incomes without a date bump the
+    ``UNDATED`` year, which only the all-years validators read.
+    """
+
+    UNDATED = 0
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="data_versions",
+    )
+    year = models.PositiveIntegerField()
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name="data_versions",
+        null=True,
+        blank=True,
+    )
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user}-{self.year}-{self.category or 'all'}-v{self.version}"
+
+    @classmethod
+    def current(cls, user_id, year):
+        return (
+            cls.objects.filter(user_id=user_id, year=year, category=None)
+            .values_list("version", flat=True)
+            .first()
+            or 0
+        )
+
+    @classmethod
+    def validators(cls, user_id, year=None):
+        """``(version, updated_at)`` of one year, or of all the user's years.
+
+        For all years the version is a token of the per-year counters, which
+        changes whenever any of them does. Both come from one indexed read.
+        """
+        rows = cls.objects.filter(user_id=user_id, category=None)
+        if year is not None:
+            return rows.filter(year=year).values_list("version", "updated_at").first() or (0, None)
+        totals = rows.aggregate(
+            version=models.Sum("version"),
+            years=models.Count("pk"),
+            updated_at=models.Max("updated_at"),
+        )
+        return f"{totals['years']}-{totals['version'] or 0}", totals["updated_at"]
+
+    @classmethod
+    def for_categories(cls, user_id, year):
+        """``{category_id: version}`` for every versioned category of the year."""
+        return dict(
+            cls.objects.filter(user_id=user_id, year=year, category__isnull=False).values_list(
+                "category_id", "version"
+            )
+        )
+
+    @classmethod
+    def bump(cls, user_id, *years, category_ids=()):
+        """Bump ``years``, and each of ``category_ids`` within them."""
+        years = set(years) - {None}
+        category_ids = set(category_ids) - {None}
+        if not years:
+            return
+        cls.objects.bulk_create(
+            [
+                cls(user_id=user_id, year=year, category_id=category_id)
+                for year in years
+                for category_id in (None, *category_ids)
+            ],
+            ignore_conflicts=True,
+        )
+        # Only closed years are archived, and those are in the past.
+        past_years = {
+            year for year in years if cls.UNDATED < year < datetime.date.today().year
+        }
+        with transaction.atomic():
+            cls.objects.filter(
+                models.Q(category=None) | models.Q(category_id__in=category_ids),
+                user_id=user_id,
+                year__in=years,
+            ).update(version=models.F("version") + 1, updated_at=timezone.now())
+            # After the update, which waits for an archiving transaction
+            # holding the year's row, so its archived rows are seen.
+            if past_years:
+                YearSnapshot.restore_archived(user_id, past_years)
+
+    @classmethod
+    def bump_all(cls, user_id, keep_snapshots=False):
+        """Invalidate every year, e.g. after a category is renamed.
+
+        With ``keep_snapshots`` current snapshots are bumped along, for
+        changes such as a new category that no closed year's figures show.
+        """
+        with transaction.atomic():
+            if keep_snapshots:
+                current = cls.objects.filter(
+                    user_id=user_id, year=models.OuterRef("year"), category=None
+                ).values("version")
+                YearSnapshot.objects.filter(
+                    user_id=user_id, version=models.Subquery(current)
+                ).update(version=models.F("version") + 1)
+            cls.objects.filter(user_id=user_id).update(
+                version=models.F("version") + 1, updated_at=timezone.now()
+            )
+            if not keep_snapshots:
+                YearSnapshot.restore_archived(user_id)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "year"],
+                condition=models.Q(category=None),
+                name="unique_dataversion",
+            ),
+            models.UniqueConstraint(
+                fields=["user", "year", "category"], name="unique_dataversion_category"
+            ),
+        ]
+
+
+class SnapshotEncoder(DjangoJSONEncoder):
+    """Encode snapshot contexts as JSON that ``SnapshotDecoder`` reads back.
+
+    Amounts and dates are tagged so they come back as ``Decimal`` and
+    ``date``. Figure rows are stored as their dicts and model instances as
+    their field values plus the attributes the budget engine set on them,
+    with ``category`` replaced by the category's name as the templates
+    show it.
+    """
+
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return {"__decimal__": str(o)}
+        if type(o) is datetime.date:
+            return {"__date__": o.isoformat()}
+        if isinstance(o, models.Model):
+            row = {key: value for key, value in vars(o).items() if not key.startswith("_")}
+            row["pk"] = o.pk
+            if hasattr(o, "category_id"):
+                row["category"] = o.category.name if o.category_id else None
+            return row
+        if hasattr(o, "as_dict"):
+            return o.as_dict()
+        return super().default(o)
+
+
+class SnapshotDecoder(json.JSONDecoder):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, object_hook=self.thaw, **kwargs)
+
+    @staticmethod
+    def thaw(value):
+        if "__decimal__" in value:
+            return Decimal(value["__decimal__"])
+        if "__date__" in value:
+            return datetime.date.fromisoformat(value["__date__"])
+        return value
+
+
+class YearSnapshot(models.Model):
+    """The frozen budget context of a closed year.
+
+    Closing a year stores its yearly context (``month`` is ``None``) and one
+    row per monthly context as JSON, written by ``budgets.snapshots``. Each
+    row records the year's ``DataVersion`` it was computed under and is
+    only served while that still matches, so any write into the year
+    reopens it without the writer having to know. A closed
+    year's rows may be archived; they are restored when the year is reopened
+    or written to, and read in place otherwise.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="year_snapshots",
+    )
+    year = models.PositiveIntegerField()
+    month = models.PositiveSmallIntegerField(null=True, blank=True)
+    version = models.PositiveIntegerField()
+    # Null for snapshots stored before contexts were JSON; never served.
+    context = models.JSONField(null=True, encoder=SnapshotEncoder, decoder=SnapshotDecoder)
+    # Set on the yearly row while the year's purchases and incomes are in
+    # the archive tables.
+    archived = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user}-{self.year}-{self.month or 'year'}-v{self.version}"
+
+    @classmethod
+    def restore_archived(cls, user_id, years=None):
+        """Move the archived rows of ``years`` (default: all) back to the live tables.
+
+        ``DataVersion.bump`` calls this as a write makes a closed year's
+        snapshot stale, so rows are only moved by writes and by reopening.
+        Returns the restored years.
+        """
+        snapshots = cls.objects.filter(user_id=user_id, month=None, archived=True)
+        if years is not None:
+            snapshots = snapshots.filter(year__in=years)
+        with transaction.atomic():
+            # Locked, so a concurrent restore of the same year waits and
+            # then finds nothing left to move.
+            archived_years = list(snapshots.select_for_update().values_list("year", flat=True))
+            if not archived_years:
+                return []
+            restore_entries(user_id, archived_years)
+            cls.objects.filter(
+                user_id=user_id, month=None, year__in=archived_years
+            ).update(archived=False)
+        return archived_years
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "year"],
+                condition=models.Q(month=None),
+                name="unique_yearsnapshot",
+            ),
+            models.UniqueConstraint(
+                fields=["user", "year", "month"], name="unique_yearsnapshot_month"
+            ),
+        ]
@@ -0,0 +1,200 @@
+"""Out-of-band HTMX updates for the yearly and monthly budget pages.
+
+Modal saves used to answer with a client redirect, which reloads the page
+the modal was opened from and recomputes all of it. When that page is a
+yearly or monthly budget page, ``PageUpdate`` answers instead with
+out-of-band swaps of just the affected category rows, the totals and the
+purchase or income table rows, and closes the modal. Figures come from
+the configured budget engine, which is told which categories changed so
+an engine that caches its loads can patch the load it had before the
+write instead of recomputing the year. Any other page still gets the redirect, as
+does any change the page cannot be patched for.
+"""
+from urllib.parse import parse_qs, urlsplit
+
+from django.db.models import Q
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.urls import Resolver404, resolve
+from django_htmx.http import HttpResponseClientRedirect, reswap, trigger_client_event
+
+from budgets.models import DataVersion
+from budgets.services import BudgetService, get_budget_service, get_ytd_month
+from purchases.models import Income, Purchase
+
+
+PAGES = ("yearly_detail", "monthly_detail")
+
+
+class PageUpdate:
+    """Collect what a modal save changed and answer with the page patch.
+
+    Create it before saving, call ``before`` with the rows a form is
+    about to change, ``saved`` with the rows after saving and
+    ``budget_changed`` with the categories whose budget changed, then
+    return ``response()``.
+    """
+
+    def __init__(self, request, next_url):
+        self.request = request
+        self.next_url = next_url
+        self.category_ids = set()
+        self.listed = {Purchase: {}, Income: {}}
+        self.changed = {Purchase: [], Income: []}
+        self.needs_reload = False
+        self.page = self._resolve_page()
+        self.validators = None
+        if self.page is not None:
+            self.validators = DataVersion.validators(request.user.pk, self.page["year"])
+
+    def _resolve_page(self):
+        htmx = getattr(self.request, "htmx", None)
+        if not htmx or not self.next_url:
+            return None
+        current = urlsplit(htmx.current_url or "")
+        if current.path != urlsplit(self.next_url).path:
+            return None
+        try:
+            match = resolve(current.path)
+        except Resolver404:
+            return None
+        if match.url_name not in PAGES:
+            return None
+
+        year = match.kwargs["year"]
+        return {
+            "path": current.path,
+            "year": year,
+            "month": match.kwargs.get("month"),
+            "ytd_month": get_ytd_month(year, parse_qs(current.query).get("ytd", [None])[0]),
+        }
+
+    def _lists(self, obj):
+        """Whether the page's purchase or income table shows ``obj``."""
+        if obj.date.year != self.page["year"]:
+            return False
+        if self.page["month"] is not None:
+            return obj.date.month == self.page["month"]
+        # The yearly page lists every income but only uncategorized purchases.
+        return isinstance(obj, Income) or obj.category_id is None
+
+    def before(self, *objects):
+        for obj in objects:
+            self.category_ids.add(obj.category_id)
+            if self.page is not None:
+                self.listed[type(obj)][obj.pk] = self._lists(obj)
+
+    def saved(self, *objects):
+        for obj in objects:
+            self.category_ids.add(obj.category_id)
+            self.changed[type(obj)].append(obj)
+
+    def budget_changed(self, *category_ids):
+        self.category_ids.update(category_ids)
+
+    def reload(self):
+        """Fall back to reloading the page, e.g. when rows change section."""
+        self.needs_reload = True
+
+    def response(self):
+        if self.page is None or self.needs_reload:
+            return HttpResponseClientRedirect(self.next_url)
+
+        service = get_budget_service()
+        service.categories_changed(
+            self.request.user, self.page["year"], self.validators, self.category_ids
+        )
+        if self.page["month"] is None:
+            context = self._yearly_context(service)
+        else:
+            context = self._monthly_context(service)
+        context.update(self._table_context())
+        context.update({"page": self.page, "return_url": self.page["path"], "oob": True})
+
+        response = HttpResponse(
+            render_to_string("budgets/_page_update.html", context, request=self.request)
+        )
+        reswap(response, "none")
+        return trigger_client_event(response, "closeModal")
+
+    def _yearly_context(self, service):
+        context = service.get_yearly_figures(
+            self.request.user, self.page["year"], self.page["ytd_month"]
+        )
+        context["spending_rows"] = [
+            line for line in context["budget_items_combined"]
+            if line.category in self.category_ids
+        ]
+        context["savings_rows"] = [
+            line for line in context["savings_items_combined"]
+            if line.category in self.category_ids
+        ]
+        return context
+
+    def _monthly_context(self, service):
+        context = service.get_monthly_budget_context(
+            self.request.user, self.page["year"], self.page["month"]
+        )
+        context["spending_rows"] = [
+            item for item in context["budget_items"] if item.category_id in self.category_ids
+        ]
+        context["savings_rows"] = [
+            item for item in context["savings_items"] if item.category_id in self.category_ids
+        ]
+        return context
+
+    def _table_context(self):
+        """Rows to replace, insert or remove in the purchase and income tables.
+
+        A row that joins a table is inserted before the first row that sorts
+        after it. Only a table that had no rows is re-rendered whole.
+        """
+        context = {}
+        for model, name in ((Purchase, "purchase"), (Income, "income")):
+            rows, joined, removed = [], [], []
+            for obj in self.changed[model]:
+                was_listed = self.listed[model].get(obj.pk, False)
+                if not self._lists(obj):
+                    if was_listed:
+                        removed.append(obj.pk)
+                elif was_listed:
+                    rows.append(obj)
+                else:
+                    joined.append(obj)
+
+            listed = self._listed_rows(model).exclude(pk__in=[obj.pk for obj in joined])
+            refresh = bool(joined) and not listed.exists()
+            context[f"{name}_table"] = self._listed_rows(model) if refresh else None
+            context[f"{name}_rows"] = rows
+            context[f"{name}_inserts"] = [] if refresh else [
+                (self._insert_position(listed, name, obj), obj)
+                for obj in sorted(joined, key=lambda obj: (obj.date, obj.source, obj.pk))
+            ]
+            context[f"removed_{name}s"] = removed
+        return context
+
+    def _listed_rows(self, model):
+        user, year, month = self.request.user, self.page["year"], self.page["month"]
+        if month is None:
+            start, end = BudgetService.year_bounds(year)
+        else:
+            start, end = BudgetService.month_bounds(year, month)
+        rows = model.objects.filter(user=user, date__gte=start, date__lt=end)
+        if month is None and model is Purchase:
+            rows = rows.filter(category=None)
+        if month is not None:
+            rows = rows.order_by("date", "source")
+        return rows.select_related("category")
+
+    def _insert_position(self, listed, name, obj):
+        """The ``hx-swap-oob`` value that puts ``obj``'s row in table order."""
+        if self.page["month"] is not None:
+            following = (
+                listed.filter(Q(date__gt=obj.date) | Q(date=obj.date, source__gt=obj.source))
+                .values_list("pk", flat=True)
+                .first()
+            )
+            if following is not None:
+                return f"beforebegin:#{name}-{following}"
+        # The yearly tables are unordered, so new rows go last as on reload.
+        return f"beforeend:#{name}-table tbody"
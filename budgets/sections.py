@@ -0,0 +1,123 @@
+"""Lazily loaded sections of the yearly budget page.
+
+The yearly page renders only its summary; the category grid, the rollover
+columns, the income table and the uncategorized purchases are fetched by
+HTMX when they scroll into view. Each section is rendered on its own and
+cached under a key holding the user's ``DataVersion`` for the year, so a
+write to that year makes the next request render it afresh. A closed year's
+sections are rendered from its snapshot.
+"""
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from budgets.models import BudgetItem, DataVersion, Rollover
+from budgets.services import BudgetService, get_budget_service
+from budgets.snapshots import load_snapshot
+from monitoring.metrics import cache_requests
+from purchases.archive import entries
+from purchases.models import Income, Purchase
+
+
+SECTION_CACHE_TIMEOUT = 60 * 60
+
+SECTIONS = {
+    "grid": "budgets/_yearly_grid.html",
+    "spending-rollovers": "budgets/_yearly_rollovers.html",
+    "savings-rollovers": "budgets/_yearly_rollovers.html",
+    "incomes": "budgets/_yearly_incomes.html",
+    "purchases": "budgets/_yearly_purchases.html",
+}
+
+
+def _section_key(user_id, year, section, ytd_month, version):
+    # Only the grid depends on the YTD month.
+    ytd = ytd_month if section == "grid" else ""
+    return f"yearly-section:{user_id}:{year}:{section}:{ytd}:{version}"
+
+
+def render_section(request, year, section, ytd_month):
+    """Return the HTML of one yearly page section, from cache when current."""
+    user = request.user
+    # Read the version before the data, so a concurrent write can only
+    # leave newer data under an older key, never the reverse.
+    version = DataVersion.current(user.pk, year)
+    key = _section_key(user.pk, year, section, ytd_month, version)
+    html = cache.get(key)
+    cache_requests.inc(cache="yearly_section", result="miss" if html is None else "hit")
+    if html is None:
+        snapshot = load_snapshot(user.pk, year, version=version) if ytd_month == 12 else None
+        if snapshot is not None:
+            context = _snapshot_section_context(snapshot, section)
+        else:
+            context = _section_context(user, year, section, ytd_month)
+        context.update(
+            {
+                "year": year,
+                "ytd_month": ytd_month,
+                "page_path": reverse("yearly_detail", kwargs={"year": year}),
+            }
+        )
+        html = render_to_string(SECTIONS[section], context, request=request)
+        cache.set(key, html, SECTION_CACHE_TIMEOUT)
+    return html
+
+
+def _snapshot_section_context(snapshot, section):
+    """The section's context taken from a closed year's frozen context."""
+    if section == "grid":
+        # Without ``row_versions`` the rows render uncached; the section
+        # itself is still cached.
+        return snapshot
+    if section == "incomes":
+        return {"incomes": snapshot["incomes"]}
+    if section == "purchases":
+        return {"purchases": snapshot["purchases_uncategorized"]}
+    if section == "savings-rollovers":
+        return {"rollovers": snapshot["rollovers_savings"]}
+    return {"rollovers": snapshot["rollovers_spending"]}
+
+
+def _section_context(user, year, section, ytd_month):
+    year_start, next_year_start = BudgetService.year_bounds(year)
+    if section == "grid":
+        context = get_budget_service().get_yearly_figures(user, year, ytd_month)
+        context["row_versions"] = DataVersion.for_categories(user.pk, year)
+        return context
+    # A reopened year's rows may still be archived; list them read-only.
+    if section == "incomes":
+        return {
+            "incomes": entries(
+                Income, year, user=user, date__gte=year_start, date__lt=next_year_start
+            )
+        }
+    if section == "purchases":
+        return {
+            "purchases": entries(
+                Purchase, year,
+                user=user, date__gte=year_start, date__lt=next_year_start, category=None,
+            )
+        }
+
+    savings_category_ids = set(
+        BudgetItem.objects.filter(
+            user=user,
+            monthly_budget__date__gte=year_start,
+            monthly_budget__date__lt=next_year_start,
+            savings=True,
+        ).values_list("category_id", flat=True)
+    )
+    savings = section == "savings-rollovers"
+    return {
+        "rollovers": [
+            rollover
+            for rollover in Rollover.objects.filter(
+                user=user,
+                yearly_budget__date__gte=year_start,
+                yearly_budget__date__lt=next_year_start,
+            )
+            .select_related("category")
+            .order_by("category__name")
+            if (rollover.category_id in savings_category_ids) == savings
+        ]
+    }
@@ -1,12 +1,87 @@
 import datetime
 import calendar
-from decimal import Decimal
 
-from django.db.models import Sum, Q, Value, DecimalField, F, ExpressionWrapper
-from django.db.models.functions import Coalesce
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Sum, Q, Value
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear
+from django.utils.module_loading import import_string
 
-from budgets.models import BudgetItem, Rollover, YearlyBudget, MonthlyBudget
-from purchases.models import Purchase, Income
+from budgets.concurrency import arun_queries, run_sequentially
+from budgets.models import BudgetItem, Rollover, MonthlyBudget
+from purchases.archive import entries, sources
+from purchases.models import ArchivedIncome, ArchivedPurchase, Purchase, Income
+from purchases.money import to_amount
+
+
+class Record:
+    """Slotted result row that also supports dict-style lookups."""
+
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.pop(name, 0))
+        if values:
+            raise TypeError(f"Unexpected fields: {', '.join(values)}")
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={value!r}" for name, value in self.as_dict().items())
+        return f"{type(self).__name__}({fields})"
+
+
+class BudgetLine(Record):
+    """One spending category in the yearly budget."""
+
+    __slots__ = (
+        "category", "category__name", "amount_total", "spent", "income",
+        "rollover", "diff", "remaining_current_year",
+        "amount_total_ytd", "spent_ytd", "income_ytd", "diff_ytd",
+    )
+
+
+class SavingsLine(Record):
+    """One savings category in the yearly budget."""
+
+    __slots__ = (
+        "category", "category__name", "amount_total", "purchases_amount",
+        "income", "saved", "rollover", "diff",
+        "amount_total_ytd", "purchases_amount_ytd", "income_ytd", "saved_ytd",
+        "diff_ytd",
+    )
+
+
+class BudgetTotals(Record):
+    """Running totals over a list of budget or savings lines.
+
+    For savings, ``spent`` is the amount saved.
+    """
+
+    __slots__ = (
+        "budgeted", "spent", "remaining", "remaining_current_year",
+        "budgeted_ytd", "spent_ytd", "remaining_ytd", "free_income",
+    )
+
+
+class YearSummary(Record):
+    """Headline figures of one year, as on the yearly budget page."""
+
+    __slots__ = ("year", "budgeted", "spent", "saved", "income", "remaining")
 
 
 class BudgetService:
@@ -26,48 +101,88 @@ class BudgetService:
     def get_monthly_budget_context(
         self, user, year: int, month: int, monthly_budget=None
     ) -> dict:
-        month_start, next_month_start = self.month_bounds(year, month)
+        if monthly_budget is None:
+            monthly_budget = self._monthly_budget(user, year, month)
+
+        queries = self._monthly_queries(user, year, month, monthly_budget)
+        return self._monthly_context(user, year, month, run_sequentially(queries))
 
+    async def aget_monthly_budget_context(
+        self, user, year: int, month: int, monthly_budget=None
+    ) -> dict:
+        """``get_monthly_budget_context`` with the aggregates run concurrently."""
         if monthly_budget is None:
-            monthly_budget = MonthlyBudget.objects.get(
-                date__gte=month_start,
-                date__lt=next_month_start,
-                user=user,
-            )
+            monthly_budget = await sync_to_async(self._monthly_budget)(user, year, month)
 
-        category_purchases = Purchase.objects.filter(
-            date__gte=month_start,
-            date__lt=next_month_start,
-            user=user,
-        ).values("category").annotate(total=Sum("amount"))
+        results = await arun_queries(
+            self._monthly_queries(user, year, month, monthly_budget)
+        )
+        return self._monthly_context(user, year, month, results)
 
-        category_incomes = Income.objects.filter(
+    def _monthly_budget(self, user, year, month):
+        month_start, next_month_start = self.month_bounds(year, month)
+        return MonthlyBudget.objects.get(
             date__gte=month_start,
             date__lt=next_month_start,
             user=user,
-        ).values("category").annotate(total=Sum("amount"))
+        )
 
-        purchases_data = {
-            item['category']: item['total']
-            for item in category_purchases
-        }
+    def _monthly_queries(self, user, year, month, monthly_budget) -> dict:
+        """The monthly page's independent queries, as zero-argument callables."""
+        month_start, next_month_start = self.month_bounds(year, month)
+
+        def querysets(model, **filters):
+            return [
+                queryset.filter(**filters)
+                for queryset in self._entry_querysets(model, user, month_start, next_month_start)
+            ]
+
+        def totals_by_category(model):
+            totals = {}
+            for queryset in querysets(model):
+                for item in queryset.values("category").annotate(total=Sum("amount_cents")):
+                    totals[item['category']] = totals.get(item['category'], 0) + item['total']
+            return totals
+
+        def total(model, **filters):
+            return sum(
+                queryset.aggregate(amount=Sum("amount_cents"))["amount"] or 0
+                for queryset in querysets(model, **filters)
+            )
 
-        incomes_data = {
-            item['category']: item['total']
-            for item in category_incomes
+        return {
+            "purchases_data": lambda: totals_by_category(Purchase),
+            "incomes_data": lambda: totals_by_category(Income),
+            "month_items": lambda: BudgetItem.for_month(user, monthly_budget),
+            "uncategorized_amount": lambda: total(Purchase, category__name=None),
+            "total_income_val": lambda: total(Income, category=None),
         }
 
-        budget_items = BudgetItem.objects.filter(
-            user=user,
-            monthly_budget=monthly_budget,
-            savings=False
-        ).select_related('category').order_by("category__name")
+    @staticmethod
+    def _entry_querysets(model, user, start, end):
+        """``model``'s rows from ``start`` to ``end``, one queryset per table.
 
-        savings_items = BudgetItem.objects.filter(
-            user=user,
-            monthly_budget=monthly_budget,
-            savings=True
-        ).select_related('category').order_by("category__name")
+        A past year's rows may be archived, so its sums add up both tables.
+        """
+        return [
+            source.objects.filter(user=user, date__gte=start, date__lt=end)
+            for source in sources(model, start.year)
+        ]
+
+    @staticmethod
+    def _listed_entries(model, user, start, end, **filters):
+        """``model``'s rows from ``start`` to ``end`` for the page tables."""
+        return entries(model, start.year, user=user, date__gte=start, date__lt=end, **filters)
+
+    def _monthly_context(self, user, year, month, results) -> dict:
+        month_start, next_month_start = self.month_bounds(year, month)
+
+        purchases_data = results["purchases_data"]
+        incomes_data = results["incomes_data"]
+
+        month_items = results["month_items"]
+        budget_items = [item for item in month_items if not item.savings]
+        savings_items = [item for item in month_items if item.savings]
 
         # Process Spending Items
         budget_items_list = []
@@ -79,15 +194,15 @@ class BudgetService:
             category_id = item.category.id
             spent = purchases_data.get(category_id, 0) or 0
             income = incomes_data.get(category_id, 0) or 0
-            diff = item.amount - spent + income
+            diff = item.amount_cents - spent + income
 
-            item.spent = spent
-            item.income = income
-            item.diff = diff
+            item.spent = to_amount(spent)
+            item.income = to_amount(income)
+            item.diff = to_amount(diff)
             
             budget_items_list.append(item)
 
-            total_spending_budgeted += item.amount
+            total_spending_budgeted += item.amount_cents
             total_spending_spent += spent
             total_spending_remaining += diff
 
@@ -104,29 +219,24 @@ class BudgetService:
             
             # For savings, "saved" amounts come from purchases (transfers out) and direct income
             saved = spent + income
-            diff = item.amount - saved + income 
+            diff = item.amount_cents - saved + income 
             
-            item.saved = saved
-            item.income = income
-            item.diff = diff
+            item.saved = to_amount(saved)
+            item.income = to_amount(income)
+            item.diff = to_amount(diff)
             
             savings_items_list.append(item)
 
-            total_savings_budgeted += item.amount
+            total_savings_budgeted += item.amount_cents
             total_saved += saved
             total_savings_remaining += diff
 
         # Uncategorized Purchases
-        uncategorized_amount = Purchase.objects.filter(
-            user=user,
-            category__name=None,
-            date__gte=month_start,
-            date__lt=next_month_start,
-        ).aggregate(amount=Sum("amount"))["amount"] or 0
+        uncategorized_amount = results["uncategorized_amount"]
 
         uncategorized_purchases = {
-            "amount": uncategorized_amount,
-            "remaining": (0 - uncategorized_amount),
+            "amount": to_amount(uncategorized_amount),
+            "remaining": to_amount(0 - uncategorized_amount),
             "budgeted": 0,
         }
 
@@ -139,39 +249,35 @@ class BudgetService:
         total_remaining = total_spending_remaining + total_savings_remaining
 
         # Income Processing
-        incomes_query = Income.objects.filter(
-            user=user,
-            date__gte=month_start,
-            date__lt=next_month_start,
-        ).order_by("date", "source").select_related("category")
-        
-        total_income_val = incomes_query.filter(category=None).aggregate(amount=Sum("amount"))["amount"] or 0
+        incomes_query = self._listed_entries(
+            Income, user, month_start, next_month_start
+        ).order_by("date", "source")
+
+        total_income_val = results["total_income_val"]
         free_income = total_income_val - total_spent_saved
-        total_income = {"amount": total_income_val}
+        total_income = {"amount": to_amount(total_income_val)}
 
-        purchases_list = Purchase.objects.filter(
-            user=user,
-            date__gte=month_start,
-            date__lt=next_month_start,
-        ).order_by("date", "source").select_related("category")
+        purchases_list = self._listed_entries(
+            Purchase, user, month_start, next_month_start
+        ).order_by("date", "source")
 
         return {
             "budget_items": budget_items_list,
             "savings_items": savings_items_list,
             "purchases": purchases_list,
             "incomes": incomes_query,
-            "total_budgeted": total_budgeted,
-            "total_spent": total_spending_spent,
-            "total_spent_saved": total_spent_saved,
-            "total_spending_budgeted": { "amount": total_spending_budgeted },
-            "total_spending_spent": { "amount": total_spending_spent },
-            "total_spending_remaining": { "amount": total_spending_remaining },
-            "total_remaining": total_remaining,
-            "total_saved": { "amount": total_saved },
-            "total_savings_budgeted": { "amount": total_savings_budgeted },
-            "total_savings_remaining": { "amount": total_savings_remaining },
+            "total_budgeted": to_amount(total_budgeted),
+            "total_spent": to_amount(total_spending_spent),
+            "total_spent_saved": to_amount(total_spent_saved),
+            "total_spending_budgeted": { "amount": to_amount(total_spending_budgeted) },
+            "total_spending_spent": { "amount": to_amount(total_spending_spent) },
+            "total_spending_remaining": { "amount": to_amount(total_spending_remaining) },
+            "total_remaining": to_amount(total_remaining),
+            "total_saved": { "amount": to_amount(total_saved) },
+            "total_savings_budgeted": { "amount": to_amount(total_savings_budgeted) },
+            "total_savings_remaining": { "amount": to_amount(total_savings_remaining) },
             "total_income": total_income,
-            "free_income": free_income,
+            "free_income": to_amount(free_income),
             "uncategorized_purchases": uncategorized_purchases,
             "months": [
                 (calendar.month_name[m], m) for m in range(1, 13)
@@ -182,73 +288,249 @@ class BudgetService:
         """
         Orchestrates the gathering of all budget data for the YearlyBudgetDetailView.
         """
-        
-        year_start, next_year_start = self.year_bounds(year)
-        _, ytd_end = self.month_bounds(year, ytd_month)
+        queries = self._yearly_queries(user, year, ytd_month)
+        return self._yearly_context(user, year, ytd_month, run_sequentially(queries))
 
-        purchases = Purchase.objects.filter(
-            user=user,
-            date__gte=year_start,
-            date__lt=next_year_start,
+    async def aget_yearly_budget_context(self, user, year: int, ytd_month: int) -> dict:
+        """``get_yearly_budget_context`` with the aggregates run concurrently."""
+        results = await arun_queries(self._yearly_queries(user, year, ytd_month))
+        return self._yearly_context(user, year, ytd_month, results)
+
+    def _yearly_listings(self, user, year):
+        """The yearly page's income and uncategorized purchase tables."""
+        year_start, next_year_start = self.year_bounds(year)
+        incomes = self._listed_entries(Income, user, year_start, next_year_start)
+        purchases_uncategorized = self._listed_entries(
+            Purchase, user, year_start, next_year_start, category=None
         )
+        return incomes, purchases_uncategorized
 
-        purchases_uncategorized = purchases.filter(category=None)
+    def _yearly_queries(self, user, year: int, ytd_month: int) -> dict:
+        """The yearly page's independent queries, as zero-argument callables."""
+        year_start, next_year_start = self.year_bounds(year)
+        _, ytd_end = self.month_bounds(year, ytd_month)
+        purchases = self._entry_querysets(Purchase, user, year_start, next_year_start)
+        incomes = self._entry_querysets(Income, user, year_start, next_year_start)
+
+        def totals_by_category(querysets):
+            totals = {}
+            for queryset in querysets:
+                for item in queryset.values('category').annotate(
+                    total=Sum('amount_cents'),
+                    total_ytd=Sum('amount_cents', filter=Q(date__lt=ytd_end))
+                ):
+                    data = totals.setdefault(item['category'], {'total': 0, 'total_ytd': 0})
+                    data['total'] += item['total']
+                    data['total_ytd'] += item['total_ytd'] or 0
+            return totals
 
-        incomes = Income.objects.filter(
-            user=user,
-            date__gte=year_start,
-            date__lt=next_year_start,
-        ).select_related("category")
-
-        purchases_data = {
-            item['category']: {'total': item['total'], 'total_ytd': item['total_ytd']}
-            for item in purchases.values('category').annotate(
-                total=Sum('amount'),
-                total_ytd=Sum('amount', filter=Q(date__lt=ytd_end))
-            )
-        }
-        
-        incomes_data = {
-            item['category']: {'total': item['total'], 'total_ytd': item['total_ytd']}
-            for item in incomes.values('category').annotate(
-                total=Sum('amount'),
-                total_ytd=Sum('amount', filter=Q(date__lt=ytd_end))
-            )
+        return {
+            "purchases_data": lambda: totals_by_category(purchases),
+            "incomes_data": lambda: totals_by_category(incomes),
+            "rollovers_by_category": lambda: dict(
+                Rollover.objects.filter(
+                    user=user,
+                    yearly_budget__date__gte=datetime.date(year - 1, 1, 1),
+                    yearly_budget__date__lt=year_start,
+                ).values_list('category', 'amount_cents')
+            ),
+            "budget_rows": lambda: list(
+                self._budget_item_totals(user, year, ytd_month, savings=False)
+            ),
+            "savings_rows": lambda: list(
+                self._budget_item_totals(user, year, ytd_month, savings=True)
+            ),
+            "income_amounts": lambda: self._aggregate_incomes(incomes, ytd_end),
+            "rollovers": lambda: list(self._rollovers(user, year)),
         }
-        
-        rollovers_by_category = dict(
-            Rollover.objects.filter(
-                user=user,
-                yearly_budget__date__gte=datetime.date(year - 1, 1, 1),
-                yearly_budget__date__lt=year_start,
-            ).values_list('category', 'amount')
+
+    def _yearly_context(self, user, year: int, ytd_month: int, results: dict) -> dict:
+        incomes, purchases_uncategorized = self._yearly_listings(user, year)
+        return self._build_yearly_context(
+            user, year, incomes, purchases_uncategorized,
+            *self._year_lines(user, year, ytd_month, results),
+            results["income_amounts"],
+            rollovers=results["rollovers"],
         )
 
-        budget_items_context = self._process_spending_items(
-            user, year, ytd_month, purchases_data, incomes_data, rollovers_by_category
+    def get_yearly_figures(
+        self, user, year: int, ytd_month: int, amounts=None, rollovers=None
+    ) -> dict:
+        """Every computed figure of the yearly context, without its tables.
+
+        ``amounts`` optionally maps ``(category_id, month)`` to hypothetical
+        budgeted cents and ``rollovers`` maps category ids to hypothetical
+        cents carried into the year; both replace the stored values without
+        any writes. Raises ``ValueError`` for categories without budget items
+        this year or without a rollover from the year before.
+        """
+        queries = self._figure_queries(user, year, ytd_month, amounts)
+        return self._result_figures(
+            user, year, ytd_month, run_sequentially(queries), amounts, rollovers
         )
 
-        savings_items_context = self._process_savings_items(
-            user, year, ytd_month, purchases_data, incomes_data, rollovers_by_category
+    async def aget_yearly_figures(
+        self, user, year: int, ytd_month: int, amounts=None, rollovers=None
+    ) -> dict:
+        """``get_yearly_figures`` with the aggregates run concurrently."""
+        results = await arun_queries(self._figure_queries(user, year, ytd_month, amounts))
+        return self._result_figures(user, year, ytd_month, results, amounts, rollovers)
+
+    def categories_changed(self, user, year: int, validators, category_ids):
+        """Note that a write changed ``category_ids`` of ``user``'s ``year``.
+
+        ``validators`` are the year's ``DataVersion.validators`` read before
+        the write. Engines that cache their loads use it to patch the earlier
+        load; this one keeps none and computes the next figures in full.
+        """
+
+    def _figure_queries(self, user, year, ytd_month, amounts):
+        queries = self._yearly_queries(user, year, ytd_month)
+        del queries["rollovers"]
+        if amounts:
+            year_start, next_year_start = self.year_bounds(year)
+            queries["budgeted_months"] = lambda: {
+                (row["category"], row["savings"], row["month"]): row["total"]
+                for row in BudgetItem.objects.filter(
+                    user=user,
+                    monthly_budget__date__gte=year_start,
+                    monthly_budget__date__lt=next_year_start,
+                    category_id__in={category_id for category_id, _ in amounts},
+                )
+                .values("category", "savings")
+                .annotate(month=ExtractMonth("monthly_budget__date"), total=Sum("amount_cents"))
+                .order_by()
+            }
+        return queries
+
+    def _result_figures(self, user, year, ytd_month, results, amounts, rollovers=None):
+        if amounts:
+            self._apply_amounts(year, ytd_month, results, amounts)
+        if rollovers:
+            self._apply_rollovers(year, results, rollovers)
+        return self._summarize_year(
+            *self._year_lines(user, year, ytd_month, results), results["income_amounts"]
         )
-        
-        # Calculate Global Totals
-        total_budgeted = budget_items_context['total_spending_budgeted'] + savings_items_context['total_savings_budgeted']
-        total_spent_saved = budget_items_context['total_spending_spent'] + savings_items_context['total_saved']
-        total_remaining = budget_items_context['total_spending_remaining'] + savings_items_context['total_savings_remaining']
-        total_remaining_current_year = (
-            budget_items_context['total_spending_remaining_current_year'] + savings_items_context['total_savings_remaining']
+
+    @staticmethod
+    def _apply_amounts(year, ytd_month, results, amounts):
+        """Move the budget rows' totals in ``results`` to ``amounts``.
+
+        A category budgeted as both spending and savings has its spending
+        months replaced, as in ``MatrixBudgetService``.
+        """
+        rows = {}
+        for name, savings in (("savings_rows", True), ("budget_rows", False)):
+            results[name] = [dict(row) for row in results[name]]
+            for row in results[name]:
+                rows[row["category"]] = (row, savings)
+        for (category_id, month), cents in amounts.items():
+            if category_id not in rows:
+                raise ValueError(f"Category {category_id} has no budget items in {year}")
+            row, savings = rows[category_id]
+            change = cents - results["budgeted_months"].get((category_id, savings, month), 0)
+            row["amount_total"] += change
+            if month <= ytd_month:
+                row["amount_total_ytd"] = (row["amount_total_ytd"] or 0) + change
+
+    @staticmethod
+    def _apply_rollovers(year, results, rollovers):
+        """Replace the rollovers carried into ``year`` in ``results``."""
+        carried = dict(results["rollovers_by_category"])
+        for category_id, cents in rollovers.items():
+            if category_id not in carried:
+                raise ValueError(f"Category {category_id} has no rollover carried into {year}")
+            carried[category_id] = cents
+        results["rollovers_by_category"] = carried
+
+    def _year_lines(self, user, year, ytd_month, results):
+        """Budget and savings lines with their totals, from the query results."""
+        purchases_data = results["purchases_data"]
+        incomes_data = results["incomes_data"]
+        rollovers_by_category = results["rollovers_by_category"]
+
+        budget_lines, spending = self._process_spending_items(
+            user, year, ytd_month, purchases_data, incomes_data, rollovers_by_category,
+            budget_rows=results["budget_rows"],
         )
 
-        total_budgeted_ytd = budget_items_context['total_spending_budgeted_ytd'] + savings_items_context['total_savings_budgeted_ytd']
-        total_spent_saved_ytd = budget_items_context['total_spending_spent_ytd'] + savings_items_context['total_saved_ytd']
-        total_remaining_ytd = budget_items_context['total_spending_remaining_ytd'] + savings_items_context['total_savings_remaining_ytd']
+        savings_lines, savings = self._process_savings_items(
+            user, year, ytd_month, purchases_data, incomes_data, rollovers_by_category,
+            savings_rows=results["savings_rows"],
+        )
+        return budget_lines, spending, savings_lines, savings
+
+    def get_yearly_summaries(self, user) -> dict:
+        """``{year: YearSummary}`` for every year the user has data in.
+
+        A fixed handful of grouped queries covers all years at once: budget
+        items by year, category and savings flag, purchases and incomes (live
+        and archived) by year and category, and rollovers by year. The figures
+        follow ``get_yearly_budget_context``: ``spent`` is spending
+        categories only, ``saved`` includes savings income and ``remaining``
+        is ``total_remaining``. Undated purchases and incomes belong to no year
+        and are left out.
+        """
+        def totals_by_year_and_category(*models, date_field="date"):
+            totals = {}
+            for model in models:
+                rows = (
+                    model.objects.filter(user=user, **{f"{date_field}__isnull": False})
+                    .annotate(year=ExtractYear(date_field))
+                    .values("year", "category")
+                    .annotate(total=Sum("amount_cents"))
+                    .order_by()
+                )
+                for row in rows:
+                    key = (row["year"], row["category"])
+                    totals[key] = totals.get(key, 0) + row["total"]
+            return totals
+
+        # Closed years' rows may sit in the archive tables.
+        purchases = totals_by_year_and_category(Purchase, ArchivedPurchase)
+        incomes = totals_by_year_and_category(Income, ArchivedIncome)
+        rollovers = totals_by_year_and_category(Rollover, date_field="yearly_budget__date")
+        budget_rows = (
+            BudgetItem.objects.filter(user=user)
+            .annotate(year=ExtractYear("monthly_budget__date"))
+            .values("year", "category", "savings")
+            .annotate(total=Sum("amount_cents"))
+            .order_by()
+        )
 
-        income_context = self._process_income_totals(incomes, ytd_end, total_spent_saved, total_spent_saved_ytd, total_budgeted, total_budgeted_ytd)
-        
-        free_income = budget_items_context['free_income_spending'] + savings_items_context['free_income_savings']
+        years = {year for year, _ in purchases} | {year for year, _ in incomes}
+        summaries = {year: YearSummary(year=year) for year in years}
+        for row in budget_rows:
+            year, category_id = row["year"], row["category"]
+            summary = summaries.setdefault(year, YearSummary(year=year))
+            amount = row["total"]
+            spent = purchases.get((year, category_id)) or 0
+            income = incomes.get((year, category_id)) or 0
+            summary.budgeted += amount
+            if row["savings"]:
+                summary.saved += spent + income
+                summary.remaining += amount - spent
+            else:
+                # Rollovers are stored on the year they were made and carried
+                # into the next one.
+                rollover = rollovers.get((year - 1, category_id)) or 0
+                summary.spent += spent
+                summary.remaining += amount - spent + income + rollover
+
+        for (year, _), total in incomes.items():
+            summaries[year].income += total
+        return {
+            year: YearSummary(year=year, **{
+                name: to_amount(cents)
+                for name, cents in summary.as_dict().items()
+                if name != "year"
+            })
+            for year, summary in summaries.items()
+        }
 
-        rollovers = (
+    def _rollovers(self, user, year):
+        year_start, next_year_start = self.year_bounds(year)
+        return (
             Rollover.objects.filter(
                 user=user,
                 yearly_budget__date__gte=year_start,
@@ -257,8 +539,16 @@ class BudgetService:
             .select_related("category", "yearly_budget")
             .order_by("category__name")
         )
-        
-        savings_category_ids = savings_items_context['savings_category_ids']
+
+    def _build_yearly_context(
+        self, user, year, incomes, purchases_uncategorized,
+        budget_lines, spending, savings_lines, savings, income_amounts,
+        rollovers=None,
+    ) -> dict:
+        if rollovers is None:
+            rollovers = self._rollovers(user, year)
+
+        savings_category_ids = {line.category for line in savings_lines}
         rollovers_spending = []
         rollovers_savings = []
         
@@ -273,7 +563,33 @@ class BudgetService:
             "purchases_uncategorized": purchases_uncategorized,
             "rollovers_spending": rollovers_spending,
             "rollovers_savings": rollovers_savings,
-            
+            "months": [
+                (calendar.month_name[month], month) for month in range(1, 13)
+            ],
+        }
+        context.update(
+            self._summarize_year(budget_lines, spending, savings_lines, savings, income_amounts)
+        )
+
+        return context
+
+    def _summarize_year(self, budget_lines, spending, savings_lines, savings, income_amounts) -> dict:
+        """Every computed figure of the yearly context, without querysets."""
+        # Calculate Global Totals
+        total_budgeted = spending.budgeted + savings.budgeted
+        total_spent_saved = spending.spent + savings.spent
+        total_remaining = spending.remaining + savings.remaining
+        total_remaining_current_year = (
+            spending.remaining_current_year + savings.remaining_current_year
+        )
+
+        total_budgeted_ytd = spending.budgeted_ytd + savings.budgeted_ytd
+        total_spent_saved_ytd = spending.spent_ytd + savings.spent_ytd
+        total_remaining_ytd = spending.remaining_ytd + savings.remaining_ytd
+
+        income_context = self._process_income_totals(income_amounts, total_spent_saved, total_spent_saved_ytd, total_budgeted, total_budgeted_ytd)
+
+        summary = {
             "total_budgeted": total_budgeted,
             "total_spent_saved": total_spent_saved,
             "total_remaining": total_remaining,
@@ -283,57 +599,56 @@ class BudgetService:
             "total_spent_saved_ytd": total_spent_saved_ytd,
             "total_remaining_ytd": total_remaining_ytd,
             
-            "free_income": free_income,
-            
-            "months": [
-                (calendar.month_name[month], month) for month in range(1, 13)
-            ],
+            "free_income": spending.free_income + savings.free_income,
+
+            "budget_items_combined": budget_lines,
+            "total_spending_spent": spending.spent,
+            "total_spending_remaining": spending.remaining,
+            "total_spending_budgeted": spending.budgeted,
+            "total_spending_remaining_current_year": spending.remaining_current_year,
+            "total_spending_spent_ytd": spending.spent_ytd,
+            "total_spending_remaining_ytd": spending.remaining_ytd,
+            "total_spending_budgeted_ytd": spending.budgeted_ytd,
+
+            "savings_items_combined": savings_lines,
+            "total_saved": savings.spent,
+            "total_savings_budgeted": savings.budgeted,
+            "total_savings_remaining": savings.remaining,
+            "total_saved_ytd": savings.spent_ytd,
+            "total_savings_budgeted_ytd": savings.budgeted_ytd,
+            "total_savings_remaining_ytd": savings.remaining_ytd,
         }
-        
-        context.update(budget_items_context)
-        context.update(savings_items_context)
-        context.update(income_context)
-        
-        # Remove internal keys that aren't needed in template
-        context.pop('savings_category_ids', None)
-        context.pop('free_income_spending', None)
-        context.pop('free_income_savings', None)
+        summary.update(income_context)
 
-        return context
+        return summary
 
-    def _process_spending_items(self, user, year, ytd_month, purchases_data, incomes_data, rollovers_by_category):
+    def _budget_item_totals(self, user, year, ytd_month, savings):
         year_start, next_year_start = self.year_bounds(year)
         _, ytd_end = self.month_bounds(year, ytd_month)
 
-        budgetitems = (
+        return (
             BudgetItem.objects.filter(user=user)
             .filter(
                 monthly_budget__date__gte=year_start,
                 monthly_budget__date__lt=next_year_start,
-                savings=False,
+                savings=savings,
             )
             .values("category", "category__name")
             .annotate(
-                amount_total=Sum("amount"),
-                amount_total_ytd=Sum("amount", filter=Q(monthly_budget__date__lt=ytd_end)),
+                amount_total=Sum("amount_cents"),
+                amount_total_ytd=Sum("amount_cents", filter=Q(monthly_budget__date__lt=ytd_end)),
             )
             .order_by("category__name")
         )
-        
-        budgetitems_list = []
-        budgetitems_ytd_list = []
-        
-        total_spending_spent = 0
-        total_spending_remaining = 0
-        total_spending_budgeted = 0
-        total_spending_remaining_current_year = 0
-        free_income_spending = 0
-        
-        total_spending_spent_ytd = 0
-        total_spending_remaining_ytd = 0
-        total_spending_budgeted_ytd = 0
 
-        for item in budgetitems:
+    def _process_spending_items(self, user, year, ytd_month, purchases_data, incomes_data, rollovers_by_category, budget_rows=None):
+        if budget_rows is None:
+            budget_rows = self._budget_item_totals(user, year, ytd_month, savings=False)
+
+        lines = []
+        totals = BudgetTotals()
+
+        for item in budget_rows:
             category_id = item['category']
             
             purchase_data = purchases_data.get(category_id, {'total': 0, 'total_ytd': 0})
@@ -345,108 +660,50 @@ class BudgetService:
             
             spent_ytd = purchase_data['total_ytd'] or 0
             income_ytd = income_data['total_ytd'] or 0
+            amount_total = item['amount_total']
             amount_total_ytd = item['amount_total_ytd'] or 0
-            
-            item.update({
-                'spent': spent,
-                'income': income,
-                'rollover': rollover,
-                'diff': item['amount_total'] - spent + income + rollover,
-                'remaining_current_year': item['amount_total'] - spent + income,
-            })
-            budgetitems_list.append(item)
-
-            ytd_item = {
-                'category': category_id,
-                'category__name': item['category__name'],
-                'amount_total_ytd': amount_total_ytd,
-                'spent': spent_ytd,
-                'income': income_ytd,
-                'diff_ytd': amount_total_ytd - spent_ytd + income_ytd,
-                'remaining_current_year_ytd': amount_total_ytd - spent_ytd + income_ytd,
-            }
-            budgetitems_ytd_list.append(ytd_item)
+            remaining_current_year = amount_total - spent + income
+
+            diff_ytd = amount_total_ytd - spent_ytd + income_ytd
+
+            line = BudgetLine(
+                category=category_id,
+                category__name=item['category__name'],
+                amount_total=to_amount(amount_total),
+                spent=to_amount(spent),
+                income=to_amount(income),
+                rollover=to_amount(rollover),
+                diff=to_amount(remaining_current_year + rollover),
+                remaining_current_year=to_amount(remaining_current_year),
+                amount_total_ytd=to_amount(amount_total_ytd),
+                spent_ytd=to_amount(spent_ytd),
+                income_ytd=to_amount(income_ytd),
+                diff_ytd=to_amount(diff_ytd),
+            )
+            lines.append(line)
 
-            total_spending_spent += spent
-            total_spending_remaining += item['diff']
-            total_spending_budgeted += item['amount_total']
-            total_spending_remaining_current_year += item['remaining_current_year']
+            totals.spent += spent
+            totals.remaining += remaining_current_year + rollover
+            totals.budgeted += amount_total
+            totals.remaining_current_year += remaining_current_year
             if rollover == 0:
-                free_income_spending += item['remaining_current_year']
+                totals.free_income += remaining_current_year
                 
-            total_spending_spent_ytd += spent_ytd
-            total_spending_remaining_ytd += ytd_item['diff_ytd']
-            total_spending_budgeted_ytd += amount_total_ytd
-            
-        # Combine for template
-        budgetitems_dict = {item["category__name"]: item for item in budgetitems_list}
-        budgetitems_ytd_dict = {item["category__name"]: item for item in budgetitems_ytd_list}
-        
-        budget_items_combined = []
-        for category_name in budgetitems_dict.keys():
-            budget_item = budgetitems_dict[category_name]
-            ytd_item = budgetitems_ytd_dict.get(category_name, {
-                "amount_total_ytd": 0, "diff_ytd": 0, "spent": 0
-            })
-            
-            budget_items_combined.append({
-                "category__name": category_name,
-                "amount_total": budget_item["amount_total"],
-                "spent": budget_item["spent"],
-                "diff": budget_item["diff"],
-                "amount_total_ytd": ytd_item.get("amount_total_ytd", 0),
-                "diff_ytd": ytd_item.get("diff_ytd", 0),
-                "spent_ytd": ytd_item.get("spent", 0),
-            })
+            totals.spent_ytd += spent_ytd
+            totals.remaining_ytd += diff_ytd
+            totals.budgeted_ytd += amount_total_ytd
 
-        return {
-            "budget_items_combined": budget_items_combined,
-            "total_spending_spent": total_spending_spent,
-            "total_spending_remaining": total_spending_remaining,
-            "total_spending_budgeted": total_spending_budgeted,
-            "total_spending_remaining_current_year": total_spending_remaining_current_year,
-            "total_spending_spent_ytd": total_spending_spent_ytd,
-            "total_spending_remaining_ytd": total_spending_remaining_ytd,
-            "total_spending_budgeted_ytd": total_spending_budgeted_ytd,
-            "free_income_spending": free_income_spending,
-        }
+        return lines, self._amounts(totals)
 
-    def _process_savings_items(self, user, year, ytd_month, purchases_data, incomes_data, rollovers_by_category):
-        year_start, next_year_start = self.year_bounds(year)
-        _, ytd_end = self.month_bounds(year, ytd_month)
+    def _process_savings_items(self, user, year, ytd_month, purchases_data, incomes_data, rollovers_by_category, savings_rows=None):
+        if savings_rows is None:
+            savings_rows = self._budget_item_totals(user, year, ytd_month, savings=True)
 
-        savings_items = (
-            BudgetItem.objects.filter(
-                user=user,
-                monthly_budget__date__gte=year_start,
-                monthly_budget__date__lt=next_year_start,
-                savings=True,
-            )
-            .values("category", "category__name")
-            .annotate(
-                amount_total=Sum("amount"),
-                amount_total_ytd=Sum("amount", filter=Q(monthly_budget__date__lt=ytd_end)),
-            )
-            .order_by("category__name")
-        )
-        
-        savings_items_list = []
-        savings_items_ytd_list = []
-        
-        total_saved = 0
-        total_savings_remaining = 0
-        total_savings_budgeted = 0
-        free_income_savings = 0
-        
-        total_saved_ytd = 0
-        total_savings_remaining_ytd = 0
-        total_savings_budgeted_ytd = 0
-        
-        savings_category_ids = set()
+        lines = []
+        totals = BudgetTotals()
 
-        for item in savings_items:
+        for item in savings_rows:
             category_id = item['category']
-            savings_category_ids.add(category_id)
             
             p_data = purchases_data.get(category_id, {'total': 0, 'total_ytd': 0})
             i_data = incomes_data.get(category_id, {'total': 0, 'total_ytd': 0})
@@ -459,98 +716,79 @@ class BudgetService:
             purchases_amount_ytd = p_data['total_ytd'] or 0
             income_ytd = i_data['total_ytd'] or 0
             saved_ytd = purchases_amount_ytd + income_ytd
+            amount_total = item['amount_total']
             amount_total_ytd = item['amount_total_ytd'] or 0
-            
-            item.update({
-                'income': income,
-                'purchases_amount': purchases_amount,
-                'saved': saved,
-                'rollover': rollover,
-                'diff': item['amount_total'] - saved + income,
-            })
-            savings_items_list.append(item)
 
-            ytd_item = {
-                'category': category_id,
-                'category__name': item['category__name'],
-                'amount_total_ytd': amount_total_ytd,
-                'income': income_ytd,
-                'purchases_amount': purchases_amount_ytd,
-                'saved': saved_ytd,
-                'diff_ytd': amount_total_ytd - saved_ytd + income_ytd,
-            }
-            savings_items_ytd_list.append(ytd_item)
+            diff = amount_total - saved + income
+            diff_ytd = amount_total_ytd - saved_ytd + income_ytd
+
+            line = SavingsLine(
+                category=category_id,
+                category__name=item['category__name'],
+                amount_total=to_amount(amount_total),
+                purchases_amount=to_amount(purchases_amount),
+                income=to_amount(income),
+                saved=to_amount(saved),
+                rollover=to_amount(rollover),
+                diff=to_amount(diff),
+                amount_total_ytd=to_amount(amount_total_ytd),
+                purchases_amount_ytd=to_amount(purchases_amount_ytd),
+                income_ytd=to_amount(income_ytd),
+                saved_ytd=to_amount(saved_ytd),
+                diff_ytd=to_amount(diff_ytd),
+            )
+            lines.append(line)
 
-            total_saved += saved
-            total_savings_remaining += item['diff']
-            total_savings_budgeted += item['amount_total']
+            totals.spent += saved
+            totals.remaining += diff
+            totals.remaining_current_year += diff
+            totals.budgeted += amount_total
             if rollover == 0:
-                free_income_savings += item['diff']
+                totals.free_income += diff
                 
-            total_saved_ytd += saved_ytd
-            total_savings_remaining_ytd += ytd_item['diff_ytd']
-            total_savings_budgeted_ytd += amount_total_ytd
-            
-        # Combine for template
-        savings_items_dict = {item["category__name"]: item for item in savings_items_list}
-        savings_items_ytd_dict = {item["category__name"]: item for item in savings_items_ytd_list}
-        
-        savings_items_combined = []
-        for category_name in savings_items_dict.keys():
-            savings_item = savings_items_dict[category_name]
-            ytd_item = savings_items_ytd_dict.get(category_name, {
-                "amount_total_ytd": 0, "diff_ytd": 0, "saved": 0
-            })
-            
-            savings_items_combined.append({
-                "category__name": category_name,
-                "amount_total": savings_item["amount_total"],
-                "saved": savings_item["saved"],
-                "diff": savings_item["diff"],
-                "amount_total_ytd": ytd_item.get("amount_total_ytd", 0),
-                "diff_ytd": ytd_item.get("diff_ytd", 0),
-                "saved_ytd": ytd_item.get("saved", 0),
-            })
+            totals.spent_ytd += saved_ytd
+            totals.remaining_ytd += diff_ytd
+            totals.budgeted_ytd += amount_total_ytd
 
-        return {
-            "savings_items_combined": savings_items_combined,
-            "total_saved": total_saved,
-            "total_savings_budgeted": total_savings_budgeted,
-            "total_savings_remaining": total_savings_remaining,
-            "total_saved_ytd": total_saved_ytd,
-            "total_savings_budgeted_ytd": total_savings_budgeted_ytd,
-            "total_savings_remaining_ytd": total_savings_remaining_ytd,
-            "free_income_savings": free_income_savings,
-            "savings_category_ids": savings_category_ids,
-        }
+        return lines, self._amounts(totals)
 
-    def _process_income_totals(self, incomes, ytd_end, total_spent_saved, total_spent_saved_ytd, total_budgeted, total_budgeted_ytd):
-        income_aggregates = incomes.aggregate(
-            total_income=ExpressionWrapper(
-                Coalesce(Sum("amount"), Value(0)), output_field=DecimalField()
-            ),
-            total_income_ytd=ExpressionWrapper(
-                Coalesce(Sum("amount", filter=Q(date__lt=ytd_end)), Value(0)),
-                output_field=DecimalField()
+    @staticmethod
+    def _amounts(totals):
+        """``totals`` with every cent figure converted to a money amount."""
+        return BudgetTotals(
+            **{name: to_amount(cents) for name, cents in totals.as_dict().items()}
+        )
+
+    def _aggregate_incomes(self, incomes, ytd_end):
+        """Income totals over ``incomes``, a queryset per table."""
+        cents = {}
+        for queryset in incomes:
+            for name, total in self._income_cents(queryset, ytd_end).items():
+                cents[name] = cents.get(name, 0) + total
+        return {name: to_amount(total) for name, total in cents.items()}
+
+    @staticmethod
+    def _income_cents(incomes, ytd_end):
+        return incomes.aggregate(
+            total_income=Coalesce(Sum("amount_cents"), Value(0)),
+            total_income_ytd=Coalesce(
+                Sum("amount_cents", filter=Q(date__lt=ytd_end)), Value(0)
             ),
-            total_income_budgeted=ExpressionWrapper(
-                Coalesce(Sum("amount", filter=Q(category=None)), Value(0)), 
-                output_field=DecimalField()
+            total_income_budgeted=Coalesce(
+                Sum("amount_cents", filter=Q(category=None)), Value(0)
             ),
-            total_income_budgeted_ytd=ExpressionWrapper(
-                Coalesce(Sum("amount", filter=Q(category=None, date__lt=ytd_end)), Value(0)),
-                output_field=DecimalField()
+            total_income_budgeted_ytd=Coalesce(
+                Sum("amount_cents", filter=Q(category=None, date__lt=ytd_end)), Value(0)
             ),
-            total_income_category=ExpressionWrapper(
-                Coalesce(Sum("amount", filter=~Q(category=None)), Value(0)), 
-                output_field=DecimalField()
+            total_income_category=Coalesce(
+                Sum("amount_cents", filter=~Q(category=None)), Value(0)
             ),
-            total_income_category_ytd=ExpressionWrapper(
-                Coalesce(Sum("amount", filter=Q(~Q(category=None), date__lt=ytd_end)), Value(0)),
-                output_field=DecimalField()
+            total_income_category_ytd=Coalesce(
+                Sum("amount_cents", filter=Q(~Q(category=None), date__lt=ytd_end)), Value(0)
             ),
         )
 
+    def _process_income_totals(self, income_aggregates, total_spent_saved, total_spent_saved_ytd, total_budgeted, total_budgeted_ytd):
         total_income = {"amount": income_aggregates["total_income"]}
         total_income_ytd = {"amount": income_aggregates["total_income_ytd"]}
         total_income_budgeted = {"amount": income_aggregates["total_income_budgeted"]}
@@ -582,3 +820,38 @@ class BudgetService:
             "budgeted_income_spent_diff": budgeted_income_spent_diff,
             "budgeted_income_spent_diff_ytd": budgeted_income_spent_diff_ytd,
         }
+
+
+BUDGET_ENGINES = {
+    "service": "budgets.services.BudgetService",
+    "matrix": "budgets.matrix.MatrixBudgetService",
+}
+
+
+def get_budget_service():
+    """Return a new instance of the engine named by ``settings.BUDGET_ENGINE``.
+
+    The setting is either a key of ``BUDGET_ENGINES`` or a dotted path.
+    """
+    engine = getattr(settings, "BUDGET_ENGINE", "service")
+    return import_string(BUDGET_ENGINES.get(engine, engine))()
+
+
+def get_ytd_month(year, requested=None):
+    """Last month included in year-to-date figures.
+
+    Past years always use December; otherwise ``requested`` is used when it
+    is a valid month, falling back to the current month.
+    """
+    if datetime.datetime.now().year > year:
+        return 12
+
+    current_month = datetime.datetime.now().month
+    try:
+        ytd_month = int(requested if requested is not None else current_month)
+    except (TypeError, ValueError):
+        return current_month
+
+    if not 1 <= ytd_month <= 12:
+        return current_month
+    return ytd_month
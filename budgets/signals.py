@@ -0,0 +1,157 @@
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from purchases.models import Category, Income, Purchase
+from purchases.money import to_cents
+
+from .models import (
+    BudgetItem,
+    DataVersion,
+    MonthlyBudget,
+    Rollover,
+    YearlyBudget,
+)
+
+
+@receiver(pre_save, sender=BudgetItem)
+@receiver(pre_save, sender=Rollover)
+def sync_amount_cents(sender, instance, **kwargs):
+    instance.amount_cents = to_cents(instance.amount)
+
+
+@receiver(pre_save, sender=Rollover)
+def bump_rollover_version(sender, instance, raw=False, **kwargs):
+    if instance.pk is not None and not raw:
+        instance.version += 1
+
+
+@receiver(post_init, sender=BudgetItem)
+def remember_budget_item_category(sender, instance, **kwargs):
+    # Lets post_save invalidate the old category when an item is moved.
+    instance._saved_category_id = instance.category_id
+
+
+# Data versions: every write bumps the years whose pages show the row, so
+# cached page fragments for those years are no longer used.
+
+
+def _deleting_user(origin):
+    # Nothing is left to invalidate when the user goes, and re-creating
+    # their version rows mid-cascade would break the delete.
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, get_user_model())
+
+
+def _year(instance):
+    if "date" not in instance.__dict__:
+        # Deferred, so unknown.
+        return None
+    date = instance.__dict__["date"]
+    return date.year if date is not None else DataVersion.UNDATED
+
+
+@receiver(post_init, sender=Purchase)
+@receiver(post_init, sender=Income)
+def remember_year_and_category(sender, instance, **kwargs):
+    # Lets post_save invalidate the old year and category when a row moves.
+    instance._saved_year = _year(instance)
+    instance._saved_category_id = instance.__dict__.get("category_id")
+
+
+@receiver(post_save, sender=Purchase)
+@receiver(post_save, sender=Income)
+def bump_version_on_entry_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    DataVersion.bump(
+        instance.user_id,
+        _year(instance),
+        instance._saved_year,
+        category_ids=(instance.category_id, instance._saved_category_id),
+    )
+    instance._saved_year = _year(instance)
+    instance._saved_category_id = instance.category_id
+
+
+@receiver(post_delete, sender=Purchase)
+@receiver(post_delete, sender=Income)
+def bump_version_on_entry_delete(sender, instance, origin=None, **kwargs):
+    if _deleting_user(origin):
+        return
+    DataVersion.bump(instance.user_id, _year(instance), category_ids=(instance.category_id,))
+
+
+def _budget_item_year(instance):
+    return (
+        MonthlyBudget.objects.filter(pk=instance.monthly_budget_id)
+        .values_list("date__year", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=BudgetItem)
+def bump_version_on_budget_item_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        DataVersion.bump(
+            instance.user_id,
+            _budget_item_year(instance),
+            category_ids=(instance.category_id, instance._saved_category_id),
+        )
+    instance._saved_category_id = instance.category_id
+
+
+@receiver(post_delete, sender=BudgetItem)
+def bump_version_on_budget_item_delete(sender, instance, origin=None, **kwargs):
+    if _deleting_user(origin):
+        return
+    DataVersion.bump(
+        instance.user_id, _budget_item_year(instance), category_ids=(instance.category_id,)
+    )
+
+
+def _bump_rollover_years(instance):
+    year = (
+        YearlyBudget.objects.filter(pk=instance.yearly_budget_id)
+        .values_list("date__year", flat=True)
+        .first()
+    )
+    if year is not None:
+        # A rollover also feeds the following year's figures.
+        DataVersion.bump(instance.user_id, year, year + 1, category_ids=(instance.category_id,))
+
+
+@receiver(post_save, sender=Rollover)
+def bump_version_on_rollover_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _bump_rollover_years(instance)
+
+
+@receiver(post_delete, sender=Rollover)
+def bump_version_on_rollover_delete(sender, instance, origin=None, **kwargs):
+    if _deleting_user(origin):
+        return
+    _bump_rollover_years(instance)
+
+
+@receiver(post_save, sender=YearlyBudget)
+def bump_version_on_yearly_budget_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        DataVersion.bump(instance.user_id, instance.date.year)
+
+
+@receiver(post_delete, sender=YearlyBudget)
+def bump_version_on_yearly_budget_delete(sender, instance, origin=None, **kwargs):
+    if not _deleting_user(origin):
+        DataVersion.bump(instance.user_id, instance.date.year)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_versions_on_category_change(
+    sender, instance, raw=False, origin=None, created=False, **kwargs
+):
+    if not raw and not _deleting_user(origin):
+        # A new category only changes forms and pickers; closed years stay closed.
+        DataVersion.bump_all(instance.user_id, keep_snapshots=created)
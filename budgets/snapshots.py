@@ -0,0 +1,147 @@
+"""Frozen budget contexts for closed years.
+
+``close_year`` computes a past year's yearly context and its twelve monthly
+contexts once and stores them as ``YearSnapshot`` rows. The yearly and
+monthly pages and the yearly page sections serve a closed year from its
+snapshot, one indexed read, instead of aggregating it again. A snapshot is
+only served while the year's ``DataVersion`` is the one it was computed
+under, so a late write into the year, including a rollover carried in from
+the year before, reopens it. Contexts are stored as JSON: figures as plain
+dicts and listed rows as dicts of their field values, so no model class is
+needed to read them back. ``archive_year`` then moves a closed year's
+purchases and incomes to cold tables. Reopening the year or writing into
+it moves them back; a year computed without its snapshot, say with a
+year-to-date month before December, reads the archive tables alongside
+the live ones and moves nothing.
+"""
+import datetime
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from budgets.models import DataVersion, MonthlyBudget, YearSnapshot
+from budgets.services import get_budget_service
+from purchases.archive import archive_entries
+
+def can_close(year):
+    """Only finished years are closed; their YTD month is always December."""
+    return year < datetime.date.today().year
+
+
+def close_year(user, year, progress=None):
+    """Store a snapshot of ``year`` for ``user`` and return how many contexts it holds.
+
+    ``progress(done, total)`` is called after each computed context.
+    """
+    if not can_close(year):
+        raise ValueError(f"{year} is not over yet.")
+
+    # Bump first so cached pages and sections of the open year revalidate,
+    # then read the version before the data: a write that lands while the
+    # contexts are computed leaves a snapshot that is never served.
+    DataVersion.bump(user.pk, year)
+    version = DataVersion.current(user.pk, year)
+    service = get_budget_service()
+    contexts = {None: service.get_yearly_budget_context(user=user, year=year, ytd_month=12)}
+    monthly_budgets = list(MonthlyBudget.objects.filter(user=user, date__year=year))
+    for monthly_budget in monthly_budgets:
+        if progress is not None:
+            progress(len(contexts), len(monthly_budgets) + 1)
+        month = monthly_budget.date.month
+        contexts[month] = service.get_monthly_budget_context(
+            user=user, year=year, month=month, monthly_budget=monthly_budget
+        )
+
+    snapshots = [
+        YearSnapshot(
+            user=user,
+            year=year,
+            month=month,
+            version=version,
+            context=_freeze(context),
+        )
+        for month, context in contexts.items()
+    ]
+    with transaction.atomic():
+        YearSnapshot.objects.filter(user=user, year=year).delete()
+        YearSnapshot.objects.bulk_create(snapshots)
+    return len(snapshots)
+
+
+def reopen_year(user, year):
+    """Drop the snapshot of ``year`` so its pages are computed live again."""
+    with transaction.atomic():
+        # Bumping restores archived rows, which needs the snapshot's flag.
+        DataVersion.bump(user.pk, year)
+        YearSnapshot.objects.filter(user=user, year=year).delete()
+
+
+def archive_year(user, year):
+    """Move a closed year's purchases and incomes to the archive tables.
+
+    Returns ``{model: rows moved}``; an already archived year moves nothing.
+    Raises ``ValueError`` unless the year has a current snapshot.
+    """
+    with transaction.atomic():
+        # Lock the year's version row: a concurrent write then bumps it only
+        # after this commits and restores what was archived here.
+        version = _lock_version(user.pk, year)
+        snapshot = YearSnapshot.objects.filter(
+            user=user,
+            year=year,
+            month=None,
+            version=version,
+            context__isnull=False,
+        ).first()
+        if snapshot is None:
+            raise ValueError(f"{year} is not closed.")
+        if snapshot.archived:
+            return {}
+        moved = archive_entries(user.pk, year)
+        _revalidate(user.pk, year)
+        snapshot.archived = True
+        snapshot.save(update_fields=["archived"])
+    return moved
+
+
+def _lock_version(user_id, year):
+    return (
+        DataVersion.objects.select_for_update()
+        .filter(user_id=user_id, year=year, category=None)
+        .values_list("version", flat=True)
+        .first()
+    )
+
+
+def _revalidate(user_id, year):
+    # Archived rows are listed read-only, so pages listing the year's rows
+    # must revalidate whenever they move; a current snapshot moves along.
+    current = DataVersion.current(user_id, year)
+    YearSnapshot.objects.filter(user_id=user_id, year=year, version=current).update(
+        version=models.F("version") + 1
+    )
+    DataVersion.objects.filter(user_id=user_id, year=year, category=None).update(
+        version=models.F("version") + 1, updated_at=timezone.now()
+    )
+
+
+def load_snapshot(user_id, year, month=None, version=None):
+    """The frozen context of a closed year or month, or ``None`` if open.
+
+    Pass ``version`` when the caller already read the year's ``DataVersion``.
+    """
+    if version is None:
+        version = DataVersion.current(user_id, year)
+    return (
+        YearSnapshot.objects.filter(user_id=user_id, year=year, month=month, version=version)
+        .values_list("context", flat=True)
+        .first()
+    )
+
+
+def _freeze(context):
+    """Evaluate the context's querysets so the snapshot holds plain rows."""
+    return {
+        key: list(value) if isinstance(value, models.QuerySet) else value
+        for key, value in context.items()
+    }
@@ -0,0 +1,71 @@
+"""Per-row caching for the budget grids.
+
+``{% cached_row name versions category_id vary_on... %}`` caches its body
+under the fragment ``name``, the category and that category's
+``DataVersion`` taken from the ``versions`` mapping, plus any further
+``vary_on`` values such as the year, month or YTD month. A write to the
+category bumps its version, so only that category's rows re-render. Without
+a ``versions`` mapping in the context the body is rendered uncached.
+"""
+import time
+
+from django import template
+from django.core.cache import cache
+
+from monitoring.metrics import cache_requests, fragment_render_duration
+
+
+register = template.Library()
+
+ROW_CACHE_TIMEOUT = 60 * 60
+
+
+class CachedRowNode(template.Node):
+    def __init__(self, nodelist, name, versions, category_id, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.versions = versions
+        self.category_id = category_id
+        self.vary_on = vary_on
+
+    def render(self, context):
+        versions = self.versions.resolve(context, ignore_failures=True)
+        if versions is None:
+            return self.nodelist.render(context)
+
+        start = time.perf_counter()
+        name = self.name.resolve(context)
+        category_id = self.category_id.resolve(context)
+        key = ":".join(
+            str(part)
+            for part in (
+                "budget-row",
+                name,
+                category_id,
+                versions.get(category_id, 0),
+                *(var.resolve(context) for var in self.vary_on),
+            )
+        )
+        html = cache.get(key)
+        result = "miss" if html is None else "hit"
+        if html is None:
+            html = self.nodelist.render(context)
+            cache.set(key, html, ROW_CACHE_TIMEOUT)
+        cache_requests.inc(cache="budget_row", result=result)
+        fragment_render_duration.observe(
+            time.perf_counter() - start, fragment=name, result=result
+        )
+        return html
+
+
+@register.tag
+def cached_row(parser, token):
+    bits = token.split_contents()
+    if len(bits) < 4:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' takes a name, a versions mapping and a category id."
+        )
+    nodelist = parser.parse(("endcached_row",))
+    parser.delete_first_token()
+    name, versions, category_id, *vary_on = (parser.compile_filter(bit) for bit in bits[1:])
+    return CachedRowNode(nodelist, name, versions, category_id, vary_on)
@@ -0,0 +1,19 @@
+"""Project URLs with the async budget views routed ahead of the sync ones."""
+from django.urls import path
+
+from budgets.views import AsyncMonthlyBudgetDetailView, AsyncYearlyBudgetDetailView
+from project.urls import urlpatterns as project_urlpatterns
+
+
+urlpatterns = [
+    path(
+        "budgets/<int:year>/<int:month>",
+        AsyncMonthlyBudgetDetailView.as_view(),
+        name="monthly_detail",
+    ),
+    path(
+        "budgets/<int:year>",
+        AsyncYearlyBudgetDetailView.as_view(),
+        name="yearly_detail",
+    ),
+] + project_urlpatterns
@@ -0,0 +1,308 @@
+"""Differential testing harness for alternative budget engines.
+
+An engine is any class whose instances have ``get_yearly_budget_context``
+and ``get_monthly_budget_context`` methods, like ``BudgetService``. A fresh
+instance is created for every dataset so per-instance caches never leak
+between datasets. The harness
+generates random datasets, renders every context with the reference
+``BudgetService`` and with the candidate engine, and compares them key by
+key down to the cent. A failing dataset is shrunk to a minimal one before
+it is reported.
+"""
+import datetime
+import itertools
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+
+from budgets.models import BudgetItem, Rollover, YearlyBudget
+from budgets.services import BudgetService
+from purchases.models import Category, Income, Purchase
+from purchases.money import sync_amount_cents
+
+
+CENT = Decimal("0.01")
+YEAR = 2023
+MAX_SHRINK_ATTEMPTS = 200
+
+_usernames = itertools.count()
+
+
+def generate_spec(rng):
+    """Return a random dataset description built from plain data."""
+    categories = []
+    for _ in range(rng.randint(1, 6)):
+        budgeted = rng.random() < 0.85
+        categories.append(
+            {
+                "savings": rng.random() < 0.3,
+                "rollover": rng.random() < 0.4,
+                "budgeted": budgeted,
+                "amounts": [
+                    rng.choice((0, rng.randrange(1, 100_000))) for _ in range(12)
+                ],
+                "prior_rollover": rng.choice((0, 0, rng.randrange(-20_000, 50_000))),
+                "rollover_amount": rng.choice((0, rng.randrange(0, 50_000))),
+            }
+        )
+
+    def transactions(count, low, high):
+        return [
+            {
+                "category": rng.choice([None] + list(range(len(categories)))),
+                "month": rng.randint(1, 12),
+                "day": rng.randint(1, 28),
+                "cents": rng.randrange(low, high),
+            }
+            for _ in range(count)
+        ]
+
+    return {
+        "ytd_month": rng.randint(1, 12),
+        "categories": categories,
+        "purchases": transactions(rng.randint(0, 25), 1, 50_000),
+        "incomes": transactions(rng.randint(0, 8), 1, 500_000),
+    }
+
+
+def _cents(value):
+    return Decimal(value) / 100
+
+
+def build_dataset(spec):
+    """Create the rows described by ``spec`` and return the new user."""
+    user = get_user_model().objects.create_user(
+        username=f"equivalence-{next(_usernames)}"
+    )
+    prior_budget = YearlyBudget.objects.create(user=user, date=datetime.date(YEAR - 1, 1, 1))
+    yearly_budget = YearlyBudget.objects.create(user=user, date=datetime.date(YEAR, 1, 1))
+    monthly_budgets = list(yearly_budget.monthly_budgets.order_by("date"))
+
+    categories = []
+    for index, category_spec in enumerate(spec["categories"]):
+        category = Category.objects.create(
+            user=user, name=f"Category {index}", rollover=category_spec["rollover"]
+        )
+        categories.append(category)
+        Rollover.objects.create(
+            user=user,
+            yearly_budget=prior_budget,
+            category=category,
+            amount=_cents(category_spec["prior_rollover"]),
+        )
+        if not category_spec["budgeted"]:
+            continue
+        Rollover.objects.create(
+            user=user,
+            yearly_budget=yearly_budget,
+            category=category,
+            amount=_cents(category_spec["rollover_amount"]),
+        )
+        BudgetItem.objects.bulk_create(
+            sync_amount_cents(
+                [
+                    BudgetItem(
+                        user=user,
+                        category=category,
+                        monthly_budget=monthly_budget,
+                        yearly_budget=yearly_budget,
+                        amount=_cents(amount),
+                        savings=category_spec["savings"],
+                    )
+                    for month, (monthly_budget, amount) in enumerate(
+                        zip(monthly_budgets, category_spec["amounts"])
+                    )
+                    if amount or not BudgetItem.sparse()
+                    or (month == 0 and not any(category_spec["amounts"]))
+                ]
+            )
+        )
+
+    def rows(model, entries):
+        model.objects.bulk_create(
+            sync_amount_cents(
+                [
+                    model(
+                        user=user,
+                        category=None if entry["category"] is None else categories[entry["category"]],
+                        date=datetime.date(YEAR, entry["month"], entry["day"]),
+                        amount=_cents(entry["cents"]),
+                    )
+                    for entry in entries
+                ]
+            )
+        )
+
+    rows(Purchase, spec["purchases"])
+    rows(Income, spec["incomes"])
+    return user
+
+
+def normalize(value):
+    """Reduce a context value to plain comparable data."""
+    if value is None or isinstance(value, (bool, str, datetime.date)):
+        return value
+    if isinstance(value, (int, float, Decimal)):
+        return str(Decimal(value).quantize(CENT))
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, models.QuerySet):
+        return [normalize(item) for item in value]
+    if isinstance(value, models.Model):
+        attributes = {
+            key: item
+            for key, item in vars(value).items()
+            if not key.startswith("_") and not isinstance(item, models.Model)
+        }
+        return normalize(attributes)
+    if isinstance(value, (list, tuple, set)):
+        items = sorted(value) if isinstance(value, set) else value
+        return [normalize(item) for item in items]
+    if hasattr(value, "__slots__"):
+        return normalize(
+            {slot: getattr(value, slot) for slot in value.__slots__}
+        )
+    return repr(value)
+
+
+def diff(expected, actual, path="context"):
+    """Return human-readable differences between two normalized values."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        differences = []
+        for key in expected:
+            if key not in actual:
+                differences.append(f"{path}[{key!r}] is missing")
+            else:
+                differences += diff(expected[key], actual[key], f"{path}[{key!r}]")
+        return differences
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [f"{path} has {len(actual)} items, expected {len(expected)}"]
+        differences = []
+        for index, (left, right) in enumerate(zip(expected, actual)):
+            differences += diff(left, right, f"{path}[{index}]")
+        return differences
+    if expected != actual:
+        return [f"{path} is {actual!r}, expected {expected!r}"]
+    return []
+
+
+def compare_engines(spec, engine_class, reference_class=BudgetService):
+    """Build ``spec`` and return every difference between the two engines."""
+    engine = engine_class()
+    reference = reference_class()
+    with transaction.atomic():
+        user = build_dataset(spec)
+        differences = diff(
+            normalize(reference.get_yearly_budget_context(user, YEAR, spec["ytd_month"])),
+            normalize(engine.get_yearly_budget_context(user, YEAR, spec["ytd_month"])),
+            "yearly",
+        )
+        for month in range(1, 13):
+            differences += diff(
+                normalize(reference.get_monthly_budget_context(user, YEAR, month)),
+                normalize(engine.get_monthly_budget_context(user, YEAR, month)),
+                f"monthly[{month}]",
+            )
+        transaction.set_rollback(True)
+    return differences
+
+
+def _shrink_candidates(spec):
+    """Yield simpler variants of ``spec``, largest reductions first."""
+    for key in ("purchases", "incomes", "categories"):
+        items = spec[key]
+        size = len(items)
+        while size >= 1:
+            for start in range(0, len(items), size):
+                remaining = items[:start] + items[start + size:]
+                if key == "categories":
+                    yield _drop_category(spec, start, size)
+                else:
+                    yield {**spec, key: remaining}
+            size //= 2
+
+    for index, category in enumerate(spec["categories"]):
+        for field in ("prior_rollover", "rollover_amount"):
+            if category[field]:
+                yield _replace_category(spec, index, {field: 0})
+        for month, amount in enumerate(category["amounts"]):
+            if amount:
+                amounts = list(category["amounts"])
+                amounts[month] = 0
+                yield _replace_category(spec, index, {"amounts": amounts})
+
+    for key in ("purchases", "incomes"):
+        for index, entry in enumerate(spec[key]):
+            if entry["cents"] != 1:
+                entries = list(spec[key])
+                entries[index] = {**entry, "cents": 1}
+                yield {**spec, key: entries}
+
+
+def _replace_category(spec, index, changes):
+    categories = list(spec["categories"])
+    categories[index] = {**categories[index], **changes}
+    return {**spec, "categories": categories}
+
+
+def _drop_category(spec, start, size):
+    dropped = set(range(start, start + size))
+    kept = [index for index in range(len(spec["categories"])) if index not in dropped]
+    mapping = {index: position for position, index in enumerate(kept)}
+    mapping[None] = None
+
+    def remap(entries):
+        return [
+            {**entry, "category": mapping[entry["category"]]}
+            for entry in entries
+            if entry["category"] in mapping
+        ]
+
+    return {
+        **spec,
+        "categories": [
+            category
+            for index, category in enumerate(spec["categories"])
+            if index not in dropped
+        ],
+        "purchases": remap(spec["purchases"]),
+        "incomes": remap(spec["incomes"]),
+    }
+
+
+def shrink(spec, engine_class, reference_class=BudgetService):
+    """Return the smallest variant of ``spec`` that still shows a difference."""
+    attempts = 0
+    improved = True
+    while improved and attempts < MAX_SHRINK_ATTEMPTS:
+        improved = False
+        for candidate in _shrink_candidates(spec):
+            attempts += 1
+            if candidate["categories"] and compare_engines(candidate, engine_class, reference_class):
+                spec = candidate
+                improved = True
+                break
+            if attempts >= MAX_SHRINK_ATTEMPTS:
+                break
+    return spec
+
+
+def check_equivalence(engine_class, runs=20, seed=0, reference_class=BudgetService):
+    """Compare ``engine_class`` with ``BudgetService`` on ``runs`` random datasets.
+
+    Raises ``AssertionError`` describing a minimal failing dataset.
+    """
+    rng = random.Random(seed)
+    for run in range(runs):
+        spec = generate_spec(rng)
+        if not compare_engines(spec, engine_class, reference_class):
+            continue
+        minimal = shrink(spec, engine_class, reference_class)
+        differences = compare_engines(minimal, engine_class, reference_class)
+        raise AssertionError(
+            f"Engine differs from BudgetService on run {run} (seed {seed}).\n"
+            f"Minimal dataset: {minimal!r}\n" + "\n".join(differences[:20])
+        )
@@ -0,0 +1,306 @@
+import datetime
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from budgets.models import BudgetItem, YearSnapshot
+from budgets.forms import BudgetItemForm
+from purchases.models import Purchase
+from purchases.tests.factories import CategoryFactory, IncomeFactory, PurchaseFactory
+from .factories import BudgetItemFactory, RolloverFactory, YearlyBudgetFactory
+
+
+User = get_user_model()
+
+
+class TestExplainQueriesCommand(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        cls.year = datetime.date.today().year
+        YearlyBudgetFactory(user=cls.user, date=datetime.date(cls.year, 1, 1))
+        category = CategoryFactory(user=cls.user, name="Groceries")
+        form = BudgetItemForm({"category": category, "amount": 100}, user=cls.user)
+        form.is_valid()
+        BudgetItem.create_items_and_rollovers(cls.user, cls.year, form)
+        PurchaseFactory(
+            user=cls.user, category=category, date=datetime.date(cls.year, 1, 5)
+        )
+        IncomeFactory(user=cls.user, category=None, date=datetime.date(cls.year, 1, 1))
+
+    def test_report_covers_hot_queries(self):
+        out = StringIO()
+        call_command("explain_queries", "--user", "testuser", stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report["vendor"], "sqlite")
+        self.assertEqual(report["year"], self.year)
+        workloads = {query["workload"] for query in report["queries"]}
+        self.assertTrue(
+            {
+                "budget_service.yearly",
+                "budget_service.monthly",
+                "purchase_list",
+                "budgetitem_bulk_edit",
+            }
+            <= workloads
+        )
+        for query in report["queries"]:
+            self.assertTrue(query["plan"])
+            self.assertIsInstance(query["full_scans"], list)
+
+    @override_settings(BUDGET_ITEMS_SPARSE=True)
+    def test_workloads_leave_data_unchanged(self):
+        BudgetItem.objects.filter(user=self.user).exclude(monthly_budget__date__month=1).delete()
+
+        call_command("explain_queries", "--user", "testuser", stdout=StringIO())
+
+        self.assertEqual(BudgetItem.objects.filter(user=self.user).count(), 1)
+
+    def test_indexes_split_into_used_and_unused(self):
+        out = StringIO()
+        call_command("explain_queries", "--user", str(self.user.pk), stdout=out)
+        report = json.loads(out.getvalue())
+
+        indexes = report["indexes"]
+        self.assertIn("idx_purchase_user_date", indexes["tables"])
+        self.assertEqual(
+            set(indexes["used"]) | set(indexes["unused"]), set(indexes["tables"])
+        )
+        self.assertFalse(set(indexes["used"]) & set(indexes["unused"]))
+
+
+class TestBenchmarkViewsCommand(TestCase):
+    benchmark_args = [
+        "--purchases", "60", "--categories", "3", "--years", "1", "--repeat", "1",
+    ]
+
+    def test_baseline_written_and_compared(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = Path(directory, "baseline.json")
+            call_command(
+                "benchmark_views", *self.benchmark_args,
+                "--baseline", str(baseline), stdout=StringIO(),
+            )
+
+            results = json.loads(baseline.read_text())["custom-60-3-1"]
+            self.assertEqual(
+                set(results),
+                {
+                    "yearly_detail",
+                    "monthly_detail",
+                    "yearly_aggregation",
+                    "purchase_list",
+                    "purchase_create",
+                    "purchase_create_monthly_patch",
+                    "recurring_purchase_add_to_month",
+                },
+            )
+            for result in results.values():
+                self.assertGreater(result["queries"], 0)
+                self.assertGreater(result["peak_memory_kb"], 0)
+
+            out = StringIO()
+            call_command(
+                "benchmark_views", *self.benchmark_args,
+                "--baseline", str(baseline), "--compare",
+                "--time-tolerance", "1000", stdout=out,
+            )
+            self.assertIn("No regressions", out.getvalue())
+
+    def test_compare_fails_on_query_regression(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = Path(directory, "baseline.json")
+            call_command(
+                "benchmark_views", *self.benchmark_args,
+                "--baseline", str(baseline), stdout=StringIO(),
+            )
+            baselines = json.loads(baseline.read_text())
+            baselines["custom-60-3-1"]["yearly_detail"]["queries"] -= 1
+            baseline.write_text(json.dumps(baselines))
+
+            with self.assertRaisesMessage(CommandError, "yearly_detail"):
+                call_command(
+                    "benchmark_views", *self.benchmark_args,
+                    "--baseline", str(baseline), "--compare",
+                    "--time-tolerance", "1000", stdout=StringIO(),
+                )
+
+        self.assertFalse(Purchase.objects.exists())
+
+
+class TestGenerateBudgetDataCommand(TestCase):
+    generate_args = [
+        "--users", "2", "--years", "2", "--purchases-per-year", "40",
+        "--categories", "4", "--last-year", "2024", "--chunk-size", "25",
+    ]
+
+    def _snapshot(self, prefix):
+        return list(
+            Purchase.objects.filter(user__username__startswith=prefix)
+            .order_by("user__username", "date", "item", "amount")
+            .values_list("user__username", "date", "item", "amount", "category__name")
+        )
+
+    def test_generates_every_model(self):
+        call_command("generate_budget_data", *self.generate_args, stdout=StringIO())
+
+        user = User.objects.get(username="generated-0")
+        self.assertEqual(user.yearly_budgets.count(), 2)
+        self.assertEqual(user.monthly_budgets.count(), 24)
+        self.assertEqual(user.budget_items.count(), 2 * 12 * 4)
+        self.assertEqual(user.rollovers.count(), 2 * 4)
+        self.assertEqual(user.recurring_purchases.count(), 6)
+        self.assertEqual(
+            user.purchases.filter(recurring_purchase__isnull=True).count(), 80
+        )
+        self.assertEqual(
+            user.purchases.filter(recurring_purchase__isnull=False).count(), 2 * 12 * 6
+        )
+        self.assertFalse(user.purchases.filter(receipt__isnull=True).exists())
+        self.assertEqual(user.incomes.filter(source="Salary").count(), 48)
+
+    def test_same_seed_produces_same_data(self):
+        call_command(
+            "generate_budget_data", *self.generate_args,
+            "--username-prefix", "first", stdout=StringIO(),
+        )
+        call_command(
+            "generate_budget_data", *self.generate_args,
+            "--username-prefix", "second", stdout=StringIO(),
+        )
+
+        first = [row[1:] for row in self._snapshot("first-")]
+        second = [row[1:] for row in self._snapshot("second-")]
+        self.assertEqual(first, second)
+
+    def test_existing_prefix_is_rejected(self):
+        call_command("generate_budget_data", *self.generate_args, stdout=StringIO())
+
+        with self.assertRaises(CommandError):
+            call_command("generate_budget_data", *self.generate_args, stdout=StringIO())
+
+
+class TestPruneBudgetItemsCommand(TestCase):
+    def test_keeps_non_zero_months_and_anchors(self):
+        user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        YearlyBudgetFactory(user=user, date=datetime.date(2023, 1, 1))
+        for name, amount in (("Insurance", 0), ("Rent", 100)):
+            category = CategoryFactory(user=user, name=name)
+            form = BudgetItemForm({"category": category, "amount": amount}, user=user)
+            form.is_valid()
+            BudgetItem.create_items_and_rollovers(user, 2023, form)
+        BudgetItem.objects.filter(
+            category__name="Rent", monthly_budget__date__month__gt=6
+        ).update(amount=0, amount_cents=0)
+
+        out = StringIO()
+        call_command("prune_budget_items", "--user", "testuser", stdout=out)
+
+        self.assertIn("Deleted 17 budget items", out.getvalue())
+        self.assertEqual(
+            list(
+                BudgetItem.objects.order_by("category__name", "monthly_budget__date")
+                .values_list("category__name", "monthly_budget__date__month")
+            ),
+            [("Insurance", 1)] + [("Rent", month) for month in range(1, 7)],
+        )
+
+
+class TestCloseYearsCommand(TestCase):
+    def test_closes_last_year_for_every_user(self):
+        year = datetime.date.today().year - 1
+        for username in ("first", "second"):
+            user = User.objects.create_user(username=username)
+            YearlyBudgetFactory(user=user, date=datetime.date(year, 1, 1))
+        out = StringIO()
+
+        call_command("close_years", stdout=out)
+
+        self.assertIn(f"Closed {year} for 2 users", out.getvalue())
+        # One yearly and twelve monthly contexts per user.
+        self.assertEqual(YearSnapshot.objects.filter(year=year).count(), 26)
+
+    def test_carries_rollovers_unless_kept(self):
+        year = datetime.date.today().year - 1
+        user = User.objects.create_user(username="rollover")
+        yearly_budget = YearlyBudgetFactory(user=user, date=datetime.date(year, 1, 1))
+        category = CategoryFactory(user=user, rollover=True)
+        rollover = RolloverFactory(
+            user=user, yearly_budget=yearly_budget, category=category, amount="12.00"
+        )
+        BudgetItemFactory(
+            user=user,
+            category=category,
+            monthly_budget=yearly_budget.monthly_budgets.first(),
+            amount="50.00",
+        )
+        PurchaseFactory(user=user, category=category, amount="20.00", date=datetime.date(year, 2, 1))
+
+        call_command("close_years", "--keep-rollovers", stdout=StringIO())
+        rollover.refresh_from_db()
+        self.assertEqual(str(rollover.amount), "12.00")
+
+        out = StringIO()
+        call_command("close_years", stdout=out)
+        rollover.refresh_from_db()
+        self.assertEqual(str(rollover.amount), "30.00")
+        self.assertIn("updated 1 rollovers", out.getvalue())
+
+    def test_rerun_after_archiving_counts_archived_entries(self):
+        year = datetime.date.today().year - 1
+        user = User.objects.create_user(username="archived")
+        yearly_budget = YearlyBudgetFactory(user=user, date=datetime.date(year, 1, 1))
+        category = CategoryFactory(user=user, rollover=True)
+        rollover = RolloverFactory(
+            user=user, yearly_budget=yearly_budget, category=category, amount=0
+        )
+        BudgetItemFactory(
+            user=user,
+            category=category,
+            monthly_budget=yearly_budget.monthly_budgets.first(),
+            amount="100.00",
+        )
+        PurchaseFactory(user=user, category=category, amount="40.00", date=datetime.date(year, 2, 1))
+        call_command("close_years", stdout=StringIO())
+        call_command("archive_years", stdout=StringIO())
+        out = StringIO()
+
+        call_command("close_years", "--year", str(year), stdout=out)
+
+        rollover.refresh_from_db()
+        self.assertEqual(str(rollover.amount), "60.00")
+        self.assertIn("updated 0 rollovers", out.getvalue())
+
+    def test_refuses_unfinished_year(self):
+        with self.assertRaises(CommandError):
+            call_command("close_years", "--year", str(datetime.date.today().year))
+
+
+class TestArchiveYearsCommand(TestCase):
+    def test_archives_closed_years(self):
+        year = datetime.date.today().year - 1
+        closed = User.objects.create_user(username="closed")
+        reopened = User.objects.create_user(username="reopened")
+        for user in (closed, reopened):
+            YearlyBudgetFactory(user=user, date=datetime.date(year, 1, 1))
+            PurchaseFactory(user=user, date=datetime.date(year, 4, 1))
+        call_command("close_years", stdout=StringIO())
+        PurchaseFactory(user=reopened, date=datetime.date(year, 5, 1))
+        out = StringIO()
+
+        call_command("archive_years", stdout=out)
+
+        self.assertIn(f"Archived 1 rows of {year}", out.getvalue())
+        self.assertIn("1 reopened years skipped", out.getvalue())
+        self.assertFalse(Purchase.objects.filter(user=closed).exists())
+        self.assertEqual(Purchase.objects.filter(user=reopened).count(), 2)
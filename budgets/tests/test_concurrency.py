@@ -0,0 +1,182 @@
+import datetime
+import json
+import re
+import threading
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from budgets.concurrency import arun_queries
+from budgets.models import YearlyBudget
+from budgets.services import BudgetService
+from budgets.snapshots import close_year
+from budgets.tests.equivalence import normalize
+from budgets.tests.factories import BudgetItemFactory
+from budgets.views import AsyncMonthlyBudgetDetailView, AsyncYearlyBudgetDetailView
+from purchases.models import Purchase
+from purchases.tests.factories import CategoryFactory, IncomeFactory, PurchaseFactory
+
+User = get_user_model()
+
+
+def create_budget(user, year):
+    YearlyBudget.objects.create(user=user, date=datetime.date(year, 1, 1))
+    food = CategoryFactory(user=user, name="Food")
+    savings = CategoryFactory(user=user, name="Savings")
+    for monthly_budget in user.monthly_budgets.all():
+        for category, amount, is_savings in ((food, "300.00", False), (savings, "50.00", True)):
+            BudgetItemFactory(
+                user=user,
+                category=category,
+                monthly_budget=monthly_budget,
+                yearly_budget=monthly_budget.yearly_budget,
+                amount=Decimal(amount),
+                savings=is_savings,
+            )
+    PurchaseFactory(user=user, category=food, date=datetime.date(year, 3, 4), amount=Decimal("42.10"))
+    PurchaseFactory(user=user, category=None, date=datetime.date(year, 3, 9), amount=Decimal("7.00"))
+    IncomeFactory(user=user, category=None, date=datetime.date(year, 3, 1), amount=Decimal("2500.00"))
+
+
+def thread_name():
+    return threading.current_thread().name
+
+
+@override_settings(ROOT_URLCONF="budgets.tests.async_urls")
+class TestAsyncBudgetViews(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        cls.year = 2023
+        create_budget(cls.user, cls.year)
+
+    def setUp(self):
+        self.client.login(email="test@example.com", password="testpass123")
+
+    def test_yearly_view_matches_sync_context(self):
+        response = self.client.get(reverse("yearly_detail", args=[self.year]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.resolver_match.func.view_class(), AsyncYearlyBudgetDetailView)
+        expected = BudgetService().get_yearly_budget_context(self.user, self.year, 12)
+        for key in ("budget_items_combined", "savings_items_combined", "total_budgeted", "free_income"):
+            self.assertEqual(normalize(response.context[key]), normalize(expected[key]))
+
+    def test_yearly_view_uses_async_figures(self):
+        with mock.patch.object(
+            BudgetService, "get_yearly_figures", side_effect=AssertionError("sync path")
+        ):
+            response = self.client.get(reverse("yearly_detail", args=[self.year]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["total_spending_spent"], Decimal("42.10"))
+
+    def test_monthly_view_matches_sync_context(self):
+        response = self.client.get(reverse("monthly_detail", args=[self.year, 3]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.resolver_match.func.view_class(), AsyncMonthlyBudgetDetailView)
+        self.assertEqual(response.context["total_spent"], Decimal("49.10"))
+        self.assertEqual(response.context["free_income"], Decimal("2450.90"))
+        self.assertIn("purchase_formset", response.context)
+
+    def test_unchanged_page_is_not_modified(self):
+        url = reverse("yearly_detail", args=[self.year])
+        etag = self.client.get(url)["ETag"]
+
+        response = self.client.get(url, headers={"if-none-match": etag})
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_closed_year_is_served_from_snapshot(self):
+        close_year(self.user, self.year)
+        Purchase.objects.filter(user=self.user, category=None).update(amount=Decimal("9.00"))
+
+        yearly = self.client.get(reverse("yearly_detail", args=[self.year]))
+        monthly = self.client.get(reverse("monthly_detail", args=[self.year, 3]))
+
+        self.assertTrue(yearly.context["closed"])
+        self.assertEqual(monthly.context["total_spent"], Decimal("49.10"))
+
+    def test_redirect_if_not_logged_in(self):
+        self.client.logout()
+
+        response = self.client.get(reverse("yearly_detail", args=[self.year]))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("/accounts/login/", response.url)
+
+
+class TestArunQueries(TestCase):
+    def test_falls_back_to_caller_connection_in_transaction(self):
+        results = async_to_sync(arun_queries)({"name": thread_name})
+
+        self.assertEqual(results, {"name": threading.current_thread().name})
+
+
+class TestConcurrentQueries(TransactionTestCase):
+    def test_queries_run_on_worker_threads(self):
+        results = async_to_sync(arun_queries)({"a": thread_name, "b": thread_name})
+
+        self.assertTrue(all(name.startswith("budget-query") for name in results.values()))
+
+    @override_settings(BUDGET_QUERY_WORKERS=1)
+    def test_single_worker_runs_sequentially(self):
+        results = async_to_sync(arun_queries)({"name": thread_name})
+
+        self.assertEqual(results, {"name": threading.current_thread().name})
+
+    @override_settings(ROOT_URLCONF="budgets.tests.async_urls")
+    def test_page_counts_worker_queries(self):
+        user = User.objects.create_user(username="counted", password="pass", is_staff=True)
+        create_budget(user, 2023)
+        self.client.force_login(user)
+        url = reverse("monthly_detail", args=[2023, 3])
+
+        def query_count():
+            cache.clear()
+            header = self.client.get(url)["Server-Timing"]
+            return int(re.search(r'desc="(\d+) queries"', header).group(1))
+
+        with override_settings(BUDGET_QUERY_WORKERS=1):
+            sequential = query_count()
+
+        self.assertEqual(query_count(), sequential)
+
+    def test_concurrent_contexts_match_sequential(self):
+        user = User.objects.create_user(username="concurrent", password="pass")
+        create_budget(user, 2023)
+        service = BudgetService()
+
+        yearly = async_to_sync(service.aget_yearly_budget_context)(user, 2023, 6)
+        monthly = async_to_sync(service.aget_monthly_budget_context)(user, 2023, 3)
+
+        self.assertEqual(
+            normalize(yearly), normalize(service.get_yearly_budget_context(user, 2023, 6))
+        )
+        self.assertEqual(
+            normalize(monthly), normalize(service.get_monthly_budget_context(user, 2023, 3))
+        )
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command(
+            "benchmark_concurrency", "--purchases", "50", "--categories", "3",
+            "--years", "1", "--repeat", "1", "--latency-ms", "1", stdout=out,
+        )
+
+        results = json.loads(out.getvalue())
+        self.assertEqual(set(results), {"yearly", "monthly"})
+        for result in results.values():
+            self.assertGreater(result["sequential_ms"], 0)
+            self.assertGreater(result["concurrent_ms"], 0)
+        self.assertFalse(User.objects.filter(username__startswith="benchmark-").exists())
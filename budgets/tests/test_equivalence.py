@@ -0,0 +1,134 @@
+import random
+
+from django.test import TestCase
+
+from budgets.models import BudgetItem, Rollover
+from budgets.services import BudgetService
+from budgets.tests.equivalence import (
+    YEAR,
+    build_dataset,
+    check_equivalence,
+    compare_engines,
+    generate_spec,
+    normalize,
+    shrink,
+)
+from purchases.models import Income, Purchase
+
+
+class IgnoresPriorRolloverService(BudgetService):
+    """Deliberately wrong engine that forgets last year's rollovers."""
+
+    def _process_spending_items(self, user, year, ytd_month, purchases_data, incomes_data, rollovers_by_category, **kwargs):
+        return super()._process_spending_items(
+            user, year, ytd_month, purchases_data, incomes_data, {}, **kwargs
+        )
+
+
+class TestEquivalenceHarness(TestCase):
+    def test_reference_matches_itself(self):
+        check_equivalence(BudgetService, runs=10, seed=1)
+
+    def test_detects_and_shrinks_difference(self):
+        with self.assertRaisesRegex(AssertionError, "Minimal dataset"):
+            check_equivalence(IgnoresPriorRolloverService, runs=10, seed=1)
+
+    def test_shrunk_dataset_is_minimal(self):
+        spec = {
+            "ytd_month": 6,
+            "categories": [
+                {
+                    "savings": False,
+                    "rollover": True,
+                    "budgeted": True,
+                    "amounts": [1000] * 12,
+                    "prior_rollover": 2500,
+                    "rollover_amount": 300,
+                },
+                {
+                    "savings": True,
+                    "rollover": False,
+                    "budgeted": True,
+                    "amounts": [500] * 12,
+                    "prior_rollover": 0,
+                    "rollover_amount": 0,
+                },
+            ],
+            "purchases": [
+                {"category": 0, "month": 2, "day": 3, "cents": 1234},
+                {"category": None, "month": 4, "day": 5, "cents": 999},
+            ],
+            "incomes": [{"category": None, "month": 1, "day": 1, "cents": 100000}],
+        }
+        engine = IgnoresPriorRolloverService
+        self.assertTrue(compare_engines(spec, engine))
+
+        minimal = shrink(spec, engine)
+
+        self.assertEqual(len(minimal["categories"]), 1)
+        self.assertEqual(minimal["purchases"], [])
+        self.assertEqual(minimal["incomes"], [])
+        self.assertEqual(minimal["categories"][0]["amounts"], [0] * 12)
+        self.assertEqual(minimal["categories"][0]["prior_rollover"], 2500)
+        self.assertTrue(compare_engines(minimal, engine))
+
+    def test_generated_specs_are_reproducible(self):
+        self.assertEqual(
+            generate_spec(random.Random(5)), generate_spec(random.Random(5))
+        )
+
+
+class TestYearlySummaries(TestCase):
+    def test_summaries_match_yearly_context(self):
+        rng = random.Random(3)
+        service = BudgetService()
+        for _ in range(10):
+            user = build_dataset(generate_spec(rng))
+            context = service.get_yearly_budget_context(user, YEAR, 12)
+            summary = service.get_yearly_summaries(user)[YEAR]
+
+            self.assertEqual(
+                normalize(summary.as_dict()),
+                normalize(
+                    {
+                        "year": YEAR,
+                        "budgeted": context["total_budgeted"],
+                        "spent": context["total_spending_spent"],
+                        "saved": context["total_saved"],
+                        "income": context["total_income"]["amount"],
+                        "remaining": context["total_remaining"],
+                    }
+                ),
+            )
+
+    def test_summaries_add_up_cents(self):
+        user = build_dataset(generate_spec(random.Random(4)))
+        expected = BudgetService().get_yearly_summaries(user)
+
+        # Only the integer columns are read; the Decimal ones can drift.
+        Purchase.objects.filter(user=user).update(amount=0)
+        Income.objects.filter(user=user).update(amount=0)
+        BudgetItem.objects.filter(user=user).update(amount=0)
+
+        self.assertEqual(BudgetService().get_yearly_summaries(user), expected)
+
+
+class TestReferenceEngineCents(TestCase):
+    LISTINGS = {"incomes", "purchases", "purchases_uncategorized", "rollovers_spending", "rollovers_savings"}
+
+    def figures(self, context):
+        return normalize({key: value for key, value in context.items() if key not in self.LISTINGS})
+
+    def test_contexts_add_up_cents(self):
+        user = build_dataset(generate_spec(random.Random(4)))
+        service = BudgetService()
+        yearly = self.figures(service.get_yearly_budget_context(user, YEAR, 12))
+        monthly = self.figures(service.get_monthly_budget_context(user, YEAR, 3))
+
+        # Only the integer columns are read; the Decimal ones can drift.
+        Purchase.objects.filter(user=user).update(amount=0)
+        Income.objects.filter(user=user).update(amount=0)
+        Rollover.objects.filter(user=user).update(amount=0)
+
+        self.assertEqual(self.figures(service.get_yearly_budget_context(user, YEAR, 12)), yearly)
+        self.assertEqual(self.figures(service.get_monthly_budget_context(user, YEAR, 3)), monthly)
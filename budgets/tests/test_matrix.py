@@ -0,0 +1,194 @@
+import datetime
+import json
+import random
+from decimal import Decimal
+from unittest import mock, skipIf
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from budgets import matrix
+from budgets.matrix import CentsMatrix, MatrixBudgetService
+from budgets.models import BudgetItem, Rollover, YearlyBudget
+from budgets.services import BudgetService, get_budget_service
+from budgets.tests.equivalence import YEAR, build_dataset, check_equivalence, generate_spec, normalize
+from budgets.tests.factories import BudgetItemFactory
+from purchases.tests.factories import CategoryFactory, PurchaseFactory
+
+User = get_user_model()
+
+
+class TestCentsMatrix(TestCase):
+    def check_matrix(self):
+        grid = CentsMatrix(2)
+        grid.add(0, 1, 100)
+        grid.add(0, 3, 250)
+        grid.add(1, 12, 7)
+
+        self.assertEqual(grid.row_totals(), [350, 7])
+        self.assertEqual(grid.row_totals(2), [100, 0])
+        self.assertEqual(grid.column(3), [250, 0])
+        self.assertEqual(grid.column(12), [0, 7])
+
+    def test_array_fallback(self):
+        with mock.patch.object(matrix, "numpy", None):
+            self.check_matrix()
+
+    @skipIf(matrix.numpy is None, "NumPy is not installed")
+    def test_numpy(self):
+        self.check_matrix()
+
+
+class TestMatrixBudgetService(TestCase):
+    def test_matches_budget_service(self):
+        check_equivalence(MatrixBudgetService, runs=15, seed=2)
+
+    def test_array_fallback_matches_budget_service(self):
+        with mock.patch.object(matrix, "numpy", None):
+            check_equivalence(MatrixBudgetService, runs=5, seed=3)
+
+    @override_settings(BUDGET_ITEMS_SPARSE=True)
+    def test_sparse_items_match_budget_service(self):
+        check_equivalence(MatrixBudgetService, runs=10, seed=5)
+
+    def test_simulations_match_budget_service(self):
+        rng = random.Random(6)
+        for _ in range(10):
+            user = build_dataset(generate_spec(rng))
+            categories = list(
+                BudgetItem.objects.filter(user=user).values_list("category", flat=True).distinct()
+            )
+            amounts = {
+                (category, rng.randint(1, 12)): rng.randrange(0, 100_000)
+                for category in rng.sample(categories, rng.randint(0, len(categories)))
+            }
+            carried = list(
+                Rollover.objects.filter(user=user, yearly_budget__date__year=YEAR - 1)
+                .values_list("category", flat=True)
+            )
+            rollovers = {
+                category: rng.randrange(-50_000, 50_000)
+                for category in rng.sample(carried, rng.randint(0, len(carried)))
+            }
+            ytd_month = rng.randint(1, 12)
+
+            self.assertEqual(
+                normalize(
+                    MatrixBudgetService().get_yearly_figures(
+                        user, YEAR, ytd_month, amounts, rollovers
+                    )
+                ),
+                normalize(
+                    BudgetService().get_yearly_figures(user, YEAR, ytd_month, amounts, rollovers)
+                ),
+            )
+
+    def test_simulating_unbudgeted_category_fails(self):
+        user = build_dataset(generate_spec(random.Random(7)))
+        unbudgeted = CategoryFactory(user=user, name="Unbudgeted")
+
+        for engine in (BudgetService, MatrixBudgetService):
+            with self.subTest(engine=engine.__name__), self.assertRaises(ValueError):
+                engine().get_yearly_figures(user, YEAR, 12, {(unbudgeted.pk, 1): 100})
+            with self.subTest(engine=engine.__name__), self.assertRaises(ValueError):
+                engine().get_yearly_figures(user, YEAR, 12, rollovers={unbudgeted.pk: 100})
+
+    def test_yearly_and_monthly_share_one_load(self):
+        user = User.objects.create_user(username="matrix", password="pass")
+        year = 2023
+        YearlyBudget.objects.create(user=user, date=datetime.date(year, 1, 1))
+        category = CategoryFactory(user=user, name="Food")
+        for monthly_budget in user.monthly_budgets.all():
+            BudgetItemFactory(
+                user=user,
+                category=category,
+                monthly_budget=monthly_budget,
+                yearly_budget=monthly_budget.yearly_budget,
+                amount=Decimal("100.00"),
+            )
+        PurchaseFactory(
+            user=user, category=category, date=datetime.date(year, 3, 2), amount=Decimal("12.50")
+        )
+
+        service = MatrixBudgetService()
+        yearly = service.get_yearly_budget_context(user, year, 12)
+        # Only the month's budget items and the monthly budget are queried.
+        with self.assertNumQueries(2):
+            monthly = service.get_monthly_budget_context(user, year, 3)
+
+        self.assertEqual(yearly["budget_items_combined"][0].spent, Decimal("12.50"))
+        self.assertEqual(monthly["budget_items"][0].diff, Decimal("87.50"))
+
+    def test_services_share_cached_load_until_data_changes(self):
+        cache.clear()
+        user = User.objects.create_user(username="shared", password="pass")
+        year = 2023
+        YearlyBudget.objects.create(user=user, date=datetime.date(year, 1, 1))
+        category = CategoryFactory(user=user, name="Food")
+        BudgetItemFactory(
+            user=user,
+            category=category,
+            monthly_budget=user.monthly_budgets.get(date__month=3),
+            amount=Decimal("100.00"),
+        )
+        MatrixBudgetService().get_yearly_figures(user, year, 12)
+
+        # Only the data version is read; the matrix comes from the cache.
+        with self.assertNumQueries(1):
+            MatrixBudgetService().load(user, year)
+
+        PurchaseFactory(
+            user=user, category=category, date=datetime.date(year, 3, 2), amount=Decimal("12.50")
+        )
+        figures = MatrixBudgetService().get_yearly_figures(user, year, 12)
+        self.assertEqual(figures["budget_items_combined"][0].spent, Decimal("12.50"))
+
+
+class TaggedBudgetService(BudgetService):
+    """Marks the figures it computes, to show which engine a page used."""
+
+    def get_yearly_figures(self, *args, **kwargs):
+        return dict(super().get_yearly_figures(*args, **kwargs), engine="tagged")
+
+    async def aget_yearly_figures(self, *args, **kwargs):
+        return dict(await super().aget_yearly_figures(*args, **kwargs), engine="tagged")
+
+
+class TestGetBudgetService(TestCase):
+    def test_default_engine(self):
+        self.assertIs(type(get_budget_service()), BudgetService)
+
+    @override_settings(BUDGET_ENGINE="matrix")
+    def test_matrix_engine(self):
+        self.assertIsInstance(get_budget_service(), MatrixBudgetService)
+
+    @override_settings(BUDGET_ENGINE="budgets.tests.test_matrix.TaggedBudgetService")
+    def test_yearly_figures_come_from_engine(self):
+        cache.clear()
+        user = User.objects.create_user(
+            username="matrixview", email="matrix@example.com", password="pass"
+        )
+        YearlyBudget.objects.create(user=user, date=datetime.date(2023, 1, 1))
+        category = CategoryFactory(user=user, name="Food")
+        BudgetItemFactory(
+            user=user, category=category, monthly_budget=user.monthly_budgets.get(date__month=1)
+        )
+        self.client.force_login(user)
+
+        page = self.client.get(reverse("yearly_detail", args=[2023]))
+        grid = self.client.get(reverse("yearly_section", args=[2023, "grid"]))
+        simulation = self.client.post(
+            reverse("budget_simulate", args=[2023]), data="{}", content_type="application/json"
+        )
+        rollovers = self.client.post(
+            reverse("rollover_batch_update", args=[2023]),
+            data=json.dumps({"rollovers": []}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(page.context["engine"], "tagged")
+        self.assertEqual(grid.context["engine"], "tagged")
+        self.assertEqual(simulation.json()["engine"], "tagged")
+        self.assertEqual(rollovers.json()["engine"], "tagged")
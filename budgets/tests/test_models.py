@@ -1,12 +1,22 @@
 import datetime
+import random
+from decimal import Decimal
 
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.db import IntegrityError
 
-from budgets.models import YearlyBudget, MonthlyBudget, BudgetItem, Rollover
+from budgets.models import (
+    YearlyBudget,
+    MonthlyBudget,
+    BudgetItem,
+    DataVersion,
+    Rollover,
+)
 from budgets.forms import BudgetItemForm
-from purchases.models import Category
+from budgets.services import BudgetService
+from budgets.tests.equivalence import YEAR, build_dataset, generate_spec
+from purchases.models import Category, Income, Purchase
 
 User = get_user_model()
 
@@ -84,3 +94,164 @@ class TestBudgetItem(TestCase):
         )
         self.assertEqual(Rollover.objects.all().count(), 1)
         self.assertEqual(Rollover.objects.all()[0].category, category)
+
+    def test_amount_cents_synced_on_save(self):
+        category = Category.objects.create(user=self.user1, name="Cents category")
+        form = BudgetItemForm({"category": category, "amount": 1.99}, user=self.user1)
+        form.is_valid()
+
+        BudgetItem.create_items_and_rollovers(
+            self.user1, datetime.datetime.now().year, form
+        )
+
+        self.assertEqual(
+            set(BudgetItem.objects.values_list("amount_cents", flat=True)), {199}
+        )
+        rollover = Rollover.objects.get()
+        rollover.amount = "12.30"
+        rollover.save()
+        rollover.refresh_from_db()
+        self.assertEqual(rollover.amount_cents, 1230)
+
+
+class TestDataVersion(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="testemail@test.com", username="testuser", password="testpass123"
+        )
+        cls.yearly_budget = YearlyBudget.objects.create(
+            user=cls.user, date=datetime.date(2023, 1, 1)
+        )
+        cls.category = Category.objects.create(user=cls.user, name="Groceries")
+
+    def versions(self):
+        return {year: DataVersion.current(self.user.pk, year) for year in (2022, 2023, 2024)}
+
+    def test_purchase_moved_across_years_bumps_both(self):
+        purchase = Purchase.objects.create(
+            user=self.user, item="Apples", amount="3.00", date=datetime.date(2023, 5, 1)
+        )
+        purchase = Purchase.objects.get(pk=purchase.pk)
+        before = self.versions()
+
+        purchase.date = datetime.date(2022, 12, 31)
+        purchase.save()
+
+        after = self.versions()
+        self.assertGreater(after[2022], before[2022])
+        self.assertGreater(after[2023], before[2023])
+        self.assertEqual(after[2024], before[2024])
+
+    def test_purchase_moved_across_categories_bumps_both(self):
+        other = Category.objects.create(user=self.user, name="Dining")
+        purchase = Purchase.objects.create(
+            user=self.user,
+            item="Apples",
+            amount="3.00",
+            category=self.category,
+            date=datetime.date(2023, 5, 1),
+        )
+        before = DataVersion.for_categories(self.user.pk, 2023)
+
+        purchase.category = other
+        purchase.save()
+
+        after = DataVersion.for_categories(self.user.pk, 2023)
+        self.assertGreater(after[self.category.pk], before[self.category.pk])
+        self.assertGreater(after[other.pk], before.get(other.pk, 0))
+
+    def test_budget_item_bumps_its_year(self):
+        before = self.versions()
+
+        BudgetItem.objects.create(
+            user=self.user,
+            category=self.category,
+            monthly_budget=self.yearly_budget.monthly_budgets.first(),
+            yearly_budget=self.yearly_budget,
+            amount="10.00",
+            savings=False,
+        )
+
+        after = self.versions()
+        self.assertGreater(after[2023], before[2023])
+        self.assertEqual(after[2024], before[2024])
+
+    def test_rollover_bumps_its_year_and_the_next(self):
+        before = self.versions()
+
+        Rollover.objects.create(
+            user=self.user, category=self.category, yearly_budget=self.yearly_budget, amount=5
+        )
+
+        after = self.versions()
+        self.assertEqual(after[2022], before[2022])
+        self.assertGreater(after[2023], before[2023])
+        self.assertGreater(after[2024], before[2024])
+
+    def test_user_with_entries_can_be_deleted(self):
+        Purchase.objects.create(
+            user=self.user, item="Apples", amount="3.00", date=datetime.date(2023, 5, 1)
+        )
+
+        self.user.delete()
+
+        self.assertFalse(DataVersion.objects.exists())
+
+
+class TestRolloverCarryOver(TestCase):
+    def test_matches_yearly_remaining_amounts(self):
+        rng = random.Random(7)
+        for _ in range(8):
+            user = build_dataset(generate_spec(rng))
+            context = BudgetService().get_yearly_budget_context(user, YEAR, 12)
+            expected = {}
+            for line in context["budget_items_combined"]:
+                expected[line.category] = expected.get(line.category, 0) + line.remaining_current_year
+            for line in context["savings_items_combined"]:
+                expected[line.category] = expected.get(line.category, 0) + line.diff
+            before = dict(
+                Rollover.objects.filter(user=user).values_list("pk", "amount")
+            )
+
+            Rollover.carry_over(YEAR, user=user)
+
+            for rollover in Rollover.objects.filter(user=user).select_related("category", "yearly_budget"):
+                if rollover.yearly_budget.date.year == YEAR and rollover.category.rollover:
+                    self.assertEqual(rollover.amount, expected.get(rollover.category_id, 0))
+                    self.assertEqual(rollover.amount_cents, round(rollover.amount * 100))
+                else:
+                    self.assertEqual(rollover.amount, before[rollover.pk])
+
+    def test_bumps_versions_of_written_rows(self):
+        user = User.objects.create_user(username="carry")
+        yearly_budget = YearlyBudget.objects.create(user=user, date=datetime.date(2023, 1, 1))
+        category = Category.objects.create(user=user, name="Groceries", rollover=True)
+        BudgetItem.objects.create(
+            user=user,
+            category=category,
+            monthly_budget=yearly_budget.monthly_budgets.first(),
+            yearly_budget=yearly_budget,
+            amount="100.00",
+            savings=False,
+        )
+        Purchase.objects.create(
+            user=user, category=category, amount="30.00", date=datetime.date(2023, 3, 1)
+        )
+        Income.objects.create(
+            user=user, category=category, amount="5.00", date=datetime.date(2023, 4, 1)
+        )
+        rollover = Rollover.objects.create(
+            user=user, category=category, yearly_budget=yearly_budget, amount=0
+        )
+        version = rollover.version
+        next_year = DataVersion.current(user.pk, 2024)
+
+        self.assertEqual(Rollover.carry_over(2023), 1)
+
+        rollover.refresh_from_db()
+        self.assertEqual(rollover.amount, Decimal("75.00"))
+        self.assertEqual(rollover.version, version + 1)
+        self.assertGreater(DataVersion.current(user.pk, 2024), next_year)
+        # Unchanged rows are not written again.
+        self.assertEqual(Rollover.carry_over(2023), 0)
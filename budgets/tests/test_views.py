@@ -1,14 +1,25 @@
 import datetime
+import json
+from io import StringIO
 from urllib.parse import quote
 
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import TextField
+from django.db.models.functions import Cast
 from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from decimal import Decimal
 
-from budgets.models import YearlyBudget, MonthlyBudget, BudgetItem, Rollover
-from purchases.models import Category, Purchase, Receipt, Subcategory
+from budgets.models import YearlyBudget, MonthlyBudget, BudgetItem, Rollover, YearSnapshot
+from budgets.services import BudgetService
+from budgets.snapshots import archive_year, close_year, load_snapshot, reopen_year
+from monitoring.metrics import cache_requests, fragment_render_duration
+from purchases.models import ArchivedPurchase, Category, Income, Purchase, Receipt, Subcategory
 from budgets.forms import BudgetItemForm
+from purchases.services import recategorize_purchases
+from jobs.models import Job
 from .factories import (
     YearlyBudgetFactory,
     MonthlyBudgetFactory,
@@ -196,6 +207,85 @@ class TestYearlyBudgetListView(TestCase):
         self.assertTrue(yearly_budget_user1 in response.context["yearly_budgets"])
         self.assertFalse(yearly_budget_user2 in response.context["yearly_budgets"])
 
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_shows_summary_per_year(self):
+        cache.clear()
+        category = CategoryFactory(user=self.user1, name="Groceries")
+        for year in (2022, 2023):
+            yearly_budget = YearlyBudgetFactory(user=self.user1, date=datetime.date(year, 1, 1))
+            BudgetItemFactory(
+                user=self.user1,
+                category=category,
+                yearly_budget=yearly_budget,
+                monthly_budget=yearly_budget.monthly_budgets.get(date__month=1),
+                amount=Decimal("100.00"),
+            )
+            PurchaseFactory(
+                user=self.user1, category=category,
+                date=datetime.date(year, 1, 5), amount=Decimal("30.00"),
+            )
+            IncomeFactory(user=self.user1, date=datetime.date(year, 1, 1), amount=Decimal("500.00"))
+        RolloverFactory(
+            user=self.user1,
+            category=category,
+            yearly_budget=YearlyBudget.objects.get(user=self.user1, date__year=2022),
+            amount=Decimal("20.00"),
+        )
+
+        self.client.login(email="testuser1@test.com", password="testpass123")
+        response = self.client.get(reverse("yearly_list"))
+
+        summaries = {
+            budget.date.year: budget.summary for budget in response.context["yearly_budgets"]
+        }
+        self.assertEqual(summaries[2022].budgeted, Decimal("100.00"))
+        self.assertEqual(summaries[2022].spent, Decimal("30.00"))
+        self.assertEqual(summaries[2022].income, Decimal("500.00"))
+        self.assertEqual(summaries[2022].remaining, Decimal("70.00"))
+        # 2022's rollover carries into 2023.
+        self.assertEqual(summaries[2023].remaining, Decimal("90.00"))
+        self.assertContains(response, '<div data-figure="remaining">$90</div>', html=True)
+
+    def test_summaries_leave_out_undated_entries(self):
+        YearlyBudgetFactory(user=self.user1, date=datetime.date(2022, 1, 1))
+        IncomeFactory(user=self.user1, date=datetime.date(2022, 1, 1), amount=Decimal("500.00"))
+        IncomeFactory(user=self.user1, date=None, amount=Decimal("40.00"))
+        PurchaseFactory(user=self.user1, date=None, amount=Decimal("30.00"))
+
+        summaries = BudgetService().get_yearly_summaries(self.user1)
+
+        self.assertEqual(set(summaries), {2022})
+        self.assertEqual(summaries[2022].income, Decimal("500.00"))
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_summary_queries_do_not_grow_with_years(self):
+        cache.clear()
+        self.client.login(email="testuser1@test.com", password="testpass123")
+        YearlyBudgetFactory(user=self.user1, date=datetime.date(2020, 1, 1))
+        with self.assertNumQueries(10) as few_years:
+            self.client.get(reverse("yearly_list"))
+
+        for year in range(2010, 2020):
+            YearlyBudgetFactory(user=self.user1, date=datetime.date(year, 1, 1))
+        cache.clear()
+        with self.assertNumQueries(len(few_years.captured_queries)):
+            self.client.get(reverse("yearly_list"))
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_summaries_are_cached_until_a_write(self):
+        cache.clear()
+        yearly_budget = YearlyBudgetFactory(user=self.user1, date=datetime.date(2022, 1, 1))
+        self.client.login(email="testuser1@test.com", password="testpass123")
+        self.client.get(reverse("yearly_list"))
+        hits = cache_requests.samples.get(("yearly_summaries", "hit"), 0)
+
+        self.client.get(reverse("yearly_list"))
+        self.assertEqual(cache_requests.samples.get(("yearly_summaries", "hit"), 0), hits + 1)
+
+        IncomeFactory(user=self.user1, date=datetime.date(2022, 3, 1), amount=Decimal("40.00"))
+        response = self.client.get(reverse("yearly_list"))
+        self.assertEqual(response.context["yearly_budgets"][0].summary.income, Decimal("40.00"))
+
 
 @override_settings(STORAGES=TEST_STORAGES)
 class TestMonthlyBudgetDetailView(TestCase):
@@ -602,7 +692,9 @@ class YearlyBudgetViewTests(TestCase):
         )
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'budgets/yearly_budget_detail.html')
-        self.assertContains(response, category.name)
+        self.assertContains(
+            response, reverse('yearly_section', kwargs={'year': self.year, 'section': 'grid'})
+        )
         self.assertEqual(response.context["ytd_month"], datetime.datetime.now().month)
         self.assertContains(
             response,
@@ -660,6 +752,8 @@ class YearlyBudgetViewTests(TestCase):
 
 class MonthlyBudgetViewTests(TestCase):
     def setUp(self):
+        # Grid rows are cached by category version, which restarts per test.
+        cache.clear()
         self.client = Client()
         self.user = get_user_model().objects.create_user(
             username='testuser',
@@ -813,6 +907,118 @@ class BudgetItemViewTests(TestCase):
 
 
 
+@override_settings(BUDGET_ITEMS_SPARSE=True)
+class SparseBudgetItemViewTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.client.login(username="testuser", password="testpass123")
+        self.year = datetime.date.today().year
+        self.yearly_budget = YearlyBudgetFactory(
+            user=self.user, date=datetime.date(self.year, 1, 1)
+        )
+        self.category = CategoryFactory(user=self.user, name="Insurance")
+        form = BudgetItemForm({"category": self.category, "amount": 0}, user=self.user)
+        form.is_valid()
+        BudgetItem.create_items_and_rollovers(self.user, self.year, form)
+        self.next = reverse("yearly_list")
+
+    def months(self):
+        return sorted(
+            BudgetItem.objects.filter(user=self.user).values_list(
+                "monthly_budget__date__month", flat=True
+            )
+        )
+
+    def edit(self, month, amount):
+        return self.client.post(
+            reverse(
+                "budgetitem_edit_htmx",
+                kwargs={"year": self.year, "month": month, "category": "Insurance"},
+            ),
+            {"category": self.category.pk, "amount": amount, "next": self.next},
+        )
+
+    def test_zero_budget_stores_only_anchor(self):
+        self.assertEqual(self.months(), [1])
+
+    def test_edit_creates_missing_month_and_removes_zeroed_one(self):
+        self.assertEqual(self.edit(6, "600.00").status_code, 200)
+        self.assertEqual(self.months(), [6])
+
+        self.edit(3, "300.00")
+        self.edit(6, "0")
+        self.assertEqual(self.months(), [3])
+
+    def test_monthly_view_shows_missing_month_as_zero(self):
+        self.edit(6, "600.00")
+
+        response = self.client.get(
+            reverse("monthly_detail", kwargs={"year": self.year, "month": 3})
+        )
+
+        (item,) = response.context["budget_items"]
+        self.assertIsNone(item.pk)
+        self.assertEqual(item.category, self.category)
+        self.assertEqual(item.amount, Decimal("0.00"))
+
+    def test_yearly_view_treats_missing_months_as_zero(self):
+        self.edit(6, "600.00")
+
+        response = self.client.get(reverse("yearly_detail", kwargs={"year": self.year}))
+
+        (line,) = response.context["budget_items_combined"]
+        self.assertEqual(line.amount_total, Decimal("600.00"))
+
+    def test_delete_removes_row_but_keeps_anchor(self):
+        self.edit(6, "600.00")
+        self.edit(1, "100.00")
+        url = reverse(
+            "budget_item_delete",
+            kwargs={"year": self.year, "month": 1, "category": "Insurance"},
+        )
+
+        self.client.post(url, {"next": self.next})
+        self.assertEqual(self.months(), [6])
+
+        url = url.replace("/1/", "/6/")
+        self.client.post(url, {"next": self.next})
+        self.assertEqual(self.months(), [6])
+        self.assertEqual(BudgetItem.objects.get().amount, Decimal("0.00"))
+
+    def test_bulk_edit_fills_and_prunes_months(self):
+        url = reverse(
+            "budgetitem_bulk_edit_htmx",
+            kwargs={"year": self.year, "category": "Insurance"},
+        )
+        stored = self.months()
+        response = self.client.get(url, {"next": self.next})
+        formset = response.context["formset"]
+        self.assertEqual(len(formset.forms), 12)
+        self.assertEqual(
+            [form.instance.monthly_budget.date.month for form in formset], list(range(1, 13))
+        )
+        # Opening the modal stores nothing.
+        self.assertEqual(self.months(), stored)
+
+        data = {
+            "form-TOTAL_FORMS": "12",
+            "form-INITIAL_FORMS": str(formset.initial_form_count()),
+            "form-MIN_NUM_FORMS": "0",
+            "form-MAX_NUM_FORMS": "1000",
+            "next": self.next,
+        }
+        for form in formset:
+            if form.instance.pk:
+                data[f"{form.prefix}-id"] = str(form.instance.pk)
+            december = form.instance.monthly_budget.date.month == 12
+            data[f"{form.prefix}-amount"] = "250.00" if december else "0"
+        self.client.post(url, data)
+
+        self.assertEqual(self.months(), [12])
+
+
 class RolloverViewTests(TestCase):
     def setUp(self):
         self.client = Client()
@@ -850,3 +1056,1181 @@ class RolloverViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.rollover.refresh_from_db()
         self.assertEqual(self.rollover.amount, Decimal('600.00'))
+        self.assertEqual(self.rollover.version, 2)
+
+    def post_batch(self, rollovers):
+        return self.client.post(
+            reverse('rollover_batch_update', kwargs={'year': self.year}),
+            content_type='application/json',
+            data={'rollovers': rollovers},
+        )
+
+    def test_rollover_batch_update(self):
+        other_category = CategoryFactory(user=self.user, name='Other')
+        other = RolloverFactory(
+            user=self.user,
+            yearly_budget=self.yearly_budget,
+            category=other_category,
+            amount=Decimal('1.00')
+        )
+
+        response = self.post_batch([
+            {'category': self.category.name, 'amount': '600.10', 'version': 1},
+            {'category': other_category.name, 'amount': '-2.50', 'version': 1},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIn('total_budgeted', data)
+        self.assertEqual(
+            {rollover['category']: rollover['version'] for rollover in data['rollovers']},
+            {self.category.name: 2, other_category.name: 2},
+        )
+        self.rollover.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.rollover.amount, Decimal('600.10'))
+        self.assertEqual(self.rollover.amount_cents, 60010)
+        self.assertEqual(other.amount, Decimal('-2.50'))
+        self.assertEqual(other.amount_cents, -250)
+
+    def test_rollover_batch_update_rejects_stale_version(self):
+        other_category = CategoryFactory(user=self.user, name='Other')
+        RolloverFactory(
+            user=self.user,
+            yearly_budget=self.yearly_budget,
+            category=other_category,
+            amount=Decimal('1.00')
+        )
+        self.rollover.amount = Decimal('550.00')
+        self.rollover.save()
+
+        response = self.post_batch([
+            {'category': self.category.name, 'amount': '600.00', 'version': 1},
+            {'category': other_category.name, 'amount': '5.00', 'version': 1},
+        ])
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            {rollover['category']: rollover['version'] for rollover in response.json()['rollovers']},
+            {self.category.name: 2, other_category.name: 1},
+        )
+        self.assertEqual(
+            Rollover.objects.get(category=other_category).amount, Decimal('1.00')
+        )
+        self.rollover.refresh_from_db()
+        self.assertEqual(self.rollover.amount, Decimal('550.00'))
+
+    def test_rollover_batch_update_unknown_category(self):
+        response = self.post_batch([{'category': 'Missing', 'amount': '1', 'version': 1}])
+        self.assertEqual(response.status_code, 400)
+
+
+class CategoryUrlResolutionTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.client.login(username="testuser", password="testpass123")
+        self.year = datetime.date.today().year
+        self.yearly_budget = YearlyBudgetFactory(
+            user=self.user, date=datetime.date(self.year, 1, 1)
+        )
+        self.category = CategoryFactory(user=self.user, name="Dining Out")
+        PurchaseFactory(
+            user=self.user,
+            category=self.category,
+            date=datetime.date(self.year, 1, 15),
+        )
+
+    def test_bulk_edit_accepts_category_id(self):
+        form = BudgetItemForm({"category": self.category, "amount": 10}, user=self.user)
+        form.is_valid()
+        BudgetItem.create_items_and_rollovers(self.user, self.year, form)
+
+        response = self.client.get(
+            reverse(
+                "budgetitem_bulk_edit_htmx",
+                kwargs={"year": self.year, "category": str(self.category.pk)},
+            ),
+            {"next": reverse("yearly_list")},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["category"], "Dining Out")
+        self.assertEqual(len(response.context["formset"].forms), 12)
+
+    def test_yearly_item_detail_accepts_category_slug(self):
+        response = self.client.get(
+            reverse(
+                "yearly_budget_item_detail",
+                kwargs={"year": self.year, "category": "dining-out"},
+            )
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["category"], "Dining Out")
+
+    def test_renamed_category_resolves_by_new_name(self):
+        url_kwargs = {"year": self.year, "category": "Dining Out"}
+        self.client.get(reverse("yearly_budget_item_detail", kwargs=url_kwargs))
+
+        self.category.name = "Restaurants"
+        self.category.save()
+
+        response = self.client.get(
+            reverse(
+                "yearly_budget_item_detail",
+                kwargs={"year": self.year, "category": "Restaurants"},
+            )
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["purchases"]), 1)
+
+        response = self.client.get(
+            reverse("yearly_budget_item_detail", kwargs=url_kwargs)
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_other_users_category_is_not_resolved(self):
+        other_user = get_user_model().objects.create_user(
+            username="otheruser", email="other@example.com", password="testpass123"
+        )
+        other_category = CategoryFactory(user=other_user, name="Other Category")
+
+        response = self.client.get(
+            reverse(
+                "budgetitem_bulk_edit_htmx",
+                kwargs={"year": self.year, "category": str(other_category.pk)},
+            ),
+            {"next": reverse("yearly_list")},
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+
+class BudgetSimulationViewTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.client.login(username="testuser", password="testpass123")
+        self.year = datetime.date.today().year - 1
+        self.yearly_budget = YearlyBudgetFactory(
+            user=self.user, date=datetime.date(self.year, 1, 1)
+        )
+        self.category = CategoryFactory(user=self.user, name="Groceries")
+        form = BudgetItemForm({"category": self.category, "amount": 100}, user=self.user)
+        form.is_valid()
+        BudgetItem.create_items_and_rollovers(self.user, self.year, form)
+        PurchaseFactory(
+            user=self.user,
+            category=self.category,
+            date=datetime.date(self.year, 3, 10),
+            amount=Decimal("40.00"),
+        )
+        self.carried = RolloverFactory(
+            user=self.user,
+            category=self.category,
+            yearly_budget=YearlyBudgetFactory(user=self.user, date=datetime.date(self.year - 1, 1, 1)),
+            amount=0,
+        )
+        self.url = reverse("budget_simulate", kwargs={"year": self.year})
+
+    def post(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type="application/json")
+
+    def test_simulation_recomputes_without_writing(self):
+        response = self.post(
+            {
+                "items": [{"category": "Groceries", "month": 3, "amount": "250.00"}],
+                "rollovers": [{"category": "Groceries", "amount": "15.00"}],
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertFalse(data["committed"])
+        self.assertEqual(Decimal(data["total_budgeted"]), Decimal("1350.00"))
+        line = data["budget_items_combined"][0]
+        self.assertEqual(Decimal(line["rollover"]), Decimal("15.00"))
+        self.assertEqual(Decimal(line["diff"]), Decimal("1325.00"))
+        # Categories with a rollover are not free income.
+        self.assertEqual(Decimal(data["free_income"]), Decimal("0.00"))
+        self.assertEqual(
+            BudgetItem.objects.filter(user=self.user, amount=Decimal("250.00")).count(), 0
+        )
+        self.assertFalse(Rollover.objects.filter(user=self.user).exclude(amount=0).exists())
+
+    def test_commit_saves_all_changes(self):
+        response = self.post(
+            {
+                "items": [{"category": self.category.pk, "amount": "50.00"}],
+                "rollovers": [{"category": "Groceries", "amount": "15.00"}],
+                "commit": True,
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["committed"])
+        self.assertEqual(
+            BudgetItem.objects.filter(user=self.user, amount=Decimal("50.00")).count(), 12
+        )
+        self.carried.refresh_from_db()
+        self.assertEqual(self.carried.amount, Decimal("15.00"))
+        self.assertEqual(self.carried.version, 2)
+        figures = BudgetService().get_yearly_figures(self.user, self.year, 12)
+        self.assertEqual(figures["total_remaining"], Decimal("575.00"))
+
+    def test_commit_stores_months_without_items(self):
+        BudgetItem.objects.filter(user=self.user, monthly_budget__date__month=3).delete()
+
+        response = self.post(
+            {"items": [{"category": "Groceries", "month": 3, "amount": "25.00"}], "commit": True}
+        )
+
+        self.assertTrue(response.json()["committed"])
+        self.assertEqual(
+            BudgetItem.objects.get(user=self.user, monthly_budget__date__month=3).amount,
+            Decimal("25.00"),
+        )
+        self.assertEqual(Decimal(response.json()["total_budgeted"]), Decimal("1125.00"))
+
+    def test_invalid_changes_are_rejected(self):
+        CategoryFactory(user=self.user, name="Dining")
+        for payload in (
+            {"items": [{"category": "Unknown", "amount": "1"}]},
+            {"items": [{"category": "Groceries", "month": 13, "amount": "1"}]},
+            {"items": [{"category": "Groceries", "amount": "abc"}]},
+            {"items": [{"category": "Dining", "amount": "1"}], "commit": True},
+            {"rollovers": [{"category": "Dining", "amount": "1"}], "commit": True},
+        ):
+            with self.subTest(payload=payload):
+                response = self.post(payload)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+        self.assertFalse(BudgetItem.objects.filter(user=self.user, category__name="Dining").exists())
+        self.assertFalse(Rollover.objects.filter(user=self.user).exclude(amount=0).exists())
+
+    def test_commit_without_monthly_budget_writes_nothing(self):
+        MonthlyBudget.objects.filter(user=self.user, date__year=self.year, date__month=3).delete()
+
+        response = self.post(
+            {
+                "items": [{"category": "Groceries", "month": 3, "amount": "25.00"}],
+                "rollovers": [{"category": "Groceries", "amount": "15.00"}],
+                "commit": True,
+            }
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.carried.refresh_from_db()
+        self.assertEqual(self.carried.amount, 0)
+
+    def test_get_not_allowed(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class PageUpdateViewTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.client.login(username="testuser", password="testpass123")
+        self.year = datetime.date.today().year - 1
+        YearlyBudgetFactory(user=self.user, date=datetime.date(self.year, 1, 1))
+        self.category = CategoryFactory(user=self.user, name="Groceries")
+        self.other_category = CategoryFactory(user=self.user, name="Dining")
+        for category in (self.category, self.other_category):
+            form = BudgetItemForm({"category": category, "amount": 100}, user=self.user)
+            form.is_valid()
+            BudgetItem.create_items_and_rollovers(self.user, self.year, form)
+        self.purchase = PurchaseFactory(
+            user=self.user,
+            category=None,
+            date=datetime.date(self.year, 3, 10),
+            amount=Decimal("40.00"),
+        )
+        self.yearly_url = reverse("yearly_detail", kwargs={"year": self.year})
+        self.monthly_url = reverse("monthly_detail", kwargs={"year": self.year, "month": 3})
+
+    def htmx_post(self, url, data, page):
+        return self.client.post(
+            url,
+            {**data, "next": page},
+            HTTP_HX_REQUEST="true",
+            HTTP_HX_CURRENT_URL=f"http://testserver{page}",
+        )
+
+    def purchase_data(self, page, category=""):
+        return {
+            "form-TOTAL_FORMS": "1",
+            "form-INITIAL_FORMS": "0",
+            "form-MIN_NUM_FORMS": "0",
+            "form-MAX_NUM_FORMS": "1000",
+            "form-0-item": "Apples",
+            "form-0-date": datetime.date(self.year, 3, 12),
+            "form-0-amount": "12.50",
+            "form-0-source": "Market",
+            "form-0-location": "",
+            "form-0-category": category,
+            "form-0-notes": "",
+            "form-0-savings": False,
+        }
+
+    def assertPatched(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("HX-Redirect", response.headers)
+        self.assertEqual(response.headers["HX-Reswap"], "none")
+        self.assertIn("closeModal", response.headers["HX-Trigger"])
+
+    def test_purchase_create_patches_monthly_page(self):
+        response = self.htmx_post(
+            reverse("purchase_create"),
+            self.purchase_data(self.monthly_url, self.category.pk),
+            self.monthly_url,
+        )
+
+        self.assertPatched(response)
+        content = response.content.decode()
+        self.assertIn(f'id="budget-row-{self.category.pk}"', content)
+        self.assertNotIn(f'id="budget-row-{self.other_category.pk}"', content)
+        self.assertIn('id="monthly-summary"', content)
+        self.assertIn('<tbody hx-swap-oob="beforeend:#purchase-table tbody">', content)
+        self.assertIn("Apples", content)
+        self.assertNotIn('id="purchase-table"', content)
+
+    def test_purchase_joining_table_is_inserted_in_order(self):
+        later = PurchaseFactory(
+            user=self.user, category=None, date=datetime.date(self.year, 3, 20)
+        )
+
+        response = self.htmx_post(
+            reverse("purchase_create"), self.purchase_data(self.monthly_url), self.monthly_url
+        )
+
+        self.assertPatched(response)
+        self.assertContains(response, f'<tbody hx-swap-oob="beforebegin:#purchase-{later.pk}">')
+
+    def test_purchase_joining_empty_table_renders_table(self):
+        self.purchase.delete()
+        response = self.htmx_post(
+            reverse("purchase_create"), self.purchase_data(self.yearly_url), self.yearly_url
+        )
+
+        self.assertPatched(response)
+        self.assertContains(response, '<div id="purchase-table" hx-swap-oob="true">')
+
+    def test_purchase_edit_swaps_yearly_row(self):
+        response = self.htmx_post(
+            reverse("purchase_edit_htmx", kwargs={"pk": self.purchase.pk}),
+            {
+                "item": "Pears",
+                "date": self.purchase.date,
+                "amount": "41.00",
+                "source": "Market",
+                "location": "",
+                "category": "",
+                "notes": "",
+            },
+            self.yearly_url,
+        )
+
+        self.assertPatched(response)
+        content = response.content.decode()
+        self.assertIn(f'<tr id="purchase-{self.purchase.pk}" hx-swap-oob="true">', content)
+        self.assertIn("Pears", content)
+        self.assertIn('id="yearly-summary"', content)
+        self.assertNotIn('id="purchase-table"', content)
+
+    def test_purchase_leaving_yearly_table_is_removed(self):
+        response = self.htmx_post(
+            reverse("purchase_edit_htmx", kwargs={"pk": self.purchase.pk}),
+            {
+                "item": "Pears",
+                "date": self.purchase.date,
+                "amount": "41.00",
+                "source": "Market",
+                "location": "",
+                "category": self.category.pk,
+                "notes": "",
+            },
+            self.yearly_url,
+        )
+
+        self.assertPatched(response)
+        content = response.content.decode()
+        self.assertIn(f'<tr id="purchase-{self.purchase.pk}" hx-swap-oob="delete">', content)
+        self.assertIn(f'id="budget-row-{self.category.pk}"', content)
+
+    @override_settings(BUDGET_ENGINE="matrix")
+    def test_purchase_edit_patches_cached_load(self):
+        cache.clear()
+        self.client.get(self.yearly_url)
+        data = {
+            "item": "Pears",
+            "date": self.purchase.date,
+            "amount": "41.00",
+            "source": "Market",
+            "location": "",
+            "category": self.category.pk,
+            "notes": "",
+        }
+
+        with self.assertNumQueries(19):
+            response = self.htmx_post(
+                reverse("purchase_edit_htmx", kwargs={"pk": self.purchase.pk}),
+                data,
+                self.yearly_url,
+            )
+
+        self.assertPatched(response)
+        figures = BudgetService().get_yearly_figures(self.user, self.year, 12)
+        for key in ("total_remaining", "total_spent_saved", "free_income"):
+            self.assertEqual(response.context[key], figures[key])
+        self.assertEqual(
+            response.context["spending_rows"],
+            [line for line in figures["budget_items_combined"] if line.category == self.category.pk],
+        )
+
+    def test_bulk_edit_patches_category_row(self):
+        budget_items = BudgetItem.objects.filter(
+            user=self.user, category=self.category
+        ).order_by("monthly_budget__date")
+        data = {
+            "form-TOTAL_FORMS": "12",
+            "form-INITIAL_FORMS": "12",
+            "form-MIN_NUM_FORMS": "0",
+            "form-MAX_NUM_FORMS": "1000",
+        }
+        for index, budget_item in enumerate(budget_items):
+            data[f"form-{index}-id"] = budget_item.pk
+            data[f"form-{index}-amount"] = "150.00"
+
+        response = self.htmx_post(
+            reverse(
+                "budgetitem_bulk_edit_htmx",
+                kwargs={"year": self.year, "category": self.category.name},
+            ),
+            data,
+            self.yearly_url,
+        )
+
+        self.assertPatched(response)
+        self.assertContains(response, "$1800")
+        self.assertContains(response, f'id="budget-row-{self.category.pk}"')
+
+    def test_budget_item_moving_section_reloads(self):
+        budget_item = BudgetItem.objects.filter(user=self.user, category=self.category).first()
+        response = self.htmx_post(
+            reverse(
+                "budgetitem_edit_htmx",
+                kwargs={"year": self.year, "month": 1, "category": self.category.name},
+            ),
+            {"category": self.category.pk, "amount": "100", "savings": "on", "notes": ""},
+            self.yearly_url,
+        )
+
+        self.assertEqual(response.headers["HX-Redirect"], self.yearly_url)
+        budget_item.refresh_from_db()
+        self.assertTrue(budget_item.savings)
+
+    def test_other_pages_are_redirected(self):
+        purchases_url = reverse("purchase_list")
+        response = self.htmx_post(
+            reverse("purchase_create"), self.purchase_data(purchases_url), purchases_url
+        )
+        self.assertEqual(response.headers["HX-Redirect"], purchases_url)
+
+        response = self.client.post(
+            reverse("purchase_create"),
+            {**self.purchase_data(self.yearly_url), "next": self.yearly_url},
+        )
+        self.assertEqual(response.headers["HX-Redirect"], self.yearly_url)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class YearlySectionViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="testemail@test.com", username="testuser", password="testpass123"
+        )
+        cls.year = 2023
+        cls.yearly_budget = YearlyBudgetFactory(user=cls.user, date=datetime.date(cls.year, 1, 1))
+        cls.category = CategoryFactory(user=cls.user, name="Groceries")
+        cls.savings_category = CategoryFactory(user=cls.user, name="Emergency Fund")
+        for category, savings in ((cls.category, False), (cls.savings_category, True)):
+            BudgetItemFactory(
+                user=cls.user,
+                category=category,
+                yearly_budget=cls.yearly_budget,
+                monthly_budget=cls.yearly_budget.monthly_budgets.get(date__month=1),
+                amount=Decimal("100.00"),
+                savings=savings,
+            )
+            RolloverFactory(
+                user=cls.user, category=category, yearly_budget=cls.yearly_budget, amount=7
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get_section(self, section, **params):
+        return self.client.get(
+            reverse("yearly_section", kwargs={"year": self.year, "section": section}), params
+        )
+
+    def test_page_loads_sections_lazily(self):
+        response = self.client.get(reverse("yearly_detail", kwargs={"year": self.year}))
+
+        self.assertContains(response, 'id="yearly-summary"')
+        self.assertContains(response, 'hx-trigger="revealed"', count=3)
+        self.assertNotContains(response, f'id="budget-row-{self.category.pk}"')
+
+    @override_settings(BUDGET_ENGINE="matrix")
+    def test_page_computes_summary_only_and_grid_reuses_its_load(self):
+        response = self.client.get(reverse("yearly_detail", kwargs={"year": self.year}))
+        hits = cache_requests.samples.get(("year_matrix", "hit"), 0)
+
+        self.get_section("grid", ytd=12)
+
+        self.assertEqual(response.context["total_budgeted"], Decimal("200.00"))
+        for key in ("incomes", "purchases_uncategorized", "rollovers_spending"):
+            self.assertNotIn(key, response.context)
+        self.assertEqual(cache_requests.samples.get(("year_matrix", "hit"), 0), hits + 1)
+
+    def test_grid_section(self):
+        response = self.get_section("grid", ytd=3)
+
+        self.assertContains(response, f'id="budget-row-{self.category.pk}"')
+        self.assertContains(response, f'id="budget-row-{self.savings_category.pk}"')
+        self.assertContains(response, 'id="yearly-spending-totals"')
+        # Modal links return to the page, not to the section URL.
+        self.assertContains(response, f"?next={reverse('yearly_detail', args=[self.year])}'")
+
+    def test_rollover_sections_split_spending_and_savings(self):
+        spending = self.get_section("spending-rollovers")
+        savings = self.get_section("savings-rollovers")
+
+        self.assertContains(spending, 'data-category="Groceries"')
+        self.assertNotContains(spending, 'data-category="Emergency Fund"')
+        self.assertContains(savings, 'data-category="Emergency Fund"')
+        self.assertNotContains(savings, 'data-category="Groceries"')
+
+    def test_table_sections(self):
+        PurchaseFactory(
+            user=self.user, category=None, item="Stamps", date=datetime.date(self.year, 2, 1)
+        )
+        IncomeFactory(user=self.user, source="Salary", date=datetime.date(self.year, 2, 1))
+
+        self.assertContains(self.get_section("purchases"), "Stamps")
+        self.assertContains(self.get_section("incomes"), "Salary")
+
+    def test_cached_until_the_year_changes(self):
+        self.get_section("purchases")
+        with self.assertNumQueries(3):
+            # Session, user and data version; the section comes from cache.
+            self.assertNotContains(self.get_section("purchases"), "Stamps")
+
+        PurchaseFactory(
+            user=self.user, category=None, item="Stamps", date=datetime.date(self.year, 2, 1)
+        )
+
+        self.assertContains(self.get_section("purchases"), "Stamps")
+
+    def test_rollover_batch_update_invalidates_sections(self):
+        self.get_section("spending-rollovers")
+        rollover = Rollover.objects.get(category=self.category)
+
+        self.client.post(
+            reverse("rollover_batch_update", args=[self.year]),
+            json.dumps(
+                {"rollovers": [
+                    {"category": "Groceries", "amount": "12.50", "version": rollover.version}
+                ]}
+            ),
+            content_type="application/json",
+        )
+
+        self.assertContains(self.get_section("spending-rollovers"), 'value="12.50"')
+
+    def test_unknown_section_is_404(self):
+        self.assertEqual(self.get_section("everything").status_code, 404)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class BudgetRowCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="testemail@test.com", username="testuser", password="testpass123"
+        )
+        cls.year = datetime.date.today().year
+        cls.yearly_budget = YearlyBudgetFactory(user=cls.user, date=datetime.date(cls.year, 1, 1))
+        cls.monthly_budget = cls.yearly_budget.monthly_budgets.get(date__month=3)
+        cls.items = {
+            name: BudgetItemFactory(
+                user=cls.user,
+                category=CategoryFactory(user=cls.user, name=name),
+                yearly_budget=cls.yearly_budget,
+                monthly_budget=cls.monthly_budget,
+                amount=Decimal("100.00"),
+                savings=False,
+            )
+            for name in ("Groceries", "Rent")
+        }
+
+    def setUp(self):
+        cache.clear()
+        cache_requests.samples.clear()
+        fragment_render_duration.samples.clear()
+        self.client.force_login(self.user)
+
+    def row_lookups(self):
+        return {
+            result: cache_requests.samples.get(("budget_row", result), 0)
+            for result in ("hit", "miss")
+        }
+
+    def test_monthly_rows_rerender_only_for_changed_category(self):
+        url = reverse("monthly_detail", kwargs={"year": self.year, "month": 3})
+        self.client.get(url)
+        self.assertEqual(self.row_lookups(), {"hit": 0, "miss": 2})
+
+        item = self.items["Groceries"]
+        item.amount = Decimal("250.00")
+        item.save()
+        response = self.client.get(url)
+
+        self.assertEqual(self.row_lookups(), {"hit": 1, "miss": 3})
+        self.assertContains(response, "$250")
+        self.assertEqual(
+            fragment_render_duration.samples[("monthly-spending", "hit")]["count"], 1
+        )
+
+    def test_yearly_rows_rerender_only_for_changed_category(self):
+        url = reverse("yearly_section", kwargs={"year": self.year, "section": "grid"})
+        self.client.get(url, {"ytd": 12})
+        self.assertEqual(self.row_lookups(), {"hit": 0, "miss": 2})
+
+        PurchaseFactory(
+            user=self.user,
+            category=self.items["Rent"].category,
+            amount=Decimal("40.00"),
+            date=datetime.date(self.year, 3, 2),
+        )
+        response = self.client.get(url, {"ytd": 12})
+
+        self.assertEqual(self.row_lookups(), {"hit": 1, "miss": 3})
+        self.assertContains(response, "$40")
+
+    def test_rows_vary_on_ytd_month(self):
+        url = reverse("yearly_section", kwargs={"year": self.year, "section": "grid"})
+        self.client.get(url, {"ytd": 12})
+        self.client.get(url, {"ytd": 2})
+
+        self.assertEqual(self.row_lookups(), {"hit": 0, "miss": 4})
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ConditionalPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="testemail@test.com", username="testuser", password="testpass123"
+        )
+        cls.year = 2023
+        cls.yearly_budget = YearlyBudgetFactory(user=cls.user, date=datetime.date(cls.year, 1, 1))
+        cls.category = CategoryFactory(user=cls.user, name="Groceries")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse("yearly_detail", kwargs={"year": self.year})
+
+    def test_page_sends_validators(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header("ETag"))
+        self.assertTrue(response.has_header("Last-Modified"))
+        self.assertIn("Cookie", response["Vary"])
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_unchanged_page_is_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        with self.assertNumQueries(3):
+            # Session, user and data version; no budget queries.
+            response = self.client.get(self.url, headers={"if-none-match": etag})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_write_to_the_year_changes_the_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        PurchaseFactory(user=self.user, category=self.category, date=datetime.date(self.year, 2, 1))
+
+        response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_write_to_another_year_keeps_the_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        PurchaseFactory(
+            user=self.user, category=self.category, date=datetime.date(self.year + 1, 2, 1)
+        )
+
+        response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_varies_on_query_string(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, {"ytd": 3}, headers={"if-none-match": etag})
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_monthly_page_is_not_modified(self):
+        url = reverse("monthly_detail", kwargs={"year": self.year, "month": 2})
+        etag = self.client.get(url)["ETag"]
+
+        self.assertEqual(self.client.get(url, headers={"if-none-match": etag}).status_code, 304)
+
+    def test_yearly_list_changes_when_a_year_is_added(self):
+        url = reverse("yearly_list")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, headers={"if-none-match": etag}).status_code, 304)
+
+        YearlyBudgetFactory(user=self.user, date=datetime.date(self.year + 1, 1, 1))
+
+        self.assertEqual(self.client.get(url, headers={"if-none-match": etag}).status_code, 200)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ClosedYearTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="testemail@test.com", username="testuser", password="testpass123"
+        )
+        cls.year = 2023
+        cls.yearly_budget = YearlyBudgetFactory(user=cls.user, date=datetime.date(cls.year, 1, 1))
+        cls.category = CategoryFactory(user=cls.user, name="Groceries")
+        BudgetItemFactory(
+            user=cls.user,
+            category=cls.category,
+            yearly_budget=cls.yearly_budget,
+            monthly_budget=cls.yearly_budget.monthly_budgets.get(date__month=2),
+            amount=Decimal("100.00"),
+        )
+        cls.purchase = PurchaseFactory(
+            user=cls.user, category=cls.category,
+            date=datetime.date(cls.year, 2, 3), amount=Decimal("30.00"),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse("yearly_detail", kwargs={"year": self.year})
+
+    def close(self, **headers):
+        response = self.client.post(
+            reverse("yearly_close", kwargs={"year": self.year}), headers=headers
+        )
+        call_command("run_jobs", processes=0, once=True, stdout=StringIO())
+        return response
+
+    def change_purchase_silently(self):
+        # A queryset update skips the signals, so the snapshot stays current.
+        Purchase.objects.filter(pk=self.purchase.pk).update(amount=Decimal("45.00"))
+
+    def test_closed_year_is_served_from_snapshot(self):
+        self.assertRedirects(self.close(), self.url)
+        self.change_purchase_silently()
+
+        response = self.client.get(self.url)
+
+        self.assertTrue(response.context["closed"])
+        self.assertEqual(response.context["total_spending_spent"], Decimal("30.00"))
+        self.assertContains(response, "Reopen Year")
+
+    def test_closed_month_is_served_from_snapshot(self):
+        self.close()
+        self.change_purchase_silently()
+
+        response = self.client.get(
+            reverse("monthly_detail", kwargs={"year": self.year, "month": 2})
+        )
+
+        self.assertEqual(response.context["total_spent"], Decimal("30.00"))
+        self.assertEqual(
+            [purchase["pk"] for purchase in response.context["purchases"]], [self.purchase.pk]
+        )
+        self.assertContains(response, "Groceries")
+        self.assertContains(response, "Feb. 3, 2023")
+
+    def test_closed_grid_section_is_served_from_snapshot(self):
+        self.close()
+        self.change_purchase_silently()
+
+        response = self.client.get(
+            reverse("yearly_section", kwargs={"year": self.year, "section": "grid"})
+        )
+
+        self.assertContains(response, f'id="budget-row-{self.category.pk}"')
+        self.assertEqual(response.context["budget_items_combined"][0]["spent"], Decimal("30.00"))
+
+    def test_late_write_reopens_the_year(self):
+        self.close()
+
+        PurchaseFactory(
+            user=self.user, category=self.category,
+            date=datetime.date(self.year, 5, 1), amount=Decimal("5.00"),
+        )
+        response = self.client.get(self.url)
+
+        self.assertNotIn("closed", response.context)
+        self.assertEqual(response.context["total_spending_spent"], Decimal("35.00"))
+        self.assertContains(response, "Close Year")
+
+    def test_prior_year_rollover_reopens_the_year(self):
+        self.close()
+
+        RolloverFactory(
+            user=self.user,
+            category=self.category,
+            yearly_budget=YearlyBudgetFactory(user=self.user, date=datetime.date(self.year - 1, 1, 1)),
+            amount=Decimal("12.00"),
+        )
+
+        self.assertNotIn("closed", self.client.get(self.url).context)
+
+    def test_htmx_close_polls_the_job_until_the_page_can_reload(self):
+        response = self.close(hx_request="true")
+        job = Job.objects.get(user=self.user, name="budgets.close_year")
+
+        self.assertContains(response, 'hx-trigger="every 2s"')
+        self.assertContains(response, f"?next={self.url}'")
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, {"year": self.year, "contexts": 13})
+        status = self.client.get(
+            reverse("job_status", kwargs={"pk": job.pk}), {"next": self.url}, headers={"hx-request": "true"}
+        )
+        self.assertEqual(status["HX-Redirect"], self.url)
+
+    def test_reopen(self):
+        self.close()
+
+        response = self.client.post(reverse("yearly_reopen", kwargs={"year": self.year}))
+
+        self.assertRedirects(response, self.url)
+        self.assertFalse(YearSnapshot.objects.filter(user=self.user).exists())
+
+    def test_current_year_cannot_be_closed(self):
+        year = datetime.date.today().year
+        YearlyBudgetFactory(user=self.user, date=datetime.date(year, 1, 1))
+
+        response = self.client.post(reverse("yearly_close", kwargs={"year": year}))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(YearSnapshot.objects.filter(user=self.user).exists())
+
+    def test_close_requires_post(self):
+        response = self.client.get(reverse("yearly_close", kwargs={"year": self.year}))
+
+        self.assertEqual(response.status_code, 405)
+
+    def test_snapshot_is_stored_as_json(self):
+        self.close()
+
+        snapshot = YearSnapshot.objects.values_list("context", flat=True).get(
+            user=self.user, month=2
+        )
+        stored = YearSnapshot.objects.filter(user=self.user, month=2).values_list(
+            Cast("context", TextField()), flat=True
+        ).get()
+
+        self.assertEqual(snapshot["total_spent"], Decimal("30.00"))
+        self.assertEqual(snapshot["purchases"][0]["date"], self.purchase.date)
+        self.assertEqual(snapshot["purchases"][0]["category"], "Groceries")
+        self.assertEqual(json.loads(stored)["total_spent"], {"__decimal__": "30.00"})
+
+    def test_snapshot_without_context_is_computed_live(self):
+        self.close()
+        # Snapshots stored before contexts were JSON have none.
+        YearSnapshot.objects.filter(user=self.user).update(context=None)
+
+        response = self.client.get(self.url)
+
+        self.assertNotIn("closed", response.context)
+        self.assertEqual(response.context["total_spending_spent"], Decimal("30.00"))
+
+
+class ArchivedYearTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="testemail@test.com", username="testuser", password="testpass123"
+        )
+        cls.year = 2023
+        cls.yearly_budget = YearlyBudgetFactory(user=cls.user, date=datetime.date(cls.year, 1, 1))
+        cls.category = CategoryFactory(user=cls.user, name="Groceries")
+        BudgetItemFactory(
+            user=cls.user,
+            category=cls.category,
+            yearly_budget=cls.yearly_budget,
+            monthly_budget=cls.yearly_budget.monthly_budgets.get(date__month=2),
+            amount=Decimal("100.00"),
+        )
+        cls.purchase = PurchaseFactory(
+            user=cls.user, category=cls.category,
+            date=datetime.date(cls.year, 2, 3), amount=Decimal("30.00"),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse("yearly_detail", kwargs={"year": self.year})
+
+    def archive(self):
+        close_year(self.user, self.year)
+        return archive_year(self.user, self.year)
+
+    def test_only_closed_years_are_archived(self):
+        with self.assertRaises(ValueError):
+            archive_year(self.user, self.year)
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_archived_year_is_served_from_snapshot(self):
+        self.assertEqual(self.archive(), {Purchase: 1, Income: 0})
+
+        response = self.client.get(self.url)
+
+        self.assertFalse(Purchase.objects.filter(user=self.user).exists())
+        self.assertTrue(response.context["closed"])
+        self.assertEqual(response.context["total_spending_spent"], Decimal("30.00"))
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_late_write_restores_archived_rows(self):
+        self.archive()
+
+        PurchaseFactory(
+            user=self.user, category=self.category,
+            date=datetime.date(self.year, 5, 1), amount=Decimal("5.00"),
+        )
+        response = self.client.get(self.url)
+
+        self.assertTrue(Purchase.objects.filter(pk=self.purchase.pk).exists())
+        self.assertEqual(response.context["total_spending_spent"], Decimal("35.00"))
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_snapshot_without_context_reads_archived_rows(self):
+        income = IncomeFactory(
+            user=self.user, category=None, date=datetime.date(self.year, 2, 1),
+            amount=Decimal("50.00"),
+        )
+        self.archive()
+        YearSnapshot.objects.filter(user=self.user).update(context=None)
+
+        yearly = self.client.get(self.url)
+        monthly = self.client.get(
+            reverse("monthly_detail", kwargs={"year": self.year, "month": 2})
+        )
+        incomes = self.client.get(
+            reverse("yearly_section", kwargs={"year": self.year, "section": "incomes"})
+        )
+
+        self.assertNotIn("closed", yearly.context)
+        self.assertEqual(yearly.context["total_spending_spent"], Decimal("30.00"))
+        self.assertEqual(monthly.context["total_spending_spent"]["amount"], Decimal("30.00"))
+        self.assertEqual(monthly.context["total_income"]["amount"], Decimal("50.00"))
+        self.assertEqual(
+            [(purchase.pk, purchase.archived) for purchase in monthly.context["purchases"]],
+            [(self.purchase.pk, True)],
+        )
+        self.assertContains(incomes, "Archived")
+        self.assertNotContains(incomes, reverse("income_edit_htmx", kwargs={"pk": income.pk}))
+        # Reads leave the archive alone.
+        self.assertFalse(Purchase.objects.filter(pk=self.purchase.pk).exists())
+        self.assertTrue(ArchivedPurchase.objects.filter(pk=self.purchase.pk).exists())
+
+    def test_simulation_reads_archived_rows(self):
+        self.archive()
+
+        response = self.client.post(
+            reverse("budget_simulate", kwargs={"year": self.year}),
+            data="{}",
+            content_type="application/json",
+        )
+
+        self.assertEqual(Decimal(response.json()["total_spending_spent"]), Decimal("30.00"))
+        self.assertFalse(Purchase.objects.filter(pk=self.purchase.pk).exists())
+
+    def test_new_category_keeps_year_archived(self):
+        self.archive()
+
+        CategoryFactory(user=self.user, name="Travel")
+
+        self.assertFalse(Purchase.objects.filter(pk=self.purchase.pk).exists())
+        self.assertIsNotNone(load_snapshot(self.user.pk, self.year))
+
+    def test_renamed_category_restores_archived_rows(self):
+        self.archive()
+
+        self.category.name = "Food"
+        self.category.save()
+
+        self.assertTrue(Purchase.objects.filter(pk=self.purchase.pk).exists())
+        self.assertIsNone(load_snapshot(self.user.pk, self.year))
+
+    def test_reopen_restores_archived_rows(self):
+        self.archive()
+
+        reopen_year(self.user, self.year)
+
+        self.assertTrue(Purchase.objects.filter(pk=self.purchase.pk).exists())
+
+    @override_settings(STORAGES=TEST_STORAGES)
+    def test_category_pages_and_summaries_include_archived_rows(self):
+        self.archive()
+
+        detail = self.client.get(
+            reverse("yearly_budget_item_detail", kwargs={"year": self.year, "category": self.category.name})
+        )
+        summary = BudgetService().get_yearly_summaries(self.user)[self.year]
+
+        self.assertEqual([purchase.pk for purchase in detail.context["purchases"]], [self.purchase.pk])
+        self.assertContains(detail, "Archived")
+        self.assertEqual(summary.spent, Decimal("30.00"))
+
+    def test_recategorize_moves_archived_purchases(self):
+        self.archive()
+        other = CategoryFactory(user=self.user, name="Dining")
+
+        recategorize_purchases(self.user, self.year, self.category.pk, other.pk)
+
+        self.assertEqual(Purchase.objects.get(pk=self.purchase.pk).category, other)
+        self.assertFalse(ArchivedPurchase.objects.filter(user=self.user).exists())
+
+
+class QueuedBulkEditTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="testemail@test.com", username="testuser", password="testpass123"
+        )
+        cls.year = 2023
+        cls.yearly_budget = YearlyBudgetFactory(user=cls.user, date=datetime.date(cls.year, 1, 1))
+        cls.category = CategoryFactory(user=cls.user, name="Groceries")
+        cls.other = CategoryFactory(user=cls.user, name="Dining")
+        for month in (2, 5):
+            BudgetItemFactory(
+                user=cls.user,
+                category=cls.category,
+                yearly_budget=cls.yearly_budget,
+                monthly_budget=cls.yearly_budget.monthly_budgets.get(date__month=month),
+                amount=Decimal("100.00"),
+                savings=False,
+            )
+        RolloverFactory(
+            user=cls.user,
+            category=cls.category,
+            yearly_budget=cls.yearly_budget,
+            amount=Decimal("12.00"),
+        )
+        cls.purchase = PurchaseFactory(
+            user=cls.user, category=cls.category,
+            date=datetime.date(cls.year, 2, 3), amount=Decimal("30.00"),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def run_jobs(self):
+        call_command("run_jobs", processes=0, once=True, stdout=StringIO())
+
+    def test_clone_copies_the_budget_into_the_next_year(self):
+        response = self.client.post(
+            reverse("yearly_clone", kwargs={"year": self.year}), headers={"hx-request": "true"}
+        )
+        self.run_jobs()
+
+        target = reverse("yearly_detail", kwargs={"year": self.year + 1})
+        self.assertContains(response, f"?next={target}'")
+        items = BudgetItem.objects.filter(user=self.user, yearly_budget__date__year=self.year + 1)
+        self.assertEqual(
+            sorted(items.values_list("monthly_budget__date__month", "amount", "amount_cents")),
+            [(2, Decimal("100.00"), 10000), (5, Decimal("100.00"), 10000)],
+        )
+        rollover = Rollover.objects.get(user=self.user, yearly_budget__date__year=self.year + 1)
+        self.assertEqual((rollover.category, rollover.amount), (self.category, Decimal("0.00")))
+        self.assertEqual(MonthlyBudget.objects.filter(user=self.user, date__year=self.year + 1).count(), 12)
+        self.assertEqual(
+            Job.objects.get(user=self.user, name="budgets.clone_year").result,
+            {"year": self.year + 1, "count": 2},
+        )
+
+    def test_clone_again_only_adds_missing_categories(self):
+        self.assertEqual(BudgetItem.clone_year(self.user, self.year, self.year + 1), 2)
+        BudgetItemFactory(
+            user=self.user,
+            category=self.other,
+            yearly_budget=self.yearly_budget,
+            monthly_budget=self.yearly_budget.monthly_budgets.get(date__month=3),
+            amount=Decimal("40.00"),
+        )
+
+        self.assertEqual(BudgetItem.clone_year(self.user, self.year, self.year + 1), 1)
+        self.assertEqual(
+            BudgetItem.objects.filter(user=self.user, yearly_budget__date__year=self.year + 1).count(), 3
+        )
+
+    def test_clone_invalidates_the_next_year(self):
+        url = reverse("yearly_detail", kwargs={"year": self.year + 1})
+        YearlyBudgetFactory(user=self.user, date=datetime.date(self.year + 1, 1, 1))
+        self.assertEqual(self.client.get(url).context["budget_items_combined"], [])
+
+        BudgetItem.clone_year(self.user, self.year, self.year + 1)
+
+        self.assertEqual(len(self.client.get(url).context["budget_items_combined"]), 1)
+
+    def test_clone_requires_an_existing_year(self):
+        response = self.client.post(reverse("yearly_clone", kwargs={"year": self.year - 1}))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Job.objects.exists())
+
+    def test_recategorize_moves_the_years_purchases(self):
+        later = PurchaseFactory(
+            user=self.user, category=self.category,
+            date=datetime.date(self.year + 1, 1, 3), amount=Decimal("5.00"),
+        )
+        url = reverse("yearly_budget_item_detail", kwargs={"year": self.year, "category": "Dining"})
+
+        response = self.client.post(
+            reverse("budgetitem_recategorize", kwargs={"year": self.year, "category": "Groceries"}),
+            {"target": self.other.pk},
+        )
+        self.run_jobs()
+
+        self.assertRedirects(response, url)
+        self.assertEqual(Purchase.objects.get(pk=self.purchase.pk).category, self.other)
+        self.assertEqual(Purchase.objects.get(pk=later.pk).category, self.category)
+        self.assertEqual([p.pk for p in self.client.get(url).context["purchases"]], [self.purchase.pk])
+
+    def test_recategorize_rejects_another_users_category(self):
+        stranger = User.objects.create_user(username="stranger", password="testpass123")
+
+        response = self.client.post(
+            reverse("budgetitem_recategorize", kwargs={"year": self.year, "category": "Groceries"}),
+            {"target": CategoryFactory(user=stranger).pk},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Job.objects.exists())
@@ -5,6 +5,7 @@ from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from budgets.models import YearlyBudget, MonthlyBudget, BudgetItem, Rollover
+from budgets.services import BudgetLine
 from purchases.models import Purchase, Income
 from budgets.tests.factories import (
     YearlyBudgetFactory,
@@ -180,6 +181,27 @@ class TestYearlyBudgetDetailViewComprehensive(TestCase):
         # YTD Diff: 600 - 50 = 550
         self.assertEqual(food_item["diff_ytd"], Decimal("550.00"))
 
+    def test_rows_are_slotted_records(self):
+        """Budget lines are BudgetLine records readable by attribute and key."""
+        for mb in self.monthly_budgets:
+            BudgetItemFactory(
+                user=self.user,
+                category=self.cat_food,
+                monthly_budget=mb,
+                amount=Decimal("10.00"),
+                savings=False
+            )
+
+        response = self.client.get(reverse("yearly_detail", kwargs={"year": self.year}))
+        food_item = response.context["budget_items_combined"][0]
+
+        self.assertIsInstance(food_item, BudgetLine)
+        self.assertFalse(hasattr(food_item, "__dict__"))
+        self.assertEqual(food_item.category__name, "Food")
+        self.assertEqual(food_item["amount_total"], food_item.amount_total)
+        with self.assertRaises(KeyError):
+            food_item["missing"]
+
     def test_empty_state(self):
         """Verify view handles a year with no data gracefully."""
         empty_year = self.year - 5
@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.urls import path
 
 from .views import (
+    AsyncMonthlyBudgetDetailView,
+    AsyncYearlyBudgetDetailView,
     MonthlyBudgetCreateView,
     MonthlyBudgetDetailView,
     BudgetItemDetailView,
@@ -9,13 +12,24 @@ from .views import (
     BudgetItemDeleteView,
     YearlyBudgetItemDetailView,
     rollover_update_view,
+    rollover_batch_update,
+    yearly_section,
+    yearly_close,
+    yearly_clone,
+    yearly_reopen,
     budgetitem_bulk_edit,
     budgetitem_edit,
     budgetitem_delete,
+    budgetitem_recategorize,
     budget_item_create,
     budget_create,
+    budget_simulate,
 )
 
+if getattr(settings, "BUDGET_ASYNC_VIEWS", False):
+    YearlyBudgetDetailView = AsyncYearlyBudgetDetailView
+    MonthlyBudgetDetailView = AsyncMonthlyBudgetDetailView
+
 urlpatterns = [
     path("monthly-create", MonthlyBudgetCreateView.as_view(), name="monthly_create"),
     path(
@@ -28,6 +42,20 @@ urlpatterns = [
         budget_item_create,
         name="budgetitem_create_htmx",
     ),
+    path("<int:year>/simulate", budget_simulate, name="budget_simulate"),
+    path(
+        "<int:year>/rollovers",
+        rollover_batch_update,
+        name="rollover_batch_update",
+    ),
+    path(
+        "<int:year>/sections/<str:section>",
+        yearly_section,
+        name="yearly_section",
+    ),
+    path("<int:year>/close", yearly_close, name="yearly_close"),
+    path("<int:year>/reopen", yearly_reopen, name="yearly_reopen"),
+    path("<int:year>/clone", yearly_clone, name="yearly_clone"),
     path(
         "<int:year>/<int:month>/<str:category>/edit/htmx",
         budgetitem_edit,
@@ -48,6 +76,11 @@ urlpatterns = [
         budgetitem_delete,
         name="budget_item_delete_htmx",
     ),
+    path(
+        "<int:year>/<str:category>/recategorize",
+        budgetitem_recategorize,
+        name="budgetitem_recategorize",
+    ),
     path(
         "<int:year>/<str:category>",
         YearlyBudgetItemDetailView.as_view(),
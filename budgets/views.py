@@ -1,15 +1,17 @@
-import datetime
+import inspect
 import json
 import calendar
 import time
 
+from asgiref.sync import sync_to_async
+
 from django.db.models.fields import DecimalField, BooleanField
-from django.db import connection
+from django.db import connection, transaction
 from django.http.response import HttpResponseRedirect
-from django.http import JsonResponse, QueryDict
+from django.http import Http404, HttpResponse, JsonResponse, QueryDict
 from django.views.generic.edit import DeleteView
 from purchases.forms import PurchaseForm, PurchaseFormSetReceipt
-from django.shortcuts import redirect, render
+from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy, reverse
 from django.views.generic import (
     ListView,
@@ -20,6 +22,8 @@ from django.views.generic import (
 )
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.views.decorators.http import require_POST
 from django.db.models import (
     Sum,
     F,
@@ -32,12 +36,33 @@ from django.db.models import (
 )
 from django.db.models.functions import Coalesce
 
-from budgets.models import MonthlyBudget, YearlyBudget, BudgetItem, Rollover
+from budgets.models import (
+    BudgetItem,
+    DataVersion,
+    MonthlyBudget,
+    Rollover,
+    YearlyBudget,
+)
 from purchases.models import Category, Purchase, Income
-from budgets.forms import BudgetItemForm, BudgetItemFormset, YearlyBudgetForm
-from budgets.services import BudgetService
+from budgets.conditional import ConditionalPageMixin
+from budgets.forms import BudgetItemForm, BudgetItemFormset, RecategorizeForm, YearlyBudgetForm
+from budgets.page_updates import PageUpdate
+from budgets.sections import SECTIONS, render_section
+from budgets.services import BudgetService, YearSummary, get_budget_service, get_ytd_month
+from budgets.snapshots import (
+    can_close,
+    load_snapshot,
+    reopen_year,
+)
+from monitoring.metrics import cache_requests
 from django_htmx.http import HttpResponseClientRedirect
-from purchases.services import save_purchases_with_receipts
+from jobs.registry import enqueue
+from purchases.archive import with_archive
+from purchases.money import to_amount, to_cents
+from purchases.services import resolve_category, save_purchases_with_receipts
+
+
+SUMMARY_CACHE_TIMEOUT = 60 * 60
 
 
 class AddUserMixin:
@@ -46,7 +71,24 @@ class AddUserMixin:
         return super().form_valid(form)
 
 
-class YearlyBudgetListView(LoginRequiredMixin, ListView):
+def resolve_category_or_404(user, category):
+    """Resolve a category URL segment to ``(id, name)`` for the given user."""
+    resolved = resolve_category(user, category)
+    if resolved is None:
+        raise Http404("No category matches the given query.")
+    return resolved
+
+
+class CategoryUrlMixin:
+    def get_category(self):
+        if not hasattr(self, "_category"):
+            self._category = resolve_category_or_404(
+                self.request.user, self.kwargs["category"]
+            )
+        return self._category
+
+
+class YearlyBudgetListView(LoginRequiredMixin, ConditionalPageMixin, ListView):
     model = YearlyBudget
     context_object_name = "yearly_budgets"
     template_name = "budgets/yearly_budget_list.html"
@@ -55,12 +97,37 @@ class YearlyBudgetListView(LoginRequiredMixin, ListView):
         queryset = self.model.objects.filter(user=self.request.user).order_by("-date")
         return queryset
 
-
-class YearlyBudgetDetailView(LoginRequiredMixin, DetailView):
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        summaries = self.get_summaries()
+        for budget in context["yearly_budgets"]:
+            year = budget.date.year
+            budget.summary = summaries.get(year) or YearSummary(year=year)
+        return context
+
+    def get_summaries(self):
+        """Per-year summaries, cached until any of the user's years changes."""
+        user = self.request.user
+        version = getattr(self, "data_version", None)
+        if version is None:
+            version, _ = DataVersion.validators(user.pk)
+        key = f"yearly-summaries:{user.pk}:{version}"
+        summaries = cache.get(key)
+        cache_requests.inc(cache="yearly_summaries", result="miss" if summaries is None else "hit")
+        if summaries is None:
+            summaries = get_budget_service().get_yearly_summaries(user)
+            cache.set(key, summaries, SUMMARY_CACHE_TIMEOUT)
+        return summaries
+
+
+class YearlyBudgetDetailView(LoginRequiredMixin, ConditionalPageMixin, DetailView):
     model = YearlyBudget
     context_object_name = "yearly_budget"
     template_name = "budgets/yearly_budget_detail.html"
 
+    def get_data_year(self):
+        return self.kwargs["year"]
+
     def get_object(self):
         year_start, next_year_start = BudgetService.year_bounds(self.kwargs["year"])
         obj = self.model.objects.get(
@@ -74,30 +141,97 @@ class YearlyBudgetDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         kwargs = super().get_context_data(**kwargs)
 
-        if datetime.datetime.now().year > self.object.date.year:
-            ytd_month = 12
-        else:
-            current_month = datetime.datetime.now().month
-            try:
-                ytd_month = int(self.request.GET.get("ytd", current_month))
-            except (TypeError, ValueError):
-                ytd_month = current_month
+        ytd_month = get_ytd_month(self.object.date.year, self.request.GET.get("ytd"))
 
-            if not 1 <= ytd_month <= 12:
-                ytd_month = current_month
+        kwargs["ytd_month"] = ytd_month
+        kwargs.update(self.get_budget_context(ytd_month))
+        kwargs["can_close"] = can_close(self.object.date.year)
 
+        return kwargs
 
-        service = BudgetService()
-        budget_context = service.get_yearly_budget_context(
-            user=self.request.user,
-            year=self.object.date.year,
-            ytd_month=ytd_month,
+    def get_snapshot(self, ytd_month):
+        if ytd_month != 12:
+            return None
+        return load_snapshot(
+            self.request.user.pk,
+            self.object.date.year,
+            version=getattr(self, "data_version", None),
         )
 
-        kwargs["ytd_month"] = ytd_month
-        kwargs.update(budget_context)
+    def get_budget_context(self, ytd_month):
+        snapshot = self.get_snapshot(ytd_month)
+        if snapshot is not None:
+            return dict(snapshot, closed=True)
+        # The page only renders the summary; the sections load the rest.
+        return self.summary_context(
+            get_budget_service().get_yearly_figures(
+                self.request.user, self.object.date.year, ytd_month
+            )
+        )
 
-        return kwargs
+    @staticmethod
+    def summary_context(figures):
+        figures["months"] = [(calendar.month_name[m], m) for m in range(1, 13)]
+        return figures
+
+
+@login_required
+def yearly_section(request, year, section):
+    """One lazily loaded section of the yearly budget page."""
+    if section not in SECTIONS:
+        raise Http404
+    ytd_month = get_ytd_month(year, request.GET.get("ytd"))
+    return HttpResponse(render_section(request, year, section, ytd_month))
+
+
+@login_required
+@require_POST
+def yearly_close(request, year):
+    """Queue freezing a finished year so its pages are served from a snapshot.
+
+    Computing the snapshot takes a while, so it runs as a background job;
+    HTMX requests get the job's status, which reloads the page when done.
+    """
+    get_object_or_404(YearlyBudget, user=request.user, date__year=year)
+    if not can_close(year):
+        return HttpResponse(f"{year} is not over yet.", status=400)
+    job = enqueue("budgets.close_year", user=request.user, year=year)
+    if request.htmx:
+        return render(
+            request,
+            "jobs/_job_status.html",
+            {"job": job, "next": reverse("yearly_detail", kwargs={"year": year})},
+        )
+    return redirect("yearly_detail", year=year)
+
+
+@login_required
+@require_POST
+def yearly_clone(request, year):
+    """Queue copying a year's budget into the following year.
+
+    Like closing a year this writes a row per category and month, so it
+    runs as a background job; HTMX requests get the job's status, which
+    opens the new year when done.
+    """
+    get_object_or_404(YearlyBudget, user=request.user, date__year=year)
+    job = enqueue("budgets.clone_year", user=request.user, year=year, target=year + 1)
+    if request.htmx:
+        return render(
+            request,
+            "jobs/_job_status.html",
+            {"job": job, "next": reverse("yearly_detail", kwargs={"year": year + 1})},
+        )
+    return redirect("yearly_detail", year=year)
+
+
+@login_required
+@require_POST
+def yearly_reopen(request, year):
+    """Drop a closed year's snapshot so its pages are computed live again."""
+    get_object_or_404(YearlyBudget, user=request.user, date__year=year)
+    reopen_year(request.user, year)
+    return redirect("yearly_detail", year=year)
 
 
 class MonthlyBudgetCreateView(LoginRequiredMixin, AddUserMixin, CreateView):
@@ -114,12 +248,15 @@ class MonthlyBudgetCreateView(LoginRequiredMixin, AddUserMixin, CreateView):
         return super().form_valid(form)
 
 
-class MonthlyBudgetDetailView(LoginRequiredMixin, AddUserMixin, CreateView):
+class MonthlyBudgetDetailView(LoginRequiredMixin, ConditionalPageMixin, AddUserMixin, CreateView):
     model = Purchase
     context_object_name = "monthly_budget"
     form_class = PurchaseForm
     template_name = "budgets/monthly_budget_detail.html"
 
+    def get_data_year(self):
+        return self.kwargs["year"]
+
     def _get_monthly_budget(self):
         month_start, next_month_start = BudgetService.month_bounds(
             self.kwargs["year"], self.kwargs["month"]
@@ -134,12 +271,13 @@ class MonthlyBudgetDetailView(LoginRequiredMixin, AddUserMixin, CreateView):
 
         self.object = self._get_monthly_budget()
 
-        purchase_formset = PurchaseFormSetReceipt(
-            queryset=Purchase.objects.none(), form_kwargs={"user": self.request.user}
+        return self.render_to_response(
+            self.get_context_data(purchase_formset=self.get_purchase_formset())
         )
 
-        return self.render_to_response(
-            self.get_context_data(purchase_formset=purchase_formset)
+    def get_purchase_formset(self):
+        return PurchaseFormSetReceipt(
+            queryset=Purchase.objects.none(), form_kwargs={"user": self.request.user}
         )
 
     def post(self, request, *arg, **kwargs):
@@ -173,19 +311,33 @@ class MonthlyBudgetDetailView(LoginRequiredMixin, AddUserMixin, CreateView):
     def get_context_data(self, **kwargs):
 
         kwargs = super().get_context_data(**kwargs)
+        kwargs.update(self.get_budget_context())
+        kwargs["row_versions"] = DataVersion.for_categories(
+            self.request.user.pk, self.object.date.year
+        )
 
-        service = BudgetService()
-        budget_context = service.get_monthly_budget_context(
+        return kwargs
+
+    def get_snapshot(self):
+        return load_snapshot(
+            self.request.user.pk,
+            self.object.date.year,
+            month=self.object.date.month,
+            version=getattr(self, "data_version", None),
+        )
+
+    def get_budget_context(self):
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            return snapshot
+        service = get_budget_service()
+        return service.get_monthly_budget_context(
             user=self.request.user,
             year=self.object.date.year,
             month=self.object.date.month,
             monthly_budget=self.object,
         )
 
-        kwargs.update(budget_context)
-
-        return kwargs
-
     def get_form_kwargs(self):
 
         kwargs = super().get_form_kwargs()
@@ -210,17 +362,76 @@ class MonthlyBudgetDetailView(LoginRequiredMixin, AddUserMixin, CreateView):
 
 
 
-class BudgetItemDetailView(LoginRequiredMixin, DetailView):
+class AsyncBudgetViewMixin:
+    """Async dispatch for the budget detail views.
+
+    The user is loaded with ``auser`` so ``LoginRequiredMixin`` can check it
+    without a synchronous query. ``get`` loads the budget context with
+    concurrent aggregate queries; everything else runs in ``sync_to_async``.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        response = super().dispatch(request, *args, **kwargs)
+        if inspect.isawaitable(response):
+            response = await response
+        return response
+
+    def get_budget_context(self, *args):
+        if hasattr(self, "budget_context"):
+            return self.budget_context
+        return super().get_budget_context(*args)
+
+
+class AsyncYearlyBudgetDetailView(AsyncBudgetViewMixin, YearlyBudgetDetailView):
+    async def get(self, request, *args, **kwargs):
+        self.object = await sync_to_async(self.get_object)()
+        year = self.object.date.year
+        ytd_month = get_ytd_month(year, request.GET.get("ytd"))
+        snapshot = await sync_to_async(self.get_snapshot)(ytd_month)
+        if snapshot is not None:
+            self.budget_context = dict(snapshot, closed=True)
+        else:
+            # Only the summary is computed here; the sections load the rest.
+            self.budget_context = self.summary_context(
+                await get_budget_service().aget_yearly_figures(request.user, year, ytd_month)
+            )
+        context = await sync_to_async(self.get_context_data)(object=self.object)
+        return self.render_to_response(context)
+
+
+class AsyncMonthlyBudgetDetailView(AsyncBudgetViewMixin, MonthlyBudgetDetailView):
+    # Async views cannot mix sync handlers such as ProcessFormView.put.
+    http_method_names = ["get", "post", "options"]
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await sync_to_async(self._get_monthly_budget)()
+        self.budget_context = await sync_to_async(self.get_snapshot)()
+        if self.budget_context is None:
+            self.budget_context = await get_budget_service().aget_monthly_budget_context(
+                user=request.user,
+                year=self.object.date.year,
+                month=self.object.date.month,
+                monthly_budget=self.object,
+            )
+        context = await sync_to_async(
+            lambda: self.get_context_data(purchase_formset=self.get_purchase_formset())
+        )()
+        return self.render_to_response(context)
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(super().post)(request, *args, **kwargs)
+
+
+class BudgetItemDetailView(LoginRequiredMixin, CategoryUrlMixin, DetailView):
     model = BudgetItem
     context_object_name = "budget_item"
     template_name = "budgets/budgetitem_detail.html"
 
     def get_object(self):
-        obj = BudgetItem.objects.get(
-            user=self.request.user,
-            monthly_budget__date__year=self.kwargs["year"],
-            monthly_budget__date__month=self.kwargs["month"],
-            category__name=self.kwargs["category"],
+        category_id, _ = self.get_category()
+        obj = BudgetItem.get_for_month(
+            self.request.user, self.kwargs["year"], self.kwargs["month"], category_id
         )
 
         return obj
@@ -228,15 +439,14 @@ class BudgetItemDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         kwargs = super().get_context_data()
 
-        purchases = (
-            Purchase.objects.all()
-            .filter(
+        purchases = list(
+            with_archive(
+                Purchase,
                 user=self.request.user,
-                category__name=self.kwargs["category"],
+                category_id=self.get_category()[0],
                 date__year=self.kwargs["year"],
                 date__month=self.kwargs["month"],
-            )
-            .order_by("date")
+            ).order_by("date")
         )
 
         kwargs.update({"purchases": purchases})
@@ -244,16 +454,14 @@ class BudgetItemDetailView(LoginRequiredMixin, DetailView):
         return kwargs
 
 
-class BudgetItemDeleteView(LoginRequiredMixin, DeleteView):
+class BudgetItemDeleteView(LoginRequiredMixin, CategoryUrlMixin, DeleteView):
     model = BudgetItem
     template_name = "budgets/budgetitem_delete.html"
 
     def get_object(self):
-        obj = self.model.objects.get(
-            user=self.request.user,
-            monthly_budget__date__year=self.kwargs["year"],
-            monthly_budget__date__month=self.kwargs["month"],
-            category__name=self.kwargs["category"],
+        category_id, _ = self.get_category()
+        obj = self.model.get_for_month(
+            self.request.user, self.kwargs["year"], self.kwargs["month"], category_id
         )
 
         return obj
@@ -261,15 +469,16 @@ class BudgetItemDeleteView(LoginRequiredMixin, DeleteView):
     def post(self, request, *args, **kwargs):
 
         if self.request.POST.get("delete-all", False):
+            category_id, _ = self.get_category()
             self.model.objects.filter(
                 user=self.request.user,
                 monthly_budget__date__year=self.kwargs["year"],
-                category__name=self.kwargs["category"],
+                category_id=category_id,
             ).delete()
 
             Rollover.objects.filter(
                 user=self.request.user,
-                category__name=self.kwargs["category"],
+                category_id=category_id,
                 yearly_budget__date__year=self.kwargs["year"],
             ).delete()
 
@@ -278,8 +487,7 @@ class BudgetItemDeleteView(LoginRequiredMixin, DeleteView):
 
         else:
             self.object = self.get_object()
-            self.object.amount = 0
-            self.object.save()
+            self.object.clear()
             return HttpResponseRedirect(self.get_success_url())
 
     def get_success_url(self):
@@ -292,25 +500,23 @@ class BudgetItemDeleteView(LoginRequiredMixin, DeleteView):
 
 
 
-class YearlyBudgetItemDetailView(LoginRequiredMixin, TemplateView):
+class YearlyBudgetItemDetailView(LoginRequiredMixin, CategoryUrlMixin, TemplateView):
 
     template_name = "budgets/budgetitem_detail_yearly.html"
 
     def get_context_data(self, **kwargs):
         kwargs = super().get_context_data(**kwargs)
         year = self.kwargs["year"]
-        category = self.kwargs["category"]
+        category_id, category = self.get_category()
 
-        purchases = (
-            Purchase.objects.filter(
-                user=self.request.user, date__year=year, category__name=category
-            )
-            .order_by("date")
-            .prefetch_related("category")
+        purchases = list(
+            with_archive(
+                Purchase, user=self.request.user, date__year=year, category_id=category_id
+            ).order_by("date")
         )
 
-        incomes = Income.objects.filter(
-            user=self.request.user, date__year=year, category__name=category
+        incomes = list(
+            with_archive(Income, user=self.request.user, date__year=year, category_id=category_id)
         )
 
         kwargs.update(
@@ -319,6 +525,9 @@ class YearlyBudgetItemDetailView(LoginRequiredMixin, TemplateView):
                 "year": year,
                 "purchases": purchases,
                 "incomes": incomes,
+                "recategorize_form": RecategorizeForm(
+                    user=self.request.user, category_id=category_id
+                ),
             }
         )
 
@@ -332,9 +541,10 @@ def rollover_update_view(request):
         amount = data["amount"]
         category = data["category"]
         year = data["year"]
+        category_id, _ = resolve_category_or_404(request.user, category)
 
         obj = Rollover.objects.filter(
-            user=request.user, category__name=category, yearly_budget__date__year=year
+            user=request.user, category_id=category_id, yearly_budget__date__year=year
         ).get()
 
         obj.amount = amount
@@ -343,6 +553,222 @@ def rollover_update_view(request):
         return JsonResponse({"amount": amount})
 
 
+def _parse_rollover_batch(user, payload):
+    """Turn a batch payload into ``(cents, version)`` keyed by category id.
+
+    Raises ``ValueError`` for invalid input.
+    """
+    changes = {}
+    for change in payload["rollovers"]:
+        resolved = resolve_category(user, change.get("category"))
+        if resolved is None:
+            raise ValueError(f"Unknown category: {change.get('category')}")
+        changes[resolved[0]] = (to_cents(change["amount"]), int(change["version"]))
+    return changes
+
+
+def _rollover_versions(rollovers):
+    return [
+        {"category": category, "amount": amount, "version": version}
+        for category, amount, version in rollovers.order_by("category__name").values_list(
+            "category__name", "amount", "version"
+        )
+    ]
+
+
+@login_required
+@require_POST
+def rollover_batch_update(request, year):
+    """Save several rollovers of ``year`` at once.
+
+    The JSON body holds ``rollovers``, a list of ``category``, ``amount``
+    and ``version`` (the version the client last read), and an optional
+    ``ytd`` month. All rows are written by one conditional UPDATE that only
+    matches unchanged versions, so concurrent edits are detected without
+    locking rows. If any row changed in the meantime nothing is saved and
+    the response is a 409 carrying the current amounts and versions;
+    otherwise it carries the new versions and the recomputed yearly figures.
+    """
+    try:
+        payload = json.loads(request.body)
+        changes = _parse_rollover_batch(request.user, payload)
+        ytd_month = get_ytd_month(year, payload.get("ytd"))
+    except (ValueError, TypeError, KeyError, ArithmeticError, AttributeError) as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    rollovers = Rollover.objects.filter(
+        user=request.user, yearly_budget__date__year=year
+    )
+    with transaction.atomic():
+        conflict = Rollover.update_versioned(rollovers, changes) != len(changes)
+        if conflict:
+            transaction.set_rollback(True)
+        else:
+            DataVersion.bump(request.user.pk, year, year + 1, category_ids=changes)
+
+    changed = rollovers.filter(category_id__in=changes)
+    if conflict:
+        return JsonResponse(
+            {
+                "error": "Some rollovers were changed elsewhere. Review them and try again.",
+                "rollovers": _rollover_versions(changed),
+            },
+            status=409,
+        )
+
+    figures = _figures_as_json(
+        get_budget_service().get_yearly_figures(request.user, year, ytd_month)
+    )
+    figures["rollovers"] = _rollover_versions(changed)
+    figures["ytd_month"] = ytd_month
+    return JsonResponse(figures)
+
+
+def _parse_simulation(user, payload):
+    """Turn a simulation payload into cents keyed by category id.
+
+    Returns ``(amounts, rollovers)`` where ``amounts`` is keyed by
+    ``(category_id, month)``. Raises ``ValueError`` for invalid input.
+    """
+    amounts = {}
+    for change in payload.get("items", []):
+        resolved = resolve_category(user, change.get("category"))
+        if resolved is None:
+            raise ValueError(f"Unknown category: {change.get('category')}")
+        month = change.get("month")
+        months = range(1, 13) if month is None else [int(month)]
+        if not all(1 <= month <= 12 for month in months):
+            raise ValueError(f"Invalid month: {month}")
+        for month in months:
+            amounts[resolved[0], month] = to_cents(change["amount"])
+
+    rollovers = {}
+    for change in payload.get("rollovers", []):
+        resolved = resolve_category(user, change.get("category"))
+        if resolved is None:
+            raise ValueError(f"Unknown category: {change.get('category')}")
+        rollovers[resolved[0]] = to_cents(change["amount"])
+
+    return amounts, rollovers
+
+
+def _save_simulation(user, year, amounts, rollovers):
+    """Write simulated amounts and rollovers in a single transaction.
+
+    Months without a stored item get one. Raises ``ValueError``, writing
+    nothing, for a month without a monthly budget or a rollover the year
+    before does not carry over.
+    """
+    with transaction.atomic():
+        budget_items = []
+        anchors = {}
+        stored = set()
+        for budget_item in BudgetItem.objects.select_related("monthly_budget", "category").filter(
+            user=user,
+            monthly_budget__date__year=year,
+            category_id__in={category_id for category_id, _ in amounts},
+        ):
+            key = (budget_item.category_id, budget_item.monthly_budget.date.month)
+            anchors.setdefault(budget_item.category_id, budget_item)
+            stored.add(key)
+            if key in amounts:
+                budget_item.amount = to_amount(amounts[key])
+                budget_item.amount_cents = amounts[key]
+                budget_items.append(budget_item)
+        BudgetItem.objects.bulk_update(budget_items, ["amount", "amount_cents"])
+        monthly_budgets = {
+            monthly_budget.date.month: monthly_budget
+            for monthly_budget in MonthlyBudget.objects.filter(user=user, date__year=year)
+        }
+        for (category_id, month), cents in amounts.items():
+            # A missing month counts as zero, so only other amounts need a row.
+            if cents and (category_id, month) not in stored:
+                if month not in monthly_budgets:
+                    raise ValueError(f"{year} has no budget for month {month}")
+                budget_item = BudgetItem.placeholder(anchors[category_id], monthly_budgets[month])
+                budget_item.amount = to_amount(cents)
+                budget_item.save()
+        if BudgetItem.sparse():
+            BudgetItem.prune(
+                BudgetItem.objects.filter(
+                    user=user, monthly_budget__date__year=year, category_id__in=anchors
+                )
+            )
+
+        rollover_objects = list(
+            Rollover.objects.filter(
+                user=user,
+                yearly_budget__date__year=year - 1,
+                category_id__in=rollovers,
+            )
+        )
+        missing = set(rollovers) - {rollover.category_id for rollover in rollover_objects}
+        if missing:
+            raise ValueError(f"Category {min(missing)} has no rollover carried into {year}")
+        for rollover in rollover_objects:
+            rollover.amount = to_amount(rollovers[rollover.category_id])
+            rollover.amount_cents = rollovers[rollover.category_id]
+            rollover.version = F("version") + 1
+        Rollover.objects.bulk_update(
+            rollover_objects, ["amount", "amount_cents", "version"]
+        )
+        # Bulk writes skip the signals that bump data versions. Rollovers
+        # are stored on the year they are carried out of.
+        DataVersion.bump(
+            user.pk,
+            year,
+            *([year - 1] if rollovers else []),
+            category_ids={category_id for category_id, _ in amounts} | set(rollovers),
+        )
+
+
+def _figures_as_json(figures):
+    figures["budget_items_combined"] = [
+        line.as_dict() for line in figures["budget_items_combined"]
+    ]
+    figures["savings_items_combined"] = [
+        line.as_dict() for line in figures["savings_items_combined"]
+    ]
+    return figures
+
+
+@login_required
+@require_POST
+def budget_simulate(request, year):
+    """Recompute the yearly figures for hypothetical budget changes.
+
+    The JSON body holds ``items`` (``category``, ``amount`` and an optional
+    ``month``; without one every month changes) and ``rollovers``
+    (``category`` and the ``amount`` carried into the year from the one
+    before). Figures are computed in memory and nothing is saved unless
+    ``commit`` is true, in which case all changes are written in one
+    transaction. Changes that could not be saved, such as an amount for a
+    category without budget items or a rollover the previous year does not
+    carry over, are rejected whether or not they are committed.
+    """
+    try:
+        payload = json.loads(request.body)
+        amounts, rollovers = _parse_simulation(request.user, payload)
+        ytd_month = get_ytd_month(year, payload.get("ytd"))
+        figures = get_budget_service().get_yearly_figures(
+            request.user, year, ytd_month, amounts, rollovers
+        )
+        committed = bool(payload.get("commit"))
+        if committed:
+            _save_simulation(request.user, year, amounts, rollovers)
+    except (ValueError, TypeError, KeyError, ArithmeticError, AttributeError) as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    figures = _figures_as_json(figures)
+    figures["rollovers"] = {
+        category_id: to_amount(cents) for category_id, cents in rollovers.items()
+    }
+    figures["ytd_month"] = ytd_month
+    figures["committed"] = committed
+
+    return JsonResponse(figures)
+
+
 @login_required
 def budget_create(request):
 
@@ -368,12 +794,8 @@ def budget_create(request):
 @login_required
 def budgetitem_edit(request, year, month, category):
 
-    budget_item = BudgetItem.objects.get(
-        user=request.user,
-        yearly_budget__date__year=year,
-        monthly_budget__date__month=month,
-        category__name=category,
-    )
+    category_id, category = resolve_category_or_404(request.user, category)
+    budget_item = BudgetItem.get_for_month(request.user, year, month, category_id)
 
     form = BudgetItemForm(instance=budget_item, user=request.user)
 
@@ -383,8 +805,15 @@ def budgetitem_edit(request, year, month, category):
             instance=budget_item, data=request.POST, user=request.user
         )
         if form.is_valid():
-            form.save()
-            return HttpResponseClientRedirect(next)
+            update = PageUpdate(request, next)
+            if {"category", "new_category", "savings"} & set(form.changed_data):
+                # The row moves to another category or section.
+                update.reload()
+            budget_item = form.save()
+            if BudgetItem.sparse():
+                BudgetItem.prune(budget_item.category_year_items())
+            update.budget_changed(category_id, budget_item.category_id)
+            return update.response()
 
     if request.method == "GET":
         next = request.GET["next"]
@@ -399,22 +828,35 @@ def budgetitem_edit(request, year, month, category):
 @login_required
 def budgetitem_bulk_edit(request, year, category):
 
+    category_id, category = resolve_category_or_404(request.user, category)
+    yearly_budget = YearlyBudget.objects.get(user=request.user, date__year=year)
+    placeholders = []
+    if BudgetItem.sparse():
+        # The formset edits all twelve months; missing ones are only stored
+        # once a valid POST changes them.
+        placeholders = BudgetItem.missing_months(request.user, yearly_budget, category_id)
     budget_items = BudgetItem.objects.filter(
         user=request.user,
-        yearly_budget=YearlyBudget.objects.get(user=request.user, date__year=year),
-        category__name=category,
-    )
-    formset = BudgetItemFormset(queryset=budget_items)
+        yearly_budget=yearly_budget,
+        category_id=category_id,
+    ).select_related("monthly_budget").order_by("monthly_budget__date")
+    formset = BudgetItemFormset(queryset=budget_items, placeholders=placeholders)
 
     if request.method == "POST":
         next = request.POST.get("next")
-        formset = BudgetItemFormset(data=request.POST, queryset=budget_items)
+        formset = BudgetItemFormset(
+            data=request.POST, queryset=budget_items, placeholders=placeholders
+        )
 
         if formset.is_valid():
+            update = PageUpdate(request, next)
             instances = formset.save(commit=False)
             for instance in instances:
                 instance.save()
-            return HttpResponseClientRedirect(next)
+            if BudgetItem.sparse():
+                BudgetItem.prune(budget_items)
+            update.budget_changed(category_id)
+            return update.response()
 
     if request.method == "GET":
         next = request.GET["next"]
@@ -429,10 +871,11 @@ def budgetitem_bulk_edit(request, year, category):
 @login_required
 def budgetitem_delete(request, year, category):
 
+    category_id, category = resolve_category_or_404(request.user, category)
     budget_items = BudgetItem.objects.filter(
         user=request.user,
         yearly_budget__date__year=year,
-        category__name=category,
+        category_id=category_id,
     )
 
     next = request.GET["next"]
@@ -441,7 +884,7 @@ def budgetitem_delete(request, year, category):
         budget_items.delete()
         Rollover.objects.filter(
             user=request.user,
-            category__name=category,
+            category_id=category_id,
             yearly_budget__date__year=year,
         ).delete()
         return HttpResponseClientRedirect(next)
@@ -458,6 +901,33 @@ def budgetitem_delete(request, year, category):
     )
 
 
+@login_required
+@require_POST
+def budgetitem_recategorize(request, year, category):
+    """Queue moving a category's purchases for the year to another category.
+
+    A category can hold thousands of purchases a year, so the move runs as
+    a background job; HTMX requests get the job's status, which opens the
+    target category when done.
+    """
+    category_id, category = resolve_category_or_404(request.user, category)
+    form = RecategorizeForm(data=request.POST, user=request.user, category_id=category_id)
+    if not form.is_valid():
+        return HttpResponse(form.errors.as_text(), status=400)
+    target = form.cleaned_data["target"]
+    job = enqueue(
+        "purchases.recategorize",
+        user=request.user,
+        year=year,
+        category=category_id,
+        target=target.pk,
+    )
+    next_url = reverse("yearly_budget_item_detail", kwargs={"year": year, "category": target.name})
+    if request.htmx:
+        return render(request, "jobs/_job_status.html", {"job": job, "next": next_url})
+    return redirect(next_url)
+
+
 @login_required
 def budget_item_create(request, year):
 
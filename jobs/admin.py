@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "name", "user", "status", "attempts", "progress")
+    list_filter = ("status", "name")
+    readonly_fields = ("started_at", "finished_at", "created_at")
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,129 @@
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.process import init_worker_process, run_job_in_worker_process
+from jobs.worker import claim_jobs, record_failure, requeue_expired, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs on a local process pool. Several "
+        "workers may share a database: running jobs hold a lease that their "
+        "worker renews, and jobs whose lease expired are retried."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=getattr(settings, "JOBS_WORKER_PROCESSES", 2),
+            help="Worker processes; 0 runs jobs in this process.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=getattr(settings, "JOBS_POLL_INTERVAL_SECONDS", 1.0),
+            help="Seconds between checks for new jobs.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no due jobs are left instead of polling forever.",
+        )
+
+    def handle(self, *args, **options):
+        expired = requeue_expired()
+        if expired:
+            self.stdout.write(f"Found {expired} jobs whose lease expired")
+
+        if options["processes"] > 0:
+            completed = self._run_pool(options["processes"], options["poll_interval"], options["once"])
+        else:
+            completed = self._run_inline(options["poll_interval"], options["once"])
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {completed} jobs"))
+
+    def _run_inline(self, poll_interval, once):
+        completed = 0
+        while True:
+            requeue_expired()
+            claimed = claim_jobs(1)
+            if claimed:
+                run_job(claimed[0])
+                completed += 1
+            elif once:
+                return completed
+            else:
+                time.sleep(poll_interval)
+
+    def _run_pool(self, processes, poll_interval, once):
+        # Child processes open their own connections; never share the parent's.
+        connections.close_all()
+        completed = 0
+        while True:
+            ran, finished = self._run_on_new_pool(processes, poll_interval, once)
+            completed += ran
+            if finished:
+                return completed
+            self.stderr.write("The worker pool broke; starting a new one")
+
+    def _run_on_new_pool(self, processes, poll_interval, once):
+        """Run jobs until done (``once``) or the pool breaks.
+
+        Returns the number of jobs run and whether the worker is done.
+        """
+        completed = 0
+        running = {}
+        pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker_process,
+        )
+        with pool:
+            while True:
+                requeue_expired()
+                for job_id in claim_jobs(processes - len(running)):
+                    try:
+                        running[pool.submit(run_job_in_worker_process, job_id)] = job_id
+                    except BrokenProcessPool:
+                        running[self._failed_future()] = job_id
+                        break
+                if not running:
+                    if once:
+                        return completed, True
+                    time.sleep(poll_interval)
+                    continue
+                done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    job_id = running.pop(future)
+                    completed += 1
+                    try:
+                        future.result()
+                    except Exception as error:
+                        # The job's process died, or the job could not
+                        # record its own outcome; either way it failed.
+                        broken = broken or isinstance(error, BrokenProcessPool)
+                        self._record_failure(job_id, traceback.format_exc())
+                if broken:
+                    # Jobs still on a broken pool are lost with it.
+                    for job_id in running.values():
+                        self._record_failure(job_id, "The worker pool broke.")
+                    return completed, False
+
+    @staticmethod
+    def _failed_future():
+        future = Future()
+        future.set_exception(BrokenProcessPool("The worker pool broke."))
+        return future
+
+    def _record_failure(self, job_id, error):
+        self.stderr.write(f"Job {job_id} failed in its worker process:\n{error}")
+        record_failure(job_id, error)
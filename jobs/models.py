@@ -0,0 +1,82 @@
+import datetime
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A unit of background work, run by the ``run_jobs`` worker.
+
+    ``name`` selects a handler from ``jobs.registry`` and ``payload`` holds
+    its keyword arguments. Failed attempts are retried with exponential
+    backoff until ``max_attempts`` is reached. A running job holds a lease
+    until ``lease_expires_at`` that its worker keeps renewing; a job whose
+    lease ran out lost its worker and is retried.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+    FINISHED = (SUCCEEDED, FAILED)
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="jobs",
+        null=True,
+        blank=True,
+    )
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    progress = models.PositiveSmallIntegerField(default=0)
+    message = models.CharField(max_length=250, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    @property
+    def finished(self):
+        return self.status in self.FINISHED
+
+    def report_progress(self, done, total=100, message=""):
+        """Record ``done`` out of ``total`` units of work as a percentage."""
+        self.progress = min(100, int(done * 100 / total)) if total else 100
+        self.message = message[:250]
+        Job.objects.filter(pk=self.pk).update(progress=self.progress, message=self.message)
+
+    def retry_at(self):
+        delay = getattr(settings, "JOBS_RETRY_DELAY_SECONDS", 30)
+        return timezone.now() + datetime.timedelta(seconds=delay * 2 ** (self.attempts - 1))
+
+    @staticmethod
+    def lease_seconds():
+        return getattr(settings, "JOBS_LEASE_SECONDS", 60)
+
+    @classmethod
+    def lease_until(cls):
+        return timezone.now() + datetime.timedelta(seconds=cls.lease_seconds())
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="idx_job_status_run_after"),
+            models.Index(fields=["user", "status"], name="idx_job_user_status"),
+        ]
@@ -0,0 +1,20 @@
+"""Entry points for ``run_jobs`` worker processes.
+
+Spawned children unpickle these functions before Django is set up, so this
+module must not import models at import time.
+"""
+import django
+from django.db import connections
+
+
+def init_worker_process():
+    django.setup()
+
+
+def run_job_in_worker_process(job_id):
+    from .worker import run_job
+
+    try:
+        run_job(job_id)
+    finally:
+        connections.close_all()
@@ -0,0 +1,41 @@
+"""Job handler registry.
+
+Handlers are plain functions registered under a name::
+
+    @register("budgets.prune_budget_items")
+    def prune_budget_items(job):
+        ...
+
+They receive the ``Job`` followed by its payload as keyword arguments,
+may call ``job.report_progress`` and return JSON-serialisable data, which
+is stored as the job's result. Payloads must be JSON too, because handlers
+run in separate worker processes.
+"""
+from .models import Job
+
+
+_handlers = {}
+
+
+def register(name, max_attempts=3):
+    def decorator(handler):
+        _handlers[name] = (handler, max_attempts)
+        return handler
+
+    return decorator
+
+
+def get_handler(name):
+    try:
+        return _handlers[name][0]
+    except KeyError:
+        raise LookupError(f"No job handler is registered as {name!r}.")
+
+
+def enqueue(name, user=None, **payload):
+    """Queue the handler registered as ``name`` and return the new job."""
+    if name not in _handlers:
+        raise LookupError(f"No job handler is registered as {name!r}.")
+    return Job.objects.create(
+        name=name, user=user, payload=payload, max_attempts=_handlers[name][1]
+    )
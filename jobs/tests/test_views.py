@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from jobs.models import Job
+
+User = get_user_model()
+
+
+class TestJobStatusView(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="testemail@test.com", username="testuser", password="testpass123"
+        )
+        cls.other = User.objects.create_user(username="other", password="testpass123")
+        cls.job = Job.objects.create(user=cls.user, name="tests.record", progress=40)
+
+    def test_requires_login(self):
+        response = self.client.get(reverse("job_status", kwargs={"pk": self.job.pk}))
+        self.assertEqual(response.status_code, 302)
+
+    def test_polls_while_unfinished(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("job_status", kwargs={"pk": self.job.pk}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'hx-trigger="every 2s"')
+        self.assertContains(response, 'value="40"')
+
+    def test_stops_polling_when_finished(self):
+        Job.objects.filter(pk=self.job.pk).update(status=Job.SUCCEEDED, progress=100)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("job_status", kwargs={"pk": self.job.pk}))
+
+        self.assertNotContains(response, "hx-trigger")
+        self.assertContains(response, "Succeeded")
+
+    def test_other_users_job_not_found(self):
+        self.client.force_login(self.other)
+        response = self.client.get(reverse("job_status", kwargs={"pk": self.job.pk}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_redirects_to_local_next_once_succeeded(self):
+        Job.objects.filter(pk=self.job.pk).update(status=Job.SUCCEEDED, progress=100)
+        self.client.force_login(self.user)
+        url = reverse("job_status", kwargs={"pk": self.job.pk})
+
+        local = self.client.get(url, {"next": "/budgets/2023"})
+        external = self.client.get(url, {"next": "https://example.com/"})
+
+        self.assertEqual(local["HX-Redirect"], "/budgets/2023")
+        self.assertFalse(external.has_header("HX-Redirect"))
@@ -0,0 +1,190 @@
+import datetime
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from jobs.management.commands import run_jobs
+from jobs.models import Job
+from jobs.registry import enqueue, register
+from jobs.worker import claim_jobs, record_failure, renew_leases, requeue_expired, run_job
+
+User = get_user_model()
+
+calls = []
+
+
+class DyingPool:
+    """Stands in for the process pool; every job's process dies."""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, job_id):
+        future = Future()
+        future.set_exception(BrokenProcessPool("A process in the pool died."))
+        return future
+
+
+@register("tests.record", max_attempts=2)
+def record(job, value=None):
+    calls.append(value)
+    job.report_progress(1, 2, "Halfway")
+    return {"value": value}
+
+
+@register("tests.explode", max_attempts=2)
+def explode(job):
+    raise ValueError("boom")
+
+
+class TestRunJob(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="testemail@test.com", username="testuser", password="testpass123"
+        )
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_unknown_handler(self):
+        with self.assertRaises(LookupError):
+            enqueue("tests.missing")
+
+    def test_success(self):
+        job = enqueue("tests.record", user=self.user, value=3)
+        self.assertEqual(claim_jobs(5), [job.pk])
+
+        run_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(calls, [3])
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, {"value": 3})
+        self.assertEqual(job.progress, 100)
+        self.assertEqual(job.message, "Halfway")
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.finished_at)
+
+    @override_settings(JOBS_RETRY_DELAY_SECONDS=60)
+    def test_failure_is_retried_with_backoff(self):
+        job = enqueue("tests.explode", user=self.user)
+        claim_jobs(1)
+        before = timezone.now()
+
+        run_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn("ValueError: boom", job.error)
+        self.assertGreaterEqual(job.run_after, before + datetime.timedelta(seconds=60))
+        self.assertEqual(claim_jobs(1), [])
+
+    def test_failure_after_max_attempts(self):
+        job = enqueue("tests.explode", user=self.user)
+        for _ in range(2):
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            self.assertEqual(claim_jobs(1), [job.pk])
+            run_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNotNone(job.finished_at)
+
+    @override_settings(JOBS_MAX_PER_USER=1)
+    def test_per_user_limit(self):
+        other = User.objects.create_user(username="other", password="testpass123")
+        first = enqueue("tests.record", user=self.user)
+        second = enqueue("tests.record", user=self.user)
+        third = enqueue("tests.record", user=other)
+
+        self.assertEqual(claim_jobs(5), [first.pk, third.pk])
+        self.assertEqual(claim_jobs(5), [])
+
+        run_job(first.pk)
+        self.assertEqual(claim_jobs(5), [second.pk])
+
+    @override_settings(JOBS_LEASE_SECONDS=60)
+    def test_claimed_job_holds_a_lease(self):
+        job = enqueue("tests.record", user=self.user)
+        before = timezone.now()
+        claim_jobs(1)
+
+        job.refresh_from_db()
+        self.assertGreaterEqual(job.lease_expires_at, before + datetime.timedelta(seconds=60))
+        self.assertEqual(requeue_expired(), 0)
+
+        run_job(job.pk)
+        job.refresh_from_db()
+        self.assertIsNone(job.lease_expires_at)
+
+    def test_requeue_expired(self):
+        job = enqueue("tests.record", user=self.user)
+        claim_jobs(1)
+        Job.objects.filter(pk=job.pk).update(
+            lease_expires_at=timezone.now() - datetime.timedelta(seconds=1)
+        )
+
+        self.assertEqual(requeue_expired(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.error, "The job's lease expired.")
+        self.assertEqual(requeue_expired(), 0)
+
+    def test_renewed_lease_is_not_requeued(self):
+        job = enqueue("tests.record", user=self.user)
+        claim_jobs(1)
+        Job.objects.filter(pk=job.pk).update(
+            lease_expires_at=timezone.now() - datetime.timedelta(seconds=1)
+        )
+
+        self.assertEqual(renew_leases([job.pk]), 1)
+        self.assertEqual(requeue_expired(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+
+    def test_finished_job_is_not_failed_again(self):
+        job = enqueue("tests.record", user=self.user)
+        claim_jobs(1)
+        run_job(job.pk)
+
+        record_failure(job.pk, "The worker pool broke.")
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.error, "")
+
+    def test_run_jobs_command_inline(self):
+        enqueue("tests.record", user=self.user, value=1)
+        enqueue("tests.record", value=2)
+
+        call_command("run_jobs", processes=0, once=True, stdout=StringIO())
+
+        self.assertCountEqual(calls, [1, 2])
+        self.assertFalse(Job.objects.exclude(status=Job.SUCCEEDED).exists())
+
+    def test_run_jobs_command_survives_a_dying_worker_process(self):
+        job = enqueue("tests.record", user=self.user, value=1)
+        err = StringIO()
+
+        with mock.patch.object(run_jobs, "ProcessPoolExecutor", DyingPool):
+            call_command("run_jobs", processes=2, once=True, stdout=StringIO(), stderr=err)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("BrokenProcessPool", job.error)
+        self.assertIn(f"Job {job.pk} failed", err.getvalue())
@@ -0,0 +1,23 @@
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import get_object_or_404, render
+from django.utils.http import url_has_allowed_host_and_scheme
+from django_htmx.http import HttpResponseClientRedirect
+
+from .models import Job
+
+
+@login_required
+def job_status(request, pk):
+    """Render a job's status; the fragment polls itself until it finishes.
+
+    With a local ``next`` URL the page is sent there once the job succeeds.
+    """
+    job = get_object_or_404(Job, pk=pk, user=request.user)
+    next_url = request.GET.get("next")
+    if next_url and not url_has_allowed_host_and_scheme(
+        next_url, allowed_hosts={request.get_host()}, require_https=request.is_secure()
+    ):
+        next_url = None
+    if next_url and job.status == Job.SUCCEEDED:
+        return HttpResponseClientRedirect(next_url)
+    return render(request, "jobs/_job_status.html", {"job": job, "next": next_url})
@@ -0,0 +1,145 @@
+"""Claiming and running jobs for the ``run_jobs`` management command."""
+import threading
+import traceback
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Job
+from .registry import get_handler
+
+
+CLAIM_BATCH = 500
+
+
+def max_jobs_per_user():
+    return getattr(settings, "JOBS_MAX_PER_USER", 1)
+
+
+def claim_jobs(limit):
+    """Mark up to ``limit`` due jobs as running and return their ids.
+
+    Each job is claimed with a conditional update, so concurrent workers
+    never run the same job and no row locks are needed, and starts with a
+    fresh lease. Jobs of users who already have ``JOBS_MAX_PER_USER`` jobs
+    running are left queued.
+    """
+    if limit <= 0:
+        return []
+
+    running = {
+        row["user"]: row["count"]
+        for row in Job.objects.filter(status=Job.RUNNING, user__isnull=False)
+        .values("user")
+        .annotate(count=Count("pk"))
+        .order_by()
+    }
+    due = list(
+        Job.objects.filter(status=Job.QUEUED, run_after__lte=timezone.now())
+        .order_by("run_after", "pk")
+        .values_list("pk", "user_id")[:CLAIM_BATCH]
+    )
+
+    claimed = []
+    for pk, user_id in due:
+        if len(claimed) >= limit:
+            break
+        if user_id is not None and running.get(user_id, 0) >= max_jobs_per_user():
+            continue
+        updated = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            started_at=timezone.now(),
+            lease_expires_at=Job.lease_until(),
+            attempts=F("attempts") + 1,
+        )
+        if updated:
+            claimed.append(pk)
+            if user_id is not None:
+                running[user_id] = running.get(user_id, 0) + 1
+    return claimed
+
+
+def renew_leases(job_ids):
+    """Extend the leases of those of ``job_ids`` that are still running."""
+    return Job.objects.filter(pk__in=job_ids, status=Job.RUNNING).update(
+        lease_expires_at=Job.lease_until()
+    )
+
+
+@contextmanager
+def holding_lease(job_id):
+    """Renew ``job_id``'s lease from a thread while the block runs."""
+    stop = threading.Event()
+
+    def renew():
+        try:
+            while not stop.wait(Job.lease_seconds() / 3):
+                renew_leases([job_id])
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=renew, name=f"job-{job_id}-lease", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def requeue_expired():
+    """Retry or fail running jobs whose worker stopped renewing their lease.
+
+    Returns the number of jobs found. Jobs without a lease were claimed by
+    a worker that predates leases and count as expired.
+    """
+    expired = list(
+        Job.objects.filter(
+            Q(lease_expires_at__lt=timezone.now()) | Q(lease_expires_at__isnull=True),
+            status=Job.RUNNING,
+        ).values_list("pk", flat=True)
+    )
+    for job_id in expired:
+        record_failure(job_id, "The job's lease expired.")
+    return len(expired)
+
+
+def record_failure(job_id, error):
+    """Queue a failed attempt for a retry, or fail the job after its last one.
+
+    Only running jobs are updated, so a job whose failure another worker
+    already recorded is left alone.
+    """
+    job = Job.objects.get(pk=job_id)
+    running = Job.objects.filter(pk=job.pk, status=Job.RUNNING)
+    if job.attempts < job.max_attempts:
+        running.update(
+            status=Job.QUEUED, error=error, run_after=job.retry_at(), lease_expires_at=None
+        )
+    else:
+        running.update(
+            status=Job.FAILED, error=error, finished_at=timezone.now(), lease_expires_at=None
+        )
+
+
+def run_job(job_id):
+    """Run one claimed job, holding its lease, and record the outcome."""
+    job = Job.objects.select_related("user").get(pk=job_id)
+    try:
+        with holding_lease(job.pk):
+            result = get_handler(job.name)(job, **job.payload)
+    except Exception:
+        record_failure(job.pk, traceback.format_exc())
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.SUCCEEDED,
+            progress=100,
+            result=result,
+            error="",
+            finished_at=timezone.now(),
+            lease_expires_at=None,
+        )
+
@@ -0,0 +1,85 @@
+from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import RequestProfile
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        "created_at",
+        "method",
+        "path",
+        "view_name",
+        "status_code",
+        "duration_ms",
+        "query_count",
+        "db_ms",
+        "user",
+    )
+    list_filter = ("view_name", "status_code")
+    search_fields = ("path", "view_name")
+    readonly_fields = (
+        "user",
+        "method",
+        "path",
+        "view_name",
+        "status_code",
+        "duration_ms",
+        "query_count",
+        "db_ms",
+        "download_link",
+        "sql_timeline",
+        "stats_report",
+        "created_at",
+    )
+    exclude = ("profile_data", "sql", "stats")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:pk>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="monitoring_requestprofile_download",
+            ),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk):
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        response = HttpResponse(
+            bytes(profile.profile_data), content_type="application/octet-stream"
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="request-profile-{profile.pk}.prof"'
+        )
+        return response
+
+    @admin.display(description="Profile")
+    def download_link(self, obj):
+        url = reverse("admin:monitoring_requestprofile_download", args=[obj.pk])
+        return format_html('<a href="{}">Download .prof (pstats)</a>', url)
+
+    @admin.display(description="SQL timeline")
+    def sql_timeline(self, obj):
+        lines = [
+            f"+{query['start_ms']:>9.1f} ms  {query['duration_ms']:>8.1f} ms  {query['sql']}"
+            for query in obj.sql
+        ]
+        return format_html("<pre>{}</pre>", "\n".join(lines))
+
+    @admin.display(description="Stats")
+    def stats_report(self, obj):
+        return format_html("<pre>{}</pre>", obj.stats)
+
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
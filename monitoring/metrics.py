@@ -0,0 +1,340 @@
+"""In-process metrics registry with Prometheus text exposition.
+
+Each process keeps its own counters and histograms behind a lock. When
+``MONITORING_METRICS_DIR`` is set, processes also flush a JSON snapshot to
+that directory (at most every ``MONITORING_METRICS_FLUSH_SECONDS``) and the
+exposition merges every snapshot found there, so multi-worker deployments
+report totals across workers. When the exposition is collected, the files of
+processes that are no longer running are folded into ``metrics-retired.json``
+and removed, so their counts are kept and totals never go backwards.
+"""
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+RETIRED_FILE = "metrics-retired.json"
+
+
+class Metric:
+    type = None
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.samples = {}
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+        self.registry.maybe_flush()
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            sample = self.samples.get(key)
+            if sample is None:
+                sample = self.samples[key] = {
+                    "buckets": [0] * len(self.buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample["buckets"][index] += 1
+            sample["sum"] += value
+            sample["count"] += 1
+        self.registry.maybe_flush()
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self._last_flush = 0.0
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(self, name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, help, labelnames, buckets))
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                metric.name: {
+                    "type": metric.type,
+                    "help": metric.help,
+                    "labelnames": list(metric.labelnames),
+                    "buckets": list(getattr(metric, "buckets", ())),
+                    "samples": [
+                        [list(key), json.loads(json.dumps(value))]
+                        for key, value in metric.samples.items()
+                    ],
+                }
+                for metric in self.metrics.values()
+            }
+
+    def reset(self):
+        with self.lock:
+            for metric in self.metrics.values():
+                metric.samples.clear()
+
+    @staticmethod
+    def _directory():
+        directory = getattr(settings, "MONITORING_METRICS_DIR", None)
+        return Path(directory) if directory else None
+
+    def maybe_flush(self):
+        directory = self._directory()
+        if directory is None:
+            return
+        interval = getattr(settings, "MONITORING_METRICS_FLUSH_SECONDS", 5)
+        now = time.monotonic()
+        with self.lock:
+            if now - self._last_flush < interval:
+                return
+            self._last_flush = now
+        self.flush(directory)
+
+    def flush(self, directory):
+        directory.mkdir(parents=True, exist_ok=True)
+        _write_snapshot(directory / f"metrics-{os.getpid()}.json", self.snapshot())
+
+    def collect(self):
+        """Return this process's snapshot merged with other workers' files."""
+        snapshots = [self.snapshot()]
+        directory = self._directory()
+        if directory is not None and directory.exists():
+            own_file = f"metrics-{os.getpid()}.json"
+            with _directory_lock(directory):
+                dead = [
+                    path for path in directory.glob("metrics-*.json")
+                    if path.name != own_file and not _process_alive(path)
+                ]
+                if dead:
+                    _retire(directory, dead)
+                for path in sorted(directory.glob("metrics-*.json")):
+                    if path.name == own_file:
+                        continue
+                    try:
+                        snapshots.append(json.loads(path.read_text()))
+                    except (OSError, ValueError):
+                        continue
+        return merge_snapshots(snapshots)
+
+    def exposition(self):
+        return render_exposition(self.collect())
+
+
+def _write_snapshot(path, snapshot):
+    descriptor, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(descriptor, "w") as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+    os.replace(temp_path, path)
+
+
+@contextlib.contextmanager
+def _directory_lock(directory):
+    """Serialize collectors so a dead worker's counts are folded in once."""
+    if fcntl is None:
+        yield
+        return
+    with open(directory / "metrics.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _retire(directory, paths):
+    """Fold dead workers' snapshots into the retired totals, then remove them."""
+    retired = directory / RETIRED_FILE
+    snapshots = []
+    for path in [retired, *paths]:
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    merged = merge_snapshots(snapshots)
+    _write_snapshot(
+        retired,
+        {
+            name: {
+                **metric,
+                "samples": [[list(key), value] for key, value in metric["samples"].items()],
+            }
+            for name, metric in merged.items()
+        },
+    )
+    for path in paths:
+        try:
+            path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+
+def _process_alive(path):
+    """Whether the worker that wrote ``metrics-<pid>.json`` is still running.
+
+    Idle workers do not flush, so a file's age says nothing about its owner;
+    only the pid does. Other platforms and names without a valid pid, such
+    as the retired totals, count as alive.
+    """
+    try:
+        pid = int(path.stem.removeprefix("metrics-"))
+    except ValueError:
+        return True
+    if os.name != "posix" or pid <= 0:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge_snapshots(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(
+                name, {**metric, "samples": {}}
+            )
+            for key, value in metric["samples"]:
+                key = tuple(key)
+                if metric["type"] == "counter":
+                    target["samples"][key] = target["samples"].get(key, 0) + value
+                    continue
+                current = target["samples"].get(key)
+                if current is None:
+                    target["samples"][key] = {
+                        "buckets": list(value["buckets"]),
+                        "sum": value["sum"],
+                        "count": value["count"],
+                    }
+                else:
+                    current["buckets"] = [
+                        a + b for a, b in zip(current["buckets"], value["buckets"])
+                    ]
+                    current["sum"] += value["sum"]
+                    current["count"] += value["count"]
+    return merged
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def render_exposition(metrics):
+    lines = []
+    for name in sorted(metrics):
+        metric = metrics[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        names = metric["labelnames"]
+        for key in sorted(metric["samples"]):
+            value = metric["samples"][key]
+            if metric["type"] == "counter":
+                lines.append(f"{name}{_labels(names, key)} {_number(value)}")
+                continue
+            for bound, count in zip(metric["buckets"], value["buckets"]):
+                labels = _labels(names, key, [("le", _number(bound))])
+                lines.append(f"{name}_bucket{labels} {count}")
+            labels = _labels(names, key, [("le", "+Inf")])
+            lines.append(f"{name}_bucket{labels} {value['count']}")
+            lines.append(f"{name}_sum{_labels(names, key)} {_number(value['sum'])}")
+            lines.append(f"{name}_count{_labels(names, key)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_latency = registry.histogram(
+    "http_request_duration_seconds",
+    "Request latency by URL name.",
+    ["view", "method"],
+)
+request_queries = registry.histogram(
+    "http_request_queries",
+    "Database queries per request by URL name.",
+    ["view"],
+    buckets=QUERY_BUCKETS,
+)
+requests_total = registry.counter(
+    "http_requests_total",
+    "Requests by URL name and status code.",
+    ["view", "method", "status"],
+)
+cache_requests = registry.counter(
+    "cache_requests_total",
+    "Application cache lookups by cache and result (hit or miss).",
+    ["cache", "result"],
+)
+purchases_imported = registry.counter(
+    "purchases_imported_total",
+    "Purchases saved through the batch save services.",
+    ["source"],
+)
+purchase_import_duration = registry.histogram(
+    "purchase_import_duration_seconds",
+    "Time spent saving one batch of purchases.",
+    ["source"],
+)
+fragment_render_duration = registry.histogram(
+    "fragment_render_duration_seconds",
+    "Time spent producing one cached template fragment, by fragment and cache result.",
+    ["fragment", "result"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05),
+)
@@ -0,0 +1,241 @@
+import cProfile
+import io
+import json
+import logging
+import marshal
+import pstats
+import sys
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+
+from .metrics import request_latency, request_queries, requests_total
+from .models import RequestProfile
+
+
+logger = logging.getLogger("monitoring.requests")
+
+PROJECT_ROOT = str(Path(settings.BASE_DIR).resolve())
+STACK_DEPTH = 5
+
+
+def _project_stack(frame):
+    """Return ``file:line in function`` entries for project frames only."""
+    stack = []
+    while frame is not None and len(stack) < STACK_DEPTH:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(PROJECT_ROOT)
+            and "site-packages" not in filename
+            and filename != __file__
+        ):
+            relative = filename[len(PROJECT_ROOT) + 1:]
+            stack.append(f"{relative}:{frame.f_lineno} in {frame.f_code.co_name}")
+        frame = frame.f_back
+    return stack
+
+
+class QueryRecorder:
+    """Database execute wrapper that times every query of one request.
+
+    A query costs one tuple of its SQL and timings. The stack that issued
+    it is only walked for queries slower than ``MONITORING_SLOW_QUERY_MS``,
+    for every query once the request has run longer than
+    ``MONITORING_SLOW_REQUEST_MS``, or for all of them with
+    ``capture_stacks``. Queries may arrive from several threads at once
+    when a view runs them concurrently.
+    """
+
+    def __init__(self, capture_stacks=False):
+        self.lock = threading.Lock()
+        self.records = []
+        self.duration = 0.0
+        self.started = time.perf_counter()
+        self.capture_stacks = capture_stacks
+        self.slow_query = getattr(settings, "MONITORING_SLOW_QUERY_MS", 100) / 1000
+        self.slow_request = getattr(settings, "MONITORING_SLOW_REQUEST_MS", 500) / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            end = time.perf_counter()
+            duration = end - start
+            stack = None
+            if (
+                self.capture_stacks
+                or duration >= self.slow_query
+                or end - self.started >= self.slow_request
+            ):
+                stack = _project_stack(sys._getframe(1))
+            with self.lock:
+                self.duration += duration
+                self.records.append((sql, start, duration, stack))
+
+    @property
+    def queries(self):
+        """The recorded queries as dicts, built only when they are logged or stored."""
+        return [
+            {
+                "sql": sql,
+                "start_ms": round((start - self.started) * 1000, 3),
+                "duration_ms": round(duration * 1000, 3),
+                "stack": stack or [],
+            }
+            for sql, start, duration, stack in self.records
+        ]
+
+
+class RequestTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view_start = None
+        self.view_end = None
+        self.template_start = None
+        self.template_end = None
+        self.queries = QueryRecorder()
+
+    @staticmethod
+    def _span(start, end):
+        if start is None or end is None:
+            return 0.0
+        return (end - start) * 1000
+
+    def as_dict(self, end):
+        return {
+            "queries": len(self.queries.records),
+            "db_ms": round(self.queries.duration * 1000, 2),
+            "view_ms": round(self._span(self.view_start, self.view_end or end), 2),
+            "template_ms": round(self._span(self.template_start, self.template_end), 2),
+            "total_ms": round(self._span(self.start, end), 2),
+        }
+
+
+def _is_staff(request):
+    user = getattr(request, "user", None)
+    return user is not None and user.is_staff
+
+
+class RequestTimingMiddleware:
+    """Count queries and time the view, template and database per request.
+
+    Timings are sent back as a ``Server-Timing`` header to staff users (or
+    anyone with ``DEBUG``) and logged as one JSON line at INFO. Requests slower than ``MONITORING_SLOW_REQUEST_MS``
+    log at WARNING with every query, and the project frames that issued the
+    slow queries and those run after the threshold was crossed.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = request.timings = RequestTimings()
+
+        with connection.execute_wrapper(timings.queries):
+            response = self.get_response(request)
+
+        summary = timings.as_dict(time.perf_counter())
+        if settings.DEBUG or _is_staff(request):
+            response["Server-Timing"] = (
+                f'db;dur={summary["db_ms"]};desc="{summary["queries"]} queries", '
+                f'view;dur={summary["view_ms"]}, '
+                f'tmpl;dur={summary["template_ms"]}, '
+                f'total;dur={summary["total_ms"]}'
+            )
+
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": view_name,
+            "status": response.status_code,
+            **summary,
+        }
+
+        metric_view = view_name or "unmatched"
+        request_latency.observe(
+            summary["total_ms"] / 1000, view=metric_view, method=request.method
+        )
+        request_queries.observe(summary["queries"], view=metric_view)
+        requests_total.inc(
+            view=metric_view, method=request.method, status=response.status_code
+        )
+        if summary["total_ms"] >= getattr(settings, "MONITORING_SLOW_REQUEST_MS", 500):
+            record["slow"] = True
+            record["sql"] = timings.queries.queries
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.timings.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        timings = request.timings
+        timings.view_end = timings.template_start = time.perf_counter()
+
+        def record_render_end(response):
+            timings.template_end = time.perf_counter()
+
+        response.add_post_render_callback(record_render_end)
+        return response
+
+
+class RequestProfilerMiddleware:
+    """Run cProfile for one request when a staff user asks for it.
+
+    Send an ``X-Profile-Request`` header or a ``_profile`` query parameter.
+    The stats, raw profile and SQL timeline are stored as a
+    ``RequestProfile`` viewable in the admin. Other requests only pay for
+    the header and query string check.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (
+            "_profile" in request.GET or "X-Profile-Request" in request.headers
+        ) or not (request.user.is_authenticated and request.user.is_staff):
+            return self.get_response(request)
+
+        timings = getattr(request, "timings", None)
+        if timings:
+            timings.queries.capture_stacks = True
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        response = profiler.runcall(self.get_response, request)
+        duration_ms = (time.perf_counter() - start) * 1000
+        profiler.create_stats()
+
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(50)
+
+        queries = timings.queries.queries if timings else []
+        match = request.resolver_match
+
+        profile = RequestProfile.objects.create(
+            user=request.user,
+            method=request.method,
+            path=request.get_full_path()[:2048],
+            view_name=match.view_name if match else "",
+            status_code=response.status_code,
+            duration_ms=duration_ms,
+            query_count=len(queries),
+            db_ms=sum(query["duration_ms"] for query in queries),
+            stats=stream.getvalue(),
+            profile_data=marshal.dumps(profiler.stats),
+            sql=queries,
+        )
+        response["X-Request-Profile"] = reverse(
+            "admin:monitoring_requestprofile_change", args=[profile.pk]
+        )
+        return response
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name="request_profiles",
+        null=True,
+        blank=True,
+    )
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2048)
+    view_name = models.CharField(max_length=250, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField(default=0)
+    db_ms = models.FloatField(default=0)
+    stats = models.TextField(blank=True)
+    profile_data = models.BinaryField()
+    sql = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+    class Meta:
+        ordering = ["-created_at"]
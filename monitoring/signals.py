@@ -0,0 +1,16 @@
+from django.dispatch import receiver
+
+from purchases.signals import category_registry_lookup, purchases_saved
+
+from .metrics import cache_requests, purchase_import_duration, purchases_imported
+
+
+@receiver(category_registry_lookup)
+def count_category_registry_lookup(sender, hit, **kwargs):
+    cache_requests.inc(cache="category_registry", result="hit" if hit else "miss")
+
+
+@receiver(purchases_saved)
+def record_purchase_import(sender, source, count, duration, **kwargs):
+    purchases_imported.inc(count, source=source)
+    purchase_import_duration.observe(duration, source=source)
@@ -0,0 +1,150 @@
+import datetime
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from budgets.tests.factories import YearlyBudgetFactory
+from monitoring.metrics import Registry, cache_requests, purchases_imported
+from purchases.models import Purchase
+from purchases.services import get_category_registry, save_purchases_with_receipts
+
+
+User = get_user_model()
+
+
+class TestRegistry(SimpleTestCase):
+    def test_histogram_exposition(self):
+        registry = Registry()
+        latency = registry.histogram(
+            "latency_seconds", "Latency.", ["view"], buckets=(0.1, 1.0)
+        )
+        latency.observe(0.05, view="yearly_detail")
+        latency.observe(0.5, view="yearly_detail")
+
+        output = registry.exposition()
+
+        self.assertIn("# TYPE latency_seconds histogram", output)
+        self.assertIn('latency_seconds_bucket{view="yearly_detail",le="0.1"} 1', output)
+        self.assertIn('latency_seconds_bucket{view="yearly_detail",le="1"} 2', output)
+        self.assertIn('latency_seconds_bucket{view="yearly_detail",le="+Inf"} 2', output)
+        self.assertIn('latency_seconds_count{view="yearly_detail"} 2', output)
+
+    def test_label_values_are_escaped(self):
+        registry = Registry()
+        counter = registry.counter("events_total", "Events.", ["name"])
+        counter.inc(name='say "hi"\n')
+
+        self.assertIn('events_total{name="say \\"hi\\"\\n"} 1', registry.exposition())
+
+    def test_snapshots_from_other_workers_are_merged(self):
+        worker = Registry()
+        worker.counter("jobs_total", "Jobs.", ["kind"]).inc(3, kind="import")
+
+        with tempfile.TemporaryDirectory() as directory:
+            # A snapshot left behind by another worker process.
+            Path(directory, "metrics-0.json").write_text(json.dumps(worker.snapshot()))
+
+            local = Registry()
+            local.counter("jobs_total", "Jobs.", ["kind"]).inc(2, kind="import")
+            with override_settings(MONITORING_METRICS_DIR=directory):
+                self.assertIn('jobs_total{kind="import"} 5', local.exposition())
+
+    def test_snapshots_of_dead_workers_are_folded_into_retired_totals(self):
+        worker = Registry()
+        worker.counter("jobs_total", "Jobs.", ["kind"]).inc(3, kind="import")
+        process = subprocess.Popen([sys.executable, "-c", ""])
+        process.wait()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, f"metrics-{process.pid}.json")
+            path.write_text(json.dumps(worker.snapshot()))
+
+            local = Registry()
+            local.counter("jobs_total", "Jobs.", ["kind"]).inc(2, kind="import")
+            with override_settings(MONITORING_METRICS_DIR=directory):
+                self.assertIn('jobs_total{kind="import"} 5', local.exposition())
+                self.assertFalse(path.exists())
+                self.assertTrue(Path(directory, "metrics-retired.json").exists())
+                # Folded once: collecting again does not count them twice.
+                self.assertIn('jobs_total{kind="import"} 5', local.exposition())
+
+
+class TestPurchaseMetrics(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+
+    def test_batch_saves_are_counted(self):
+        before = purchases_imported.samples.get(("receipt",), 0)
+        purchases = [
+            Purchase(item=item, amount="1.00", date=datetime.date(2024, 1, 1), source="Shop")
+            for item in ("bread", "milk")
+        ]
+
+        save_purchases_with_receipts(self.user, purchases)
+
+        self.assertEqual(purchases_imported.samples[("receipt",)], before + 2)
+
+    def test_category_registry_lookups_are_counted(self):
+        before = cache_requests.samples.get(("category_registry", "miss"), 0)
+
+        get_category_registry(self.user.pk, refresh=True)
+
+        self.assertEqual(cache_requests.samples[("category_registry", "miss")], before + 1)
+
+
+class TestMetricsView(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        cls.staff = User.objects.create_user(
+            email="staff@example.com",
+            username="staffuser",
+            password="testpass123",
+            is_staff=True,
+        )
+        YearlyBudgetFactory(
+            user=cls.user, date=datetime.date(datetime.date.today().year, 1, 1)
+        )
+
+    def test_non_staff_users_are_forbidden(self):
+        self.client.login(email="test@example.com", password="testpass123")
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(MONITORING_METRICS_TOKEN="secret-token")
+    def test_bearer_token_grants_access(self):
+        response = self.client.get(
+            reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret-token"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(
+            reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong-token"
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_request_latency_is_labeled_by_url_name(self):
+        self.client.login(email="test@example.com", password="testpass123")
+        self.client.get(reverse("yearly_list"))
+        self.client.logout()
+
+        self.client.login(email="staff@example.com", password="testpass123")
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        content = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count{view="yearly_list",method="GET"}', content)
+        self.assertIn('http_requests_total{view="yearly_list",method="GET",status="200"}', content)
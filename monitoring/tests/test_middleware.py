@@ -0,0 +1,83 @@
+import datetime
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from budgets.tests.factories import YearlyBudgetFactory
+from monitoring import middleware
+
+
+User = get_user_model()
+
+
+class TestRequestTimingMiddleware(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123",
+            is_staff=True,
+        )
+        cls.year = datetime.date.today().year
+        YearlyBudgetFactory(user=cls.user, date=datetime.date(cls.year, 1, 1))
+
+    def setUp(self):
+        self.client.login(email="test@example.com", password="testpass123")
+
+    def test_server_timing_header_reports_queries_and_phases(self):
+        response = self.client.get(reverse("yearly_detail", args=[self.year]))
+
+        header = response["Server-Timing"]
+        self.assertRegex(header, r'db;dur=[\d.]+;desc="\d+ queries"')
+        for metric in ("view", "tmpl", "total"):
+            self.assertRegex(header, rf"{metric};dur=[\d.]+")
+
+    def test_server_timing_header_is_staff_only(self):
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+
+        response = self.client.get(reverse("yearly_detail", args=[self.year]))
+
+        self.assertNotIn("Server-Timing", response)
+
+    def test_request_line_is_logged_with_view_name(self):
+        with self.assertLogs("monitoring.requests", level="INFO") as logs:
+            self.client.get(reverse("yearly_list"))
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record["view"], "yearly_list")
+        self.assertEqual(record["status"], 200)
+        self.assertGreater(record["queries"], 0)
+        self.assertNotIn("sql", record)
+
+    @override_settings(MONITORING_SLOW_REQUEST_MS=60_000, MONITORING_SLOW_QUERY_MS=60_000)
+    def test_fast_requests_do_not_walk_stacks(self):
+        with mock.patch.object(middleware, "_project_stack") as project_stack:
+            response = self.client.get(reverse("yearly_detail", args=[self.year]))
+
+        self.assertRegex(response["Server-Timing"], r'desc="[1-9]\d* queries"')
+        project_stack.assert_not_called()
+
+    @override_settings(MONITORING_SLOW_REQUEST_MS=60_000, MONITORING_SLOW_QUERY_MS=0)
+    def test_slow_queries_keep_their_stack(self):
+        with mock.patch.object(middleware, "_project_stack", return_value=["here"]) as project_stack:
+            self.client.get(reverse("yearly_detail", args=[self.year]))
+
+        project_stack.assert_called()
+
+    @override_settings(MONITORING_SLOW_REQUEST_MS=0)
+    def test_slow_request_logs_queries_with_stack(self):
+        with self.assertLogs("monitoring.requests", level="WARNING") as logs:
+            self.client.get(reverse("yearly_detail", args=[self.year]))
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertTrue(record["slow"])
+        self.assertEqual(len(record["sql"]), record["queries"])
+        self.assertTrue(
+            any(
+                frame.startswith("budgets/")
+                for query in record["sql"]
+                for frame in query["stack"]
+            )
+        )
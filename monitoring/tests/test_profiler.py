@@ -0,0 +1,80 @@
+import datetime
+import marshal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from budgets.tests.factories import YearlyBudgetFactory
+from monitoring.models import RequestProfile
+
+
+User = get_user_model()
+
+
+class TestRequestProfilerMiddleware(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            email="staff@example.com",
+            username="staffuser",
+            password="testpass123",
+            is_staff=True,
+            is_superuser=True,
+        )
+        cls.user = User.objects.create_user(
+            email="test@example.com", username="testuser", password="testpass123"
+        )
+        cls.year = datetime.date.today().year
+        YearlyBudgetFactory(user=cls.staff, date=datetime.date(cls.year, 1, 1))
+        YearlyBudgetFactory(user=cls.user, date=datetime.date(cls.year, 1, 1))
+
+    def test_requests_are_not_profiled_by_default(self):
+        self.client.login(email="staff@example.com", password="testpass123")
+        response = self.client.get(reverse("yearly_detail", args=[self.year]))
+
+        self.assertNotIn("X-Request-Profile", response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_non_staff_cannot_trigger_profiling(self):
+        self.client.login(email="test@example.com", password="testpass123")
+        self.client.get(reverse("yearly_detail", args=[self.year]), {"_profile": "1"})
+
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_staff_profile_stores_stats_and_sql_timeline(self):
+        self.client.login(email="staff@example.com", password="testpass123")
+        response = self.client.get(
+            reverse("yearly_detail", args=[self.year]),
+            HTTP_X_PROFILE_REQUEST="1",
+        )
+
+        profile = RequestProfile.objects.get()
+        self.assertEqual(
+            response["X-Request-Profile"],
+            reverse("admin:monitoring_requestprofile_change", args=[profile.pk]),
+        )
+        self.assertEqual(profile.view_name, "yearly_detail")
+        self.assertEqual(profile.user, self.staff)
+        self.assertIn("cumulative", profile.stats)
+        self.assertGreater(profile.query_count, 0)
+        self.assertEqual(len(profile.sql), profile.query_count)
+        self.assertIn("start_ms", profile.sql[0])
+        self.assertIsInstance(marshal.loads(bytes(profile.profile_data)), dict)
+
+    def test_admin_download_returns_profile_file(self):
+        self.client.login(email="staff@example.com", password="testpass123")
+        self.client.get(reverse("yearly_list"), {"_profile": "1"})
+        profile = RequestProfile.objects.get()
+
+        change = self.client.get(
+            reverse("admin:monitoring_requestprofile_change", args=[profile.pk])
+        )
+        download = self.client.get(
+            reverse("admin:monitoring_requestprofile_download", args=[profile.pk])
+        )
+
+        self.assertEqual(change.status_code, 200)
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(download.content, bytes(profile.profile_data))
+        self.assertIn(".prof", download["Content-Disposition"])
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .metrics import registry
+
+
+def _has_metrics_access(request):
+    token = getattr(settings, "MONITORING_METRICS_TOKEN", "")
+    authorization = request.headers.get("Authorization", "")
+    if token and constant_time_compare(authorization, f"Bearer {token}"):
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def metrics_view(request):
+    if not _has_metrics_access(request):
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        registry.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/3.1/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
+import sys
 from datetime import datetime
 from pathlib import Path
 
@@ -56,15 +57,19 @@ INSTALLED_APPS = [
     "pages.apps.PagesConfig",
     "purchases.apps.PurchasesConfig",
     "budgets.apps.BudgetsConfig",
+    "monitoring.apps.MonitoringConfig",
+    "jobs.apps.JobsConfig",
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "monitoring.middleware.RequestTimingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "monitoring.middleware.RequestProfilerMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
@@ -191,9 +196,63 @@ ACCOUNT_UNIQUE_EMAIL = True
 LOGIN_REDIRECT_URL = "yearly_list"
 ACCOUNT_LOGOUT_REDIRECT_URL = "home"
 
+# Budget calculation engine: "service" (BudgetService), "matrix"
+# (MatrixBudgetService) or a dotted path to a compatible class.
+BUDGET_ENGINE = env("BUDGET_ENGINE", default="service")
+# Store only non-zero monthly budget items; missing months count as zero.
+# "manage.py prune_budget_items" removes zero rows created before enabling it.
+BUDGET_ITEMS_SPARSE = env.bool("BUDGET_ITEMS_SPARSE", default=False)
+# Serve the yearly and monthly pages from async views that run their
+# aggregate queries concurrently, on at most BUDGET_QUERY_WORKERS threads
+# with one connection each. Below 2 workers the queries run one by one.
+BUDGET_ASYNC_VIEWS = env.bool("BUDGET_ASYNC_VIEWS", default=False)
+BUDGET_QUERY_WORKERS = env.int("BUDGET_QUERY_WORKERS", default=4)
+
+# Background jobs ("manage.py run_jobs"): worker processes, running jobs
+# allowed per user, and the base delay before a failed attempt is retried
+# (doubled on each further attempt). A running job's lease is renewed every
+# third of JOBS_LEASE_SECONDS; jobs whose lease runs out are retried.
+JOBS_WORKER_PROCESSES = env.int("JOBS_WORKER_PROCESSES", default=2)
+JOBS_MAX_PER_USER = env.int("JOBS_MAX_PER_USER", default=1)
+JOBS_RETRY_DELAY_SECONDS = env.int("JOBS_RETRY_DELAY_SECONDS", default=30)
+JOBS_POLL_INTERVAL_SECONDS = env.float("JOBS_POLL_INTERVAL_SECONDS", default=1.0)
+JOBS_LEASE_SECONDS = env.int("JOBS_LEASE_SECONDS", default=60)
+
+# Request instrumentation: requests slower than this log their full query list
+MONITORING_SLOW_REQUEST_MS = env.int("MONITORING_SLOW_REQUEST_MS", default=500)
+# Queries slower than this keep the stack that issued them.
+MONITORING_SLOW_QUERY_MS = env.int("MONITORING_SLOW_QUERY_MS", default=100)
+# Metrics endpoint: staff users or "Authorization: Bearer <token>" may scrape it.
+# Set a shared directory so multi-process workers report combined metrics.
+MONITORING_METRICS_TOKEN = env("MONITORING_METRICS_TOKEN", default="")
+MONITORING_METRICS_DIR = env("MONITORING_METRICS_DIR", default=None)
+
+# Every request logs one JSON line at INFO and slow requests log at WARNING;
+# test runs only log errors unless MONITORING_LOG_LEVEL says otherwise.
+MONITORING_LOG_LEVEL = "ERROR" if sys.argv[1:2] == ["test"] else "WARNING"
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "monitoring": {
+            "handlers": ["console"],
+            "level": env("MONITORING_LOG_LEVEL", default=MONITORING_LOG_LEVEL),
+        },
+    },
+}
+
 if env("ENVIRONMENT") == "production":
     X_FRAME_OPTIONS = "DENY"
     SECURE_SSL_REDIRECT = True
     SESSION_COOKIE_SECURE = True
     CSRF_COOKIE_SECURE = True
     SECURE_REFERRER_POLICY = "same-origin"
+
+# Conditional GET: budget and purchase pages send ETags built from the user's
+# data versions. Set RELEASE to a new value on each deploy so browsers do not
+# keep revalidating markup rendered by the previous release.
+PAGE_ETAG_RELEASE = env("RELEASE", default="")
@@ -23,6 +23,8 @@ urlpatterns = [
     path("accounts/", include("allauth.urls")),
     path("purchases/", include("purchases.urls")),
     path("budgets/", include("budgets.urls")),
+    path("metrics/", include("monitoring.urls")),
+    path("jobs/", include("jobs.urls")),
     path("__debug__/", include(debug_toolbar.urls)),
     path("", include("pages.urls")),
 ]
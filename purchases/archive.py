@@ -0,0 +1,100 @@
+"""Cold storage for the purchases and incomes of closed years.
+
+``archive_entries`` moves a year's ``Purchase`` and ``Income`` rows into
+``ArchivedPurchase`` and ``ArchivedIncome``, which carry the same columns and
+ids but a single index, so the hot tables and their indexes stop growing
+with history. ``restore_entries`` moves them back. Rows are copied with one
+``INSERT ... SELECT`` per table and deleted without signals: nothing about
+the rows changes, so nothing must be invalidated, and receipts are kept.
+
+The budget app only archives a year while its snapshot is current and
+restores it when the year is reopened or written to; see
+``budgets.snapshots``. Reads never move rows: sums over a past year add up
+each of ``sources`` and lists that can reach back that far use
+``with_archive`` or ``entries``.
+"""
+import datetime
+
+from django.db import connection, transaction
+from django.db.models import Max, Value
+
+from .models import ArchivedIncome, ArchivedPurchase, Income, Purchase
+
+
+ARCHIVE_MODELS = {Purchase: ArchivedPurchase, Income: ArchivedIncome}
+
+
+def _move(queryset, target):
+    """Copy ``queryset``'s rows into ``target`` and delete them, returning the count."""
+    columns = [field.column for field in target._meta.concrete_fields]
+    attnames = [field.attname for field in target._meta.concrete_fields]
+    select, params = queryset.values(*attnames).query.sql_with_params()
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(target._meta.db_table)} "
+            f"({', '.join(quote(column) for column in columns)}) {select}",
+            params,
+        )
+        count = cursor.rowcount
+    # A raw delete sends no signals: the rows still exist, only elsewhere.
+    queryset._raw_delete(queryset.db)
+    return count
+
+
+def archive_entries(user_id, year):
+    """Move ``year``'s purchases and incomes to the archive tables.
+
+    Returns ``{model: rows moved}``.
+    """
+    with transaction.atomic():
+        return {
+            model: _move(model.objects.filter(user_id=user_id, date__year=year), archive)
+            for model, archive in ARCHIVE_MODELS.items()
+        }
+
+
+def restore_entries(user_id, years):
+    """Move the archived purchases and incomes of ``years`` back."""
+    with transaction.atomic():
+        return {
+            model: _move(archive.objects.filter(user_id=user_id, date__year__in=years), model)
+            for model, archive in ARCHIVE_MODELS.items()
+        }
+
+
+def archived_through(user_id, model=Purchase):
+    """The latest date among ``model``'s archived rows, or ``None``."""
+    return (
+        ARCHIVE_MODELS[model].objects.filter(user_id=user_id).aggregate(date=Max("date"))["date"]
+    )
+
+
+def with_archive(model, *args, **kwargs):
+    """``model`` rows matching the filters, live and archived, as one union.
+
+    Rows come back as ``model`` instances with ``archived`` set and their
+    ``category`` joined. Like any union, the result only supports ordering,
+    slicing and counting.
+    """
+    live = model.objects.filter(*args, **kwargs).annotate(archived=Value(False))
+    cold = ARCHIVE_MODELS[model].objects.filter(*args, **kwargs).annotate(archived=Value(True))
+    return live.select_related("category").union(cold.select_related("category"), all=True)
+
+
+def sources(model, year):
+    """The models whose tables may hold ``model``'s rows of ``year``.
+
+    Only closed years are archived, and those are in the past, so the
+    current year never pays for the archive table.
+    """
+    if year < datetime.date.today().year:
+        return (model, ARCHIVE_MODELS[model])
+    return (model,)
+
+
+def entries(model, year, *args, **kwargs):
+    """``model`` rows of ``year`` matching the filters, for listing."""
+    if len(sources(model, year)) > 1:
+        return with_archive(model, *args, **kwargs)
+    return model.objects.filter(*args, **kwargs).select_related("category")
@@ -0,0 +1,66 @@
+import datetime
+from decimal import Decimal
+
+from jobs.registry import enqueue, register
+from purchases.models import Purchase
+from purchases.services import recategorize_purchases, save_purchases_with_individual_receipts
+
+
+IMPORT_FIELDS = [
+    "item",
+    "source",
+    "location",
+    "notes",
+    "savings",
+    "category_id",
+    "recurring_purchase_id",
+]
+
+
+def enqueue_purchase_import(user, purchases):
+    """Queue saving unsaved ``purchases``, each with its own receipt."""
+    rows = [
+        {
+            **{field: getattr(purchase, field) for field in IMPORT_FIELDS},
+            "date": purchase.date.isoformat() if purchase.date else None,
+            "amount": str(purchase.amount) if purchase.amount is not None else None,
+        }
+        for purchase in purchases
+    ]
+    return enqueue("purchases.import_purchases", user=user, purchases=rows)
+
+
+@register("purchases.import_purchases")
+def import_purchases(job, purchases):
+    purchases = [
+        Purchase(
+            user=job.user,
+            **{field: row[field] for field in IMPORT_FIELDS},
+            date=datetime.date.fromisoformat(row["date"]) if row["date"] else None,
+            amount=Decimal(row["amount"]) if row["amount"] is not None else None,
+        )
+        for row in purchases
+    ]
+    # Another import of the same month may have added a recurring purchase
+    # since this one was queued.
+    added = set(
+        Purchase.objects.filter(
+            user=job.user,
+            recurring_purchase_id__in={p.recurring_purchase_id for p in purchases} - {None},
+        ).values_list("recurring_purchase_id", "date__year", "date__month")
+    )
+    purchases = [
+        purchase
+        for purchase in purchases
+        if purchase.recurring_purchase_id is None
+        or purchase.date is None
+        or (purchase.recurring_purchase_id, purchase.date.year, purchase.date.month) not in added
+    ]
+    saved = save_purchases_with_individual_receipts(job.user, purchases)
+    return {"count": len(saved)}
+
+
+@register("purchases.recategorize")
+def recategorize(job, year, category, target):
+    count = recategorize_purchases(job.user, year, category, target)
+    return {"year": year, "count": count}
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:35
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def backfill_amount_cents(apps, schema_editor):
+    for model_name in ("Purchase", "Income"):
+        model = apps.get_model('purchases', model_name)
+        batch = []
+        for obj in model.objects.only("pk", "amount").iterator(chunk_size=2000):
+            if obj.amount is None:
+                continue
+            obj.amount_cents = int((Decimal(str(obj.amount)) * 100).to_integral_value())
+            batch.append(obj)
+            if len(batch) == 2000:
+                model.objects.bulk_update(batch, ["amount_cents"])
+                batch = []
+        model.objects.bulk_update(batch, ["amount_cents"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0010_receipt_purchase_receipt_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='income',
+            name='amount_cents',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='amount_cents',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_amount_cents, migrations.RunPython.noop),
+    ]
@@ -86,6 +86,8 @@ class Purchase(models.Model):
         related_name="purchases",
     )
     amount = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    # Integer copy of ``amount`` kept in sync by a pre_save signal.
+    amount_cents = models.BigIntegerField(default=0, editable=False)
     source = models.CharField(max_length=250, blank=True)
     location = models.CharField(max_length=250, blank=True)
     category = models.ForeignKey(
@@ -152,6 +154,8 @@ class Income(models.Model):
         null=False,
     )
     amount = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    # Integer copy of ``amount`` kept in sync by a pre_save signal.
+    amount_cents = models.BigIntegerField(default=0, editable=False)
     date = models.DateField(blank=True, null=True)
     source = models.CharField(max_length=250, blank=True)
     payer = models.CharField(max_length=250, blank=True)
@@ -173,6 +177,75 @@ class Income(models.Model):
         ]
 
 
+class ArchivedPurchase(models.Model):
+    """A purchase of a closed year, moved out of the hot ``Purchase`` table.
+
+    Fields mirror ``Purchase`` in the same order, so the two tables can be
+    queried as one union, and ids are kept so a restored row is unchanged.
+    Only ``(user, date)`` is indexed. See ``purchases.archive``.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    item = models.CharField(max_length=250, blank=True)
+    date = models.DateField(null=True, default=None)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    receipt = models.ForeignKey(
+        Receipt, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    amount_cents = models.BigIntegerField(default=0, editable=False)
+    source = models.CharField(max_length=250, blank=True)
+    location = models.CharField(max_length=250, blank=True)
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    subcategory = models.ForeignKey(
+        Subcategory, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    recurring_purchase = models.ForeignKey(
+        "RecurringPurchase", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    notes = models.TextField(blank=True)
+    savings = models.BooleanField(null=False, default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.item
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "date"], name="idx_arch_purchase_user_date"),
+        ]
+
+
+class ArchivedIncome(models.Model):
+    """An income of a closed year; mirrors ``Income`` like ``ArchivedPurchase``."""
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    amount_cents = models.BigIntegerField(default=0, editable=False)
+    date = models.DateField(blank=True, null=True)
+    source = models.CharField(max_length=250, blank=True)
+    payer = models.CharField(max_length=250, blank=True)
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "date"], name="idx_arch_income_user_date"),
+        ]
+
+
 class RecurringPurchase(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -0,0 +1,32 @@
+"""Integer-cent helpers for the ``amount_cents`` shadow columns.
+
+``Purchase``, ``Income``, ``BudgetItem`` and ``Rollover`` store their
+``amount`` a second time as integer cents so sums can run on integers.
+``pre_save`` signals keep the column in sync; code that bypasses signals
+(``bulk_create``, ``bulk_update``, ``QuerySet.update``) must call
+``sync_amount_cents`` or set the column itself.
+"""
+from decimal import Decimal
+
+
+def to_cents(amount):
+    """Convert a money amount to integer cents; ``None`` counts as zero."""
+    if amount is None:
+        return 0
+    return int((Decimal(str(amount)) * 100).to_integral_value())
+
+
+def to_amount(cents):
+    """Convert integer cents back to a two-place ``Decimal``."""
+    return Decimal(cents).scaleb(-2)
+
+
+def has_amount_cents(model):
+    return any(field.name == "amount_cents" for field in model._meta.concrete_fields)
+
+
+def sync_amount_cents(objects):
+    """Set ``amount_cents`` from ``amount`` on each object and return them."""
+    for obj in objects:
+        obj.amount_cents = to_cents(obj.amount)
+    return objects
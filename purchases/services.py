@@ -1,8 +1,68 @@
+import time
+
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.utils import timezone
+from django.utils.text import slugify
+
+from budgets.models import DataVersion
+from . import signals
+from .models import Category, Purchase, Receipt
+
+
+CATEGORY_REGISTRY_TIMEOUT = 300
+
+
+def _category_registry_key(user_id):
+    return f"category-registry:{user_id}"
+
+
+def get_category_registry(user_id, refresh=False):
+    """Return the user's ``{name: id}`` category mapping, cached in process."""
+    key = _category_registry_key(user_id)
+    registry = None if refresh else cache.get(key)
+    signals.category_registry_lookup.send(sender=Category, hit=registry is not None)
+    if registry is None:
+        registry = dict(
+            Category.objects.filter(user_id=user_id).values_list("name", "id")
+        )
+        cache.set(key, registry, CATEGORY_REGISTRY_TIMEOUT)
+    return registry
+
+
+def invalidate_category_registry(user_id):
+    cache.delete(_category_registry_key(user_id))
+
+
+def _lookup_category(registry, value):
+    if value in registry:
+        return registry[value], value
 
-from .models import Purchase, Receipt
+    names_by_id = {category_id: name for name, category_id in registry.items()}
+    if value.isdigit() and int(value) in names_by_id:
+        return int(value), names_by_id[int(value)]
+
+    for name, category_id in registry.items():
+        if slugify(name) == value:
+            return category_id, name
+
+    return None
+
+
+def resolve_category(user, value):
+    """Resolve a category URL segment (name, id or slug) to ``(id, name)``.
+
+    Returns ``None`` when the user has no matching category. A miss reloads
+    the registry once so categories created in another process are found.
+    """
+    value = str(value)
+    resolved = _lookup_category(get_category_registry(user.pk), value)
+    if resolved is None:
+        resolved = _lookup_category(
+            get_category_registry(user.pk, refresh=True), value
+        )
+    return resolved
 
 
 def _validate_purchase_user(user, purchase):
@@ -11,6 +71,12 @@ def _validate_purchase_user(user, purchase):
     purchase.user = user
 
 
+def _record_import(source, count, start):
+    signals.purchases_saved.send(
+        sender=Purchase, source=source, count=count, duration=time.perf_counter() - start
+    )
+
+
 def save_purchases_with_receipts(user, purchases):
     """Save purchases under one receipt using the first row's metadata."""
     purchases = list(purchases)
@@ -21,6 +87,7 @@ def save_purchases_with_receipts(user, purchases):
         _validate_purchase_user(user, purchase)
 
     first_purchase = purchases[0]
+    start = time.perf_counter()
 
     with transaction.atomic():
         receipt = Receipt.objects.create(
@@ -35,6 +102,7 @@ def save_purchases_with_receipts(user, purchases):
             purchase.location = first_purchase.location
             purchase.save()
 
+    _record_import("receipt", len(purchases), start)
     return [receipt]
 
 
@@ -48,6 +116,7 @@ def save_purchases_with_individual_receipts(user, purchases):
         _validate_purchase_user(user, purchase)
 
     receipts = []
+    start = time.perf_counter()
     with transaction.atomic():
         for purchase in purchases:
             receipt = Receipt.objects.create(
@@ -60,6 +129,7 @@ def save_purchases_with_individual_receipts(user, purchases):
             purchase.save()
             receipts.append(receipt)
 
+    _record_import("individual_receipts", len(purchases), start)
     return receipts
 
 
@@ -105,6 +175,20 @@ def save_receipt_with_purchases(receipt, purchases):
     return receipt
 
 
+def recategorize_purchases(user, year, category_id, target_id):
+    """Move ``year``'s purchases in ``category_id`` to ``target_id``.
+
+    Returns the number of purchases moved.
+    """
+    with transaction.atomic():
+        # ``update`` sends no signals, so bump the year here. Bumping first
+        # moves a closed year's archived purchases back, so they move too.
+        DataVersion.bump(user.pk, year, category_ids=(category_id, target_id))
+        return Purchase.objects.filter(
+            user=user, date__year=year, category_id=category_id
+        ).update(category_id=target_id, updated_at=timezone.now())
+
+
 def save_purchase_with_receipt(purchase):
     """Save an edited purchase and keep its receipt metadata in sync."""
     with transaction.atomic():
@@ -123,10 +207,23 @@ def save_purchase_with_receipt(purchase):
             location=purchase.location,
             updated_at=timezone.now(),
         )
-        Purchase.objects.filter(receipt_id=receipt.pk).exclude(pk=purchase.pk).update(
+        siblings = Purchase.objects.filter(receipt_id=receipt.pk).exclude(pk=purchase.pk)
+        moved = [
+            (year or DataVersion.UNDATED, category_id)
+            for year, category_id in siblings.values_list("date__year", "category_id")
+        ]
+        siblings.update(
             date=purchase.date,
             source=purchase.source,
             location=purchase.location,
             updated_at=timezone.now(),
         )
+        if moved:
+            # ``update`` sends no signals, so bump what the siblings touched.
+            DataVersion.bump(
+                purchase.user_id,
+                purchase.date.year if purchase.date else DataVersion.UNDATED,
+                *{year for year, _ in moved},
+                category_ids={category_id for _, category_id in moved},
+            )
         return purchase
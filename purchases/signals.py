@@ -1,10 +1,34 @@
-from django.db.models.signals import post_delete
-from django.dispatch import receiver
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
 
-from .models import Purchase, Receipt
+from . import services
+from .models import Category, Income, Purchase, Receipt
+from .money import to_cents
+
+# Sent with ``hit`` on every category registry lookup.
+category_registry_lookup = Signal()
+# Sent with ``source``, ``count`` and ``duration`` in seconds after the batch
+# save services saved a batch of purchases.
+purchases_saved = Signal()
 
 
 @receiver(post_delete, sender=Purchase)
 def delete_orphaned_receipt(sender, instance, **kwargs):
     if instance.receipt_id:
         Receipt.objects.filter(pk=instance.receipt_id, purchases__isnull=True).delete()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_registry_on_change(sender, instance, **kwargs):
+    # Invalidate again on commit so a registry reloaded mid-transaction
+    # does not outlive a rollback.
+    services.invalidate_category_registry(instance.user_id)
+    transaction.on_commit(lambda: services.invalidate_category_registry(instance.user_id))
+
+
+@receiver(pre_save, sender=Purchase)
+@receiver(pre_save, sender=Income)
+def sync_amount_cents(sender, instance, **kwargs):
+    instance.amount_cents = to_cents(instance.amount)
@@ -4,8 +4,24 @@ from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 
-from purchases.models import Purchase, Receipt, RecurringPurchase
-from .factories import RecurringPurchaseFactory, CategoryFactory
+from budgets.models import DataVersion
+from purchases.archive import archive_entries, restore_entries, with_archive
+from purchases.models import (
+    ArchivedIncome,
+    ArchivedPurchase,
+    Income,
+    Purchase,
+    Receipt,
+    RecurringPurchase,
+)
+from purchases.money import sync_amount_cents, to_amount, to_cents
+from purchases.services import save_purchase_with_receipt
+from .factories import (
+    CategoryFactory,
+    IncomeFactory,
+    PurchaseFactory,
+    RecurringPurchaseFactory,
+)
 
 
 User = get_user_model()
@@ -83,3 +99,103 @@ class ReceiptModelTests(TestCase):
 
         with self.assertRaises(ValidationError):
             purchase.save()
+
+    def test_editing_purchase_bumps_sibling_categories(self):
+        user = User.objects.create_user(username="receipt-siblings")
+        food = CategoryFactory(user=user, name="Food")
+        home = CategoryFactory(user=user, name="Home")
+        receipt = Receipt.objects.create(user=user, date=datetime.date(2024, 12, 30))
+        edited = PurchaseFactory(
+            user=user, receipt=receipt, category=food, date=datetime.date(2024, 12, 30)
+        )
+        PurchaseFactory(user=user, receipt=receipt, category=home, date=datetime.date(2024, 12, 30))
+        versions = DataVersion.for_categories(user.pk, 2024)
+
+        edited.date = datetime.date(2025, 1, 2)
+        save_purchase_with_receipt(edited)
+
+        self.assertGreater(DataVersion.for_categories(user.pk, 2024)[home.pk], versions[home.pk])
+        self.assertIn(home.pk, DataVersion.for_categories(user.pk, 2025))
+
+
+class AmountCentsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="cents", email="cents@example.com", password="testpass123"
+        )
+
+    def test_conversion(self):
+        self.assertEqual(to_cents(Decimal("12.34")), 1234)
+        self.assertEqual(to_cents(Decimal("-0.05")), -5)
+        self.assertEqual(to_cents(1.99), 199)
+        self.assertEqual(to_cents(None), 0)
+        self.assertEqual(to_amount(1234), Decimal("12.34"))
+
+    def test_saving_syncs_amount_cents(self):
+        purchase = Purchase.objects.create(
+            user=self.user, date=datetime.date(2024, 1, 1), amount=Decimal("19.99")
+        )
+        income = Income.objects.create(
+            user=self.user, date=datetime.date(2024, 1, 1), amount=Decimal("1500.00")
+        )
+        self.assertEqual(purchase.amount_cents, 1999)
+        self.assertEqual(income.amount_cents, 150000)
+
+        purchase.amount = None
+        purchase.save()
+        purchase.refresh_from_db()
+        self.assertEqual(purchase.amount_cents, 0)
+
+    def test_sync_amount_cents_for_bulk_create(self):
+        purchases = Purchase.objects.bulk_create(
+            sync_amount_cents(
+                [Purchase(user=self.user, amount=Decimal("2.50"), date=datetime.date(2024, 1, 1))]
+            )
+        )
+        self.assertEqual(Purchase.objects.get(pk=purchases[0].pk).amount_cents, 250)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="archiver")
+        self.receipt = Receipt.objects.create(user=self.user, date=datetime.date(2022, 5, 1))
+        self.purchase = PurchaseFactory(
+            user=self.user, date=datetime.date(2022, 5, 1), receipt=self.receipt,
+            amount=Decimal("12.34"),
+        )
+        self.income = IncomeFactory(user=self.user, date=datetime.date(2022, 6, 1))
+        self.current = PurchaseFactory(user=self.user, date=datetime.date(2023, 1, 1))
+
+    def test_archive_moves_only_the_year(self):
+        moved = archive_entries(self.user.pk, 2022)
+
+        self.assertEqual(moved, {Purchase: 1, Income: 1})
+        self.assertEqual(list(Purchase.objects.filter(user=self.user)), [self.current])
+        self.assertFalse(Income.objects.filter(user=self.user).exists())
+        archived = ArchivedPurchase.objects.get(pk=self.purchase.pk)
+        self.assertEqual(archived.amount_cents, 1234)
+        self.assertEqual(archived.created_at, self.purchase.created_at)
+        self.assertTrue(ArchivedIncome.objects.filter(pk=self.income.pk).exists())
+        # Archiving is not a delete: the receipt is kept.
+        self.assertTrue(Receipt.objects.filter(pk=self.receipt.pk).exists())
+
+    def test_restore_returns_rows_unchanged(self):
+        archive_entries(self.user.pk, 2022)
+
+        restore_entries(self.user.pk, [2022])
+
+        restored = Purchase.objects.get(pk=self.purchase.pk)
+        self.assertEqual(restored.created_at, self.purchase.created_at)
+        self.assertEqual(restored.updated_at, self.purchase.updated_at)
+        self.assertEqual(restored.receipt, self.receipt)
+        self.assertFalse(ArchivedPurchase.objects.exists())
+        self.assertTrue(Income.objects.filter(pk=self.income.pk).exists())
+
+    def test_with_archive_unions_live_and_archived_rows(self):
+        archive_entries(self.user.pk, 2022)
+
+        rows = list(with_archive(Purchase, user=self.user).order_by("date"))
+
+        self.assertEqual([row.pk for row in rows], [self.purchase.pk, self.current.pk])
+        self.assertEqual([row.archived for row in rows], [True, False])
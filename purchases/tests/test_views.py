@@ -1,13 +1,16 @@
 import datetime
 import unittest
+from io import StringIO
 from urllib.parse import quote
 
+from django.core.management import call_command
 from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
 from decimal import Decimal
 
+from purchases.archive import archive_entries
 from purchases.models import Category, Purchase, Income, RecurringPurchase, Receipt
 from budgets.models import YearlyBudget
 from .factories import (
@@ -620,6 +623,65 @@ class PurchaseListViewTests(TestCase):
             html=False,
         )
 
+
+    def test_purchase_list_includes_archived_purchases(self):
+        archived = PurchaseFactory(
+            user=self.user, category=self.category, date=datetime.date(2022, 3, 1), item="Old"
+        )
+        live = PurchaseFactory(
+            user=self.user, category=self.category, date=datetime.date(2024, 3, 1), item="New"
+        )
+        archive_entries(self.user.pk, 2022)
+
+        response = self.client.get(reverse("purchase_list"), {"category": self.category.pk})
+
+        self.assertEqual([purchase.pk for purchase in response.context["purchases"]], [live.pk, archived.pk])
+        self.assertContains(response, "Archived", count=1)
+        self.assertNotContains(response, reverse("purchase_edit_htmx", kwargs={"pk": archived.pk}))
+        self.assertContains(response, f'<option value="{self.category.pk}" selected>', html=False)
+
+    def test_purchase_list_skips_archive_after_its_dates(self):
+        PurchaseFactory(user=self.user, category=self.category, date=datetime.date(2022, 3, 1))
+        live = PurchaseFactory(user=self.user, category=self.category, date=datetime.date(2024, 3, 1))
+        archive_entries(self.user.pk, 2022)
+
+        response = self.client.get(reverse("purchase_list"), {"purchase_date_from": "2023-01-01"})
+
+        self.assertIsNone(response.context["purchases"].query.combinator)
+        self.assertEqual(list(response.context["purchases"]), [live])
+
+    def test_purchase_list_is_not_modified_until_a_purchase_changes(self):
+        purchase = PurchaseFactory(
+            user=self.user, category=self.category, date=datetime.date(2024, 1, 1)
+        )
+        url = reverse("purchase_list")
+        etag = self.client.get(url)["ETag"]
+
+        self.assertEqual(self.client.get(url, headers={"if-none-match": etag}).status_code, 304)
+
+        purchase.item = "Renamed"
+        purchase.save()
+
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Renamed")
+
+    def test_purchase_list_revalidates_after_undated_purchase_changes(self):
+        url = reverse("purchase_list")
+        etag = self.client.get(url)["ETag"]
+
+        purchase = PurchaseFactory(user=self.user, category=self.category, item="Undated", date=None)
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Undated")
+
+        etag = response["ETag"]
+        purchase.delete()
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "Undated")
+
+
 @override_settings(STORAGES=TEST_STORAGES)
 class IncomeViewTests(TestCase):
     def setUp(self):
@@ -726,6 +788,9 @@ class RecurringPurchaseViewTests(TestCase):
             'form-MAX_NUM_FORMS': '1000',
         }
 
+    def _run_jobs(self):
+        call_command("run_jobs", processes=0, once=True, stdout=StringIO())
+
     def _build_add_to_month_post_data(self, rows, next_url='/'):
         data = {
             **self._management_form_data(len(rows)),
@@ -890,7 +955,9 @@ class RecurringPurchaseViewTests(TestCase):
                 ]
             )
         )
-        self.assertEqual(response.status_code, 200)  # HTMX redirect
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'hx-trigger="every 2s"')
+        self._run_jobs()
         
         # Check that a purchase was created with the foreign key set
         purchase = Purchase.objects.get(user=self.user, item='Netflix')
@@ -961,6 +1028,7 @@ class RecurringPurchaseViewTests(TestCase):
             )
         )
         self.assertEqual(response.status_code, 200)
+        self._run_jobs()
         
         purchase = Purchase.objects.get(user=self.user, item='Spotify')
         self.assertEqual(purchase.amount, Decimal('14.99'))
@@ -995,6 +1063,7 @@ class RecurringPurchaseViewTests(TestCase):
         )
 
         self.assertEqual(response.status_code, 200)
+        self._run_jobs()
         purchase = Purchase.objects.get(user=self.user, item='Daycare')
         self.assertIsNone(purchase.amount)
 
@@ -1076,6 +1145,7 @@ class RecurringPurchaseViewTests(TestCase):
             ),
         )
         self.assertEqual(response.status_code, 200)
+        self._run_jobs()
 
         purchases = list(
             Purchase.objects.filter(user=self.user, item__in=["Netflix", "Spotify"]).order_by("item")
@@ -1085,6 +1155,29 @@ class RecurringPurchaseViewTests(TestCase):
         self.assertIsNotNone(purchases[1].receipt_id)
         self.assertNotEqual(purchases[0].receipt_id, purchases[1].receipt_id)
 
+    def test_recurring_purchase_import_skips_rows_added_since_it_was_queued(self):
+        """Test two queued imports of the same month add each recurring purchase once."""
+        YearlyBudget.objects.create(
+            user=self.user,
+            date=datetime.date(2024, 1, 1),
+        )
+        recurring = RecurringPurchaseFactory(
+            user=self.user,
+            category=self.category,
+            item="Netflix",
+            amount=Decimal("15.99"),
+        )
+        data = self._build_add_to_month_post_data(
+            [{"recurring": recurring, "category": str(self.category.id)}]
+        )
+        url = reverse("recurring_purchase_add_to_month", kwargs={"year": 2024, "month": 1})
+
+        self.client.post(url, data)
+        self.client.post(url, data)
+        self._run_jobs()
+
+        self.assertEqual(Purchase.objects.filter(user=self.user, recurring_purchase=recurring).count(), 1)
+
     def test_recurring_purchase_post_rejects_tampered_recurring_purchase_id(self):
         """Test tampering with a row recurring_purchase_id re-renders with validation errors."""
         YearlyBudget.objects.create(
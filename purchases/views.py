@@ -12,7 +12,8 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 import datetime
 
-from .models import Purchase, Category, Income, RecurringPurchase
+from . import archive
+from .models import ArchivedPurchase, Purchase, Category, Income, RecurringPurchase
 from .forms import (
     PurchaseForm,
     PurchaseFormSetReceipt,
@@ -23,11 +24,13 @@ from .forms import (
     RecurringPurchaseAddToMonthFormSet,
 )
 from django_htmx.http import HttpResponseClientRedirect
+from budgets.conditional import ConditionalPageMixin
 from budgets.models import MonthlyBudget
+from budgets.page_updates import PageUpdate
+from .jobs import enqueue_purchase_import
 from .services import (
     save_purchase_with_receipt,
     save_receipt_with_purchases,
-    save_purchases_with_individual_receipts,
     save_purchases_with_receipts,
 )
 
@@ -38,7 +41,7 @@ class AddUserMixin:
         return super().form_valid(form)
 
 
-class PurchaseListView(LoginRequiredMixin, ListView):
+class PurchaseListView(LoginRequiredMixin, ConditionalPageMixin, ListView):
     model = Purchase
     context_object_name = "purchases"
     template_name = "purchases/purchase_list.html"
@@ -49,12 +52,7 @@ class PurchaseListView(LoginRequiredMixin, ListView):
         def parse_request_date_param(name):
             return parse_date(self.request.GET.get(name, ""))
 
-        qs = (
-            super()
-            .get_queryset()
-            .filter(user=self.request.user)
-            .select_related("category")
-        )
+        filters = Q(user=self.request.user)
 
         purchase_date_from = parse_request_date_param("purchase_date_from")
         purchase_date_to = parse_request_date_param("purchase_date_to")
@@ -68,9 +66,9 @@ class PurchaseListView(LoginRequiredMixin, ListView):
             category_id = None
 
         if purchase_date_from:
-            qs = qs.filter(date__gte=purchase_date_from)
+            filters &= Q(date__gte=purchase_date_from)
         if purchase_date_to:
-            qs = qs.filter(date__lte=purchase_date_to)
+            filters &= Q(date__lte=purchase_date_to)
 
         current_timezone = timezone.get_current_timezone()
 
@@ -81,23 +79,38 @@ class PurchaseListView(LoginRequiredMixin, ListView):
             )
 
         if date_added_from:
-            qs = qs.filter(created_at__gte=start_of_date(date_added_from))
+            filters &= Q(created_at__gte=start_of_date(date_added_from))
         if date_added_to:
-            qs = qs.filter(
+            filters &= Q(
                 created_at__lt=start_of_date(
                     date_added_to + datetime.timedelta(days=1)
                 )
             )
         if search:
-            qs = qs.filter(
+            filters &= (
                 Q(item__icontains=search)
                 | Q(location__icontains=search)
                 | Q(source__icontains=search)
             )
         if category_id is not None:
-            qs = qs.filter(category_id=category_id)
+            filters &= Q(category_id=category_id)
+
+        # Closed years' purchases may be archived; only a list reaching back
+        # to them pays for the union.
+        archived_through = archive.archived_through(self.request.user.pk)
+        if archived_through is not None and (
+            purchase_date_from is None or purchase_date_from <= archived_through
+        ):
+            return archive.with_archive(Purchase, filters).order_by(
+                "-date", "-created_at", "-id"
+            )
 
-        return qs
+        return (
+            super()
+            .get_queryset()
+            .filter(filters)
+            .select_related("category")
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -116,10 +129,13 @@ class PurchaseListView(LoginRequiredMixin, ListView):
             user=self.request.user,
             category_id=OuterRef("pk"),
         )
+        archived_categories = ArchivedPurchase.objects.filter(
+            user=self.request.user,
+            category_id=OuterRef("pk"),
+        )
         context["filter_categories"] = (
             Category.objects.filter(user=self.request.user)
-            .annotate(has_purchases=Exists(used_categories))
-            .filter(has_purchases=True)
+            .filter(Exists(used_categories) | Exists(archived_categories))
             .only("id", "name")
             .order_by("name")
         )
@@ -231,8 +247,10 @@ def purchase_create(request):
             if not instances:
                 return HttpResponseClientRedirect(next_url)
 
+            update = PageUpdate(request, next_url)
             save_purchases_with_receipts(request.user, instances)
-            return HttpResponseClientRedirect(next_url)
+            update.saved(*instances)
+            return update.response()
 
     if request.method == "GET":
         # Check if a date is provided as a query parameter
@@ -288,7 +306,9 @@ def purchase_edit(request, pk):
 
     if request.method == "POST":
         next = request.POST.get("next")
+        update = PageUpdate(request, next)
         if receipt:
+            update.before(*receipt_purchases)
             receipt_form = ReceiptForm(request.POST, instance=receipt)
             purchase_formset = ReceiptPurchaseFormSet(
                 request.POST,
@@ -301,12 +321,14 @@ def purchase_edit(request, pk):
                     receipt_form.save(commit=False),
                     [form.instance for form in purchase_formset.forms],
                 )
-                return HttpResponseClientRedirect(next)
+                update.saved(*(form.instance for form in purchase_formset.forms))
+                return update.response()
         else:
+            update.before(purchase)
             form = PurchaseForm(instance=purchase, data=request.POST, user=request.user)
             if form.is_valid():
-                save_purchase_with_receipt(form.save(commit=False))
-                return HttpResponseClientRedirect(next)
+                update.saved(save_purchase_with_receipt(form.save(commit=False)))
+                return update.response()
 
     if request.method == "GET":
         next = request.GET["next"]
@@ -335,10 +357,12 @@ def income_edit(request, pk):
 
     if request.method == "POST":
         next = request.POST.get("next")
+        update = PageUpdate(request, next)
+        update.before(income)
         form = IncomeForm(instance=income, data=request.POST, user=request.user)
         if form.is_valid():
-            form.save()
-            return HttpResponseClientRedirect(next)
+            update.saved(form.save())
+            return update.response()
 
     if request.method == "GET":
         next = request.GET["next"]
@@ -361,8 +385,9 @@ def income_create(request):
         form.instance.user = request.user
 
         if form.is_valid():
-            form.save()
-            return HttpResponseClientRedirect(next)
+            update = PageUpdate(request, next)
+            update.saved(form.save())
+            return update.response()
 
     if request.method == "GET":
         next = request.GET["next"]
@@ -447,7 +472,11 @@ def recurring_purchase_delete(request, pk):
 
 @login_required
 def recurring_purchase_add_to_month(request, year, month):
-    """Add recurring purchases to a specific month as actual purchases."""
+    """Add recurring purchases to a specific month as actual purchases.
+
+    The purchases are saved by a background job; the modal shows its
+    status and moves on to ``next`` once they are in.
+    """
     monthly_budget = get_object_or_404(MonthlyBudget, user=request.user, date__year=year, date__month=month)
     recurring_purchases = list(RecurringPurchase.objects.filter(
         user=request.user, is_active=True
@@ -520,9 +549,10 @@ def recurring_purchase_add_to_month(request, year, month):
                 )
                 already_added.add(recurring.id)
 
-            save_purchases_with_individual_receipts(request.user, purchases_to_create)
-
-            return HttpResponseClientRedirect(next_url)
+            if not purchases_to_create:
+                return HttpResponseClientRedirect(next_url)
+            job = enqueue_purchase_import(request.user, purchases_to_create)
+            return render(request, "jobs/_job_status.html", {"job": job, "next": next_url})
     else:
         formset = RecurringPurchaseAddToMonthFormSet(**formset_kwargs)
 
@@ -25,6 +25,14 @@
             modal.setAttribute("aria-label", headingText || "Dialog")
         }
 
+        // Sent by saves that patch the page in place instead of reloading it.
+        document.addEventListener("closeModal", () => {
+            if (modal.open) {
+                modal.close()
+            }
+            modalContent.replaceChildren()
+        })
+
         document.addEventListener("htmx:afterSwap", (event) => {
             const target = event.detail && event.detail.target
 
@@ -1,12 +1,13 @@
 (function () {
     const saveStates = new WeakMap()
+    const BATCH_DELAY_MS = 300
 
     function getSaveState(input) {
         if (!saveStates.has(input)) {
+            // The value attribute is the amount the server rendered, even
+            // when the first event for the input arrives after an edit.
             saveStates.set(input, {
-                lastSavedValue: input.value,
-                pendingValue: null,
-                queuedValue: null,
+                lastSavedValue: input.defaultValue,
             })
         }
 
@@ -23,7 +24,7 @@
         delete errorMessage.dataset.inputId
     }
 
-    function showSaveError(input, errorMessage) {
+    function showSaveError(input, errorMessage, text) {
         input.dataset.saveState = "error"
 
         if (!errorMessage) {
@@ -31,82 +32,150 @@
         }
 
         errorMessage.dataset.inputId = input.id
-        errorMessage.textContent = `Could not save the rollover for ${input.dataset.category}. Try again.`
+        errorMessage.textContent = text || `Could not save the rollover for ${input.dataset.category}. Try again.`
         errorMessage.hidden = false
     }
 
-    async function persistRollover(input, endpoint, year, value, saveState, errorMessage) {
-        saveState.pendingValue = value
-        input.setAttribute("aria-busy", "true")
-        input.dataset.saveState = "pending"
-
-        let result = "success"
-
-        try {
-            const response = await fetch(endpoint, {
-                method: "POST",
-                credentials: "same-origin",
-                headers: {
-                    Accept: "application/json",
-                    "Content-Type": "application/json",
-                    "X-Requested-With": "XMLHttpRequest",
-                    "X-CSRFToken": window.CarrotsBudget.getCsrfToken(),
-                },
-                body: JSON.stringify({
-                    amount: value,
-                    category: input.dataset.category,
-                    year,
-                }),
-            })
+    function formatAmount(value) {
+        const amount = Number(value)
+        return Number.isInteger(amount) ? String(amount) : amount.toFixed(2)
+    }
 
-            if (!response.ok) {
-                throw new Error(`Rollover update failed with status ${response.status}`)
+    function updateFigures(root, figures) {
+        root.querySelectorAll("[data-figure]").forEach((element) => {
+            let value = figures[element.dataset.figure]
+            if (value !== null && typeof value === "object") {
+                value = value.amount
+            }
+            if (value !== undefined && value !== null) {
+                element.textContent = `$${formatAmount(value)}`
             }
+        })
+    }
 
-            saveState.lastSavedValue = value
-            input.dataset.lastSavedValue = value
-        } catch (error) {
-            result = "error"
-        } finally {
-            saveState.pendingValue = null
-            input.removeAttribute("aria-busy")
-        }
+    function inputsByCategory(root) {
+        const inputs = new Map()
+        root.querySelectorAll(".rollover-edit").forEach((input) => inputs.set(input.dataset.category, input))
+        return inputs
+    }
 
-        const queuedValue = saveState.queuedValue
-        saveState.queuedValue = null
+    // Edits are collected and sent together, so changing several rollovers
+    // costs one request. Each rollover carries the version it was read at;
+    // the server rejects the whole batch with 409 if any of them changed.
+    function createBatchSaver(root, endpoint, errorMessage) {
+        const dirty = new Set()
+        let timer = null
+        let inFlight = false
+        let flushAgain = false
+
+        async function flush() {
+            timer = null
+            if (inFlight) {
+                flushAgain = true
+                return
+            }
 
-        if (queuedValue !== null && queuedValue !== saveState.lastSavedValue) {
-            return persistRollover(input, endpoint, year, queuedValue, saveState, errorMessage)
-        }
+            const batch = [...dirty]
+                .map((input) => ({input, value: input.value}))
+                .filter(({input, value}) => value !== getSaveState(input).lastSavedValue)
+            dirty.clear()
 
-        if (result === "error" && input.value === value) {
-            showSaveError(input, errorMessage)
-            return
-        }
+            if (!batch.length) {
+                return
+            }
 
-        if (input.value !== saveState.lastSavedValue) {
-            input.dataset.saveState = "idle"
-            return
-        }
+            inFlight = true
+            batch.forEach(({input}) => {
+                input.setAttribute("aria-busy", "true")
+                input.dataset.saveState = "pending"
+            })
 
-        input.dataset.saveState = "success"
-        clearSaveError(input, errorMessage)
-    }
+            try {
+                const response = await fetch(endpoint, {
+                    method: "POST",
+                    credentials: "same-origin",
+                    headers: {
+                        Accept: "application/json",
+                        "Content-Type": "application/json",
+                        "X-Requested-With": "XMLHttpRequest",
+                        "X-CSRFToken": window.CarrotsBudget.getCsrfToken(),
+                    },
+                    body: JSON.stringify({
+                        ytd: root.dataset.ytdMonth,
+                        rollovers: batch.map(({input, value}) => ({
+                            amount: value,
+                            category: input.dataset.category,
+                            version: input.dataset.version,
+                        })),
+                    }),
+                })
+                const data = response.status === 409 || response.ok ? await response.json() : null
+                const inputs = inputsByCategory(root)
+
+                if (data) {
+                    data.rollovers.forEach((rollover) => {
+                        const input = inputs.get(rollover.category)
+                        if (input) {
+                            input.dataset.version = rollover.version
+                        }
+                    })
+                }
 
-    function saveRollover(input, endpoint, year, errorMessage) {
-        const saveState = getSaveState(input)
-        const value = input.value
+                if (response.status === 409) {
+                    data.rollovers.forEach((rollover) => {
+                        const input = inputs.get(rollover.category)
+                        if (!input) {
+                            return
+                        }
+                        input.value = formatAmount(rollover.amount)
+                        getSaveState(input).lastSavedValue = input.value
+                    })
+                    batch.forEach(({input}) => showSaveError(input, errorMessage, data.error))
+                    return
+                }
 
-        if (saveState.pendingValue !== null) {
-            saveState.queuedValue = value === saveState.pendingValue ? null : value
-            return
-        }
+                if (!response.ok) {
+                    throw new Error(`Rollover update failed with status ${response.status}`)
+                }
 
-        if (saveState.lastSavedValue === value) {
-            return
+                updateFigures(root, data)
+                batch.forEach(({input, value}) => {
+                    getSaveState(input).lastSavedValue = value
+                    input.dataset.lastSavedValue = value
+                    if (input.value === value) {
+                        input.dataset.saveState = "success"
+                        clearSaveError(input, errorMessage)
+                    } else {
+                        input.dataset.saveState = "idle"
+                    }
+                })
+            } catch (error) {
+                batch.forEach(({input, value}) => {
+                    if (input.value === value) {
+                        showSaveError(input, errorMessage)
+                    }
+                })
+            } finally {
+                inFlight = false
+                batch.forEach(({input}) => input.removeAttribute("aria-busy"))
+            }
+
+            if (flushAgain) {
+                flushAgain = false
+                flush()
+            }
         }
 
-        persistRollover(input, endpoint, year, value, saveState, errorMessage)
+        return function saveRollover(input) {
+            if (input.value === getSaveState(input).lastSavedValue) {
+                return
+            }
+
+            dirty.add(input)
+            if (timer === null) {
+                timer = setTimeout(flush, BATCH_DELAY_MS)
+            }
+        }
     }
 
     function initializeYearlyBudget(root) {
@@ -115,44 +184,52 @@
         }
 
         const endpoint = root.dataset.rolloverUrl
-        const year = root.dataset.year
 
-        if (!endpoint || !year) {
+        if (!endpoint) {
             return
         }
 
         root.dataset.jsInitialized = "true"
         const errorMessage = root.querySelector(".rollover-save-error")
+        const saveRollover = createBatchSaver(root, endpoint, errorMessage)
+
+        // Rollover inputs arrive with lazily loaded sections, so their
+        // events are handled on the root rather than bound per input.
+        root.addEventListener("input", (event) => {
+            const input = event.target.closest(".rollover-edit")
+            if (!input) {
+                return
+            }
 
-        root.querySelectorAll(".rollover-edit").forEach((input) => {
-            getSaveState(input)
+            delete input.dataset.skipNextBlur
 
-            input.addEventListener("input", () => {
-                delete input.dataset.skipNextBlur
+            if (!input.hasAttribute("aria-busy") && input.value !== getSaveState(input).lastSavedValue) {
+                input.dataset.saveState = "idle"
+                clearSaveError(input, errorMessage)
+            }
+        })
+        root.addEventListener("keydown", (event) => {
+            const input = event.target.closest(".rollover-edit")
+            if (!input || event.key !== "Enter") {
+                return
+            }
 
-                const saveState = getSaveState(input)
-                if (saveState.pendingValue === null && input.value !== saveState.lastSavedValue) {
-                    input.dataset.saveState = "idle"
-                    clearSaveError(input, errorMessage)
-                }
-            })
-            input.addEventListener("keydown", (event) => {
-                if (event.key !== "Enter") {
-                    return
-                }
+            event.preventDefault()
+            saveRollover(input)
+            input.dataset.skipNextBlur = "true"
+        })
 
-                event.preventDefault()
-                saveRollover(input, endpoint, year, errorMessage)
-                input.dataset.skipNextBlur = "true"
-            })
+        root.addEventListener("focusout", (event) => {
+            const input = event.target.closest(".rollover-edit")
+            if (!input) {
+                return
+            }
 
-            input.addEventListener("blur", () => {
-                if (input.dataset.skipNextBlur) {
-                    delete input.dataset.skipNextBlur
-                    return
-                }
-                saveRollover(input, endpoint, year, errorMessage)
-            })
+            if (input.dataset.skipNextBlur) {
+                delete input.dataset.skipNextBlur
+                return
+            }
+            saveRollover(input)
         })
 
         const monthYtdSelect = root.querySelector(".month-select")